@@ -0,0 +1,355 @@
+import bisect
+import mmap
+import os
+import struct
+import threading
+import weakref
+
+from .codec import BlockEncoder, decode_block
+from .sensors import TYPECODES, registry
+
+INDEX_ENTRY = struct.Struct('<qQ')  # (tick, record number)
+SEGMENT_SUFFIX = '.seg'
+INDEX_SUFFIX = '.idx'
+# compressed segments: codec blocks of index_every records, indexed by
+# (first tick, byte offset) entries
+PACKED_SUFFIX = '.gor'
+PACKED_INDEX_SUFFIX = '.gix'
+
+
+def record_struct(fields: list[dict]) -> struct.Struct:
+    """Fixed-width little-endian record: int64 tick followed by each field's C type."""
+    return struct.Struct('<q' + ''.join(TYPECODES.get(f['type'], 'q') for f in fields))
+
+
+def layout_dir(board: int, addr: int, sensor: str, mask: int) -> str:
+    return f"b{board}_a{addr:02x}_{sensor}_m{mask:02x}"
+
+
+class RecordView:
+    """
+    Zero-copy view over a run of fixed-width archive records. `buffer` is a
+    memoryview straight into the segment's mmap; iterate for tuples or use
+    records()/columns() when a Python copy is wanted. release() lets go of
+    the mapping; views still held when the archive closes keep it open.
+    """
+    def __init__(self, buffer: memoryview, fields: list[dict]):
+        self.buffer = buffer
+        self.fields = ('tick',) + tuple(f['name'] for f in fields)
+        self._struct = record_struct(fields)
+
+    def __len__(self):
+        return len(self.buffer) // self._struct.size
+
+    def __iter__(self):
+        return self._struct.iter_unpack(self.buffer)
+
+    def records(self) -> list[dict]:
+        return [dict(zip(self.fields, row)) for row in self]
+
+    def columns(self) -> dict:
+        rows = list(self)
+        return {name: [row[i] for row in rows] for i, name in enumerate(self.fields)}
+
+    def release(self):
+        self.buffer.release()
+
+
+class _SegmentWriter:
+    def __init__(self, path_base: str, rec: struct.Struct, first_tick: int, index_every: int):
+        self.rec = rec
+        self.index_every = index_every
+        self.count = 0
+        self.first_tick = first_tick
+        self.last_tick = None
+        self.base = path_base
+        self._data = open(path_base + SEGMENT_SUFFIX, 'ab')
+        self._index = open(path_base + INDEX_SUFFIX, 'ab')
+
+    def write(self, records: list[dict], names: tuple):
+        pack = self.rec.pack
+        chunks = []
+        index = []
+        n = self.count
+        for r in records:
+            if n % self.index_every == 0:
+                index.append(INDEX_ENTRY.pack(r['tick'], n))
+            chunks.append(pack(r['tick'], *[r[k] for k in names]))
+            n += 1
+        self._data.write(b''.join(chunks))
+        if index:
+            self._index.write(b''.join(index))
+        self.count = n
+        self.last_tick = records[-1]['tick']
+
+    def flush(self):
+        self._data.flush()
+        self._index.flush()
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+
+
+class SampleArchive:
+    """
+    Append-only on-disk archive of decoded samples.
+
+    Each (board, addr, sensor, mask) layout gets its own directory of
+    segments. A segment is a flat file of fixed-width records
+    (record_struct) named after its first tick, plus a sparse index
+    holding (tick, record number) for every `index_every`-th record.
+    A new segment starts after `segment_records` records or when ticks go
+    backwards, so ticks are increasing within a segment.
+
+    read() consults the sparse index in memory, then binary-searches only
+    the indexed block inside an mmap of the segment, so a narrow time
+    range touches a handful of pages however large the archive is.
+
+    With compress=True every segment is rewritten as codec blocks
+    (see codec.py) once it is closed, and reads of compressed segments
+    decode only the blocks overlapping the range. The open segment stays
+    fixed-width, so appends cost the same either way.
+    """
+    def __init__(self, root: str, segment_records: int = 1 << 20, index_every: int = 256,
+                 compress: bool = False):
+        self.root = root
+        self.segment_records = segment_records
+        self.index_every = index_every
+        self.compress = compress
+        self._writers = {}  # {(board, addr): _Layout}
+        self._index_cache = {}  # {segment path: ([ticks], [record numbers], size)}
+        self._maps = weakref.WeakSet()  # segment mmaps behind the views read() returned
+        self._lock = threading.Lock()  # guards _writers, _index_cache and _maps
+        os.makedirs(root, exist_ok=True)
+
+    # ——— writing ———
+
+    def append(self, board: int, addr: int, name: str, records: list[dict]):
+        """Stream-consumer entry point: append one decoded batch."""
+        if not records:
+            return
+        present = tuple(k for k in records[0] if k != 'tick')
+        with self._lock:
+            layout = self._writers.get((board, addr))
+            if layout is None or layout.key != (name, present):
+                if layout is not None:
+                    layout.close()
+                layout = self._writers[(board, addr)] = _Layout(
+                    self.root, board, addr, name, present,
+                    self._pack_segment if self.compress else None)
+
+            seg = layout.segment
+            start = 0
+            count, last = (seg.count, seg.last_tick) if seg is not None else (0, None)
+            for i, r in enumerate(records):
+                tick = r['tick']
+                if seg is None or count >= self.segment_records or tick <= last:
+                    if i > start:
+                        seg.write(records[start:i], layout.names)
+                    seg = layout.roll(tick, self.index_every)
+                    start, count = i, 0
+                count += 1
+                last = tick
+            seg.write(records[start:], layout.names)
+            seg.flush()
+
+    __call__ = append
+
+    def close(self):
+        with self._lock:
+            for layout in self._writers.values():
+                layout.close()
+            self._writers.clear()
+            self._index_cache.clear()
+            maps, self._maps = list(self._maps), weakref.WeakSet()
+        for mm in maps:
+            try:
+                mm.close()
+            except BufferError:
+                pass  # a caller still holds a view; unmapped when it is released
+
+    # ——— reading ———
+
+    def layouts(self, board: int, addr: int) -> list[tuple[str, int, str]]:
+        """(sensor, mask, directory) for every layout archived for board/addr."""
+        prefix = f"b{board}_a{addr:02x}_"
+        out = []
+        for d in sorted(os.listdir(self.root)):
+            if d.startswith(prefix):
+                sensor, _, mask = d[len(prefix):].rpartition('_m')
+                out.append((sensor, int(mask, 16), os.path.join(self.root, d)))
+        return out
+
+    def read(self, board: int, addr: int, start: int, end: int) -> list[RecordView]:
+        """Views of all records with start <= tick < end, one per overlapping segment."""
+        views = []
+        for sensor, mask, directory in self.layouts(board, addr):
+            fields = registry.payload_layout(sensor, mask)
+            rec = record_struct(fields)
+            files = set(os.listdir(directory))
+            for fn in sorted(files):
+                base, ext = os.path.splitext(fn)
+                if ext not in (SEGMENT_SUFFIX, PACKED_SUFFIX) or int(base.split('-')[0]) >= end:
+                    continue
+                path = os.path.join(directory, fn)
+                if ext == PACKED_SUFFIX:
+                    view = self._read_packed(path, rec, fields, start, end)
+                elif ext == SEGMENT_SUFFIX and base + PACKED_SUFFIX not in files:
+                    view = self._read_segment(path, rec, fields, start, end)
+                else:
+                    continue
+                if view is not None:
+                    views.append(view)
+        views.sort(key=lambda v: next(iter(v))[0])
+        return views
+
+    def records(self, board: int, addr: int, start: int, end: int) -> list[dict]:
+        return [r for view in self.read(board, addr, start, end) for r in view.records()]
+
+    def _load_index(self, path: str):
+        with open(path, 'rb') as f:
+            raw = f.read()
+        entries = list(INDEX_ENTRY.iter_unpack(raw[:len(raw) - len(raw) % INDEX_ENTRY.size]))
+        return [t for t, _ in entries], [n for _, n in entries]
+
+    def _read_segment(self, path, rec, fields, start, end):
+        size = os.path.getsize(path)
+        count = size // rec.size
+        if count == 0:
+            return None
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), count * rec.size, access=mmap.ACCESS_READ)
+
+        def tick_at(i):
+            return struct.unpack_from('<q', mm, i * rec.size)[0]
+
+        if tick_at(count - 1) < start:
+            mm.close()
+            return None
+
+        with self._lock:
+            cached = self._index_cache.get(path)
+            if cached is None or cached[2] != size:
+                ticks, nums = self._load_index(path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX)
+                self._index_cache[path] = (ticks, nums, size)
+            else:
+                ticks, nums, _ = cached
+
+        def locate(tick):
+            # narrow to one indexed block, then bisect inside it
+            k = bisect.bisect_left(ticks, tick)
+            lo = nums[k - 1] if k > 0 else 0
+            hi = min(nums[k], count) if k < len(nums) else count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if tick_at(mid) < tick:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            return lo
+
+        first, last = locate(start), locate(end)
+        if first >= last:
+            mm.close()
+            return None
+        with self._lock:
+            self._maps.add(mm)
+        return RecordView(memoryview(mm)[first * rec.size:last * rec.size], fields)
+
+
+    def _read_packed(self, path, rec, fields, start, end):
+        base = path[:-len(PACKED_SUFFIX)]
+        with self._lock:
+            cached = self._index_cache.get(path)
+            if cached is None:
+                ticks, offsets = self._load_index(base + PACKED_INDEX_SUFFIX)
+                self._index_cache[path] = (ticks, offsets, None)
+            else:
+                ticks, offsets, _ = cached
+        if not ticks:
+            return None
+
+        # blocks that may hold ticks in [start, end)
+        first = max(0, bisect.bisect_right(ticks, start) - 1)
+        last = bisect.bisect_left(ticks, end)
+        if first >= last:
+            return None
+        with open(path, 'rb') as f:
+            f.seek(offsets[first])
+            data = f.read(offsets[last] - offsets[first] if last < len(offsets) else -1)
+
+        width = len(fields)
+        out = bytearray()
+        pos = 0
+        for k in range(first, last):
+            size = (offsets[k + 1] if k + 1 < len(offsets) else offsets[first] + len(data)) - offsets[k]
+            for row in decode_block(data[pos:pos + size], width):
+                if start <= row[0] < end:
+                    out += rec.pack(*row)
+            pos += size
+        if not out:
+            return None
+        return RecordView(memoryview(bytes(out)), fields)
+
+    def _pack_segment(self, base: str, rec: struct.Struct):
+        """Rewrite a closed fixed-width segment as compressed codec blocks."""
+        seg = base + SEGMENT_SUFFIX
+        with open(seg, 'rb') as f:
+            raw = f.read()
+        width = len(rec.format) - 2  # '<q' + one code per field
+        blocks, index = [], []
+        offset = 0
+        enc = None
+        for row in rec.iter_unpack(raw[:len(raw) - len(raw) % rec.size]):
+            if enc is None:
+                enc = BlockEncoder(width)
+                index.append(INDEX_ENTRY.pack(row[0], offset))
+            enc.append(row[0], row[1:])
+            if enc.count == self.index_every:
+                blocks.append(enc.getvalue())
+                offset += len(blocks[-1])
+                enc = None
+        if enc is not None:
+            blocks.append(enc.getvalue())
+
+        for suffix, data in ((PACKED_SUFFIX, blocks), (PACKED_INDEX_SUFFIX, index)):
+            with open(base + suffix + '.tmp', 'wb') as f:
+                f.write(b''.join(data))
+        # index first: a .gor without its .gix is never visible to read()
+        os.replace(base + PACKED_INDEX_SUFFIX + '.tmp', base + PACKED_INDEX_SUFFIX)
+        os.replace(base + PACKED_SUFFIX + '.tmp', base + PACKED_SUFFIX)
+        os.remove(seg)
+        os.remove(base + INDEX_SUFFIX)
+        self._index_cache.pop(seg, None)  # called from _Layout.close() with _lock held
+
+
+class _Layout:
+    """Writer state for one (board, addr, sensor, mask) directory."""
+    def __init__(self, root, board, addr, sensor, present, on_closed=None):
+        self.key = (sensor, present)
+        mask = registry.mask_for(sensor, present)
+        self.fields = registry.payload_layout(sensor, mask)
+        self.names = tuple(f['name'] for f in self.fields)
+        self.directory = os.path.join(root, layout_dir(board, addr, sensor, mask))
+        self.segment = None
+        self.on_closed = on_closed  # on_closed(path base, record struct)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def roll(self, first_tick: int, index_every: int) -> _SegmentWriter:
+        self.close()
+        base = os.path.join(self.directory, f"{first_tick:020d}")
+        n = 0
+        while os.path.exists(base + SEGMENT_SUFFIX) or os.path.exists(base + PACKED_SUFFIX):
+            # never append to an older segment (restart, or a reset to the same tick)
+            n += 1
+            base = os.path.join(self.directory, f"{first_tick:020d}-{n}")
+        self.segment = _SegmentWriter(base, record_struct(self.fields), first_tick, index_every)
+        return self.segment
+
+    def close(self):
+        if self.segment is not None:
+            seg, self.segment = self.segment, None
+            seg.close()
+            if self.on_closed is not None:
+                self.on_closed(seg.base, seg.rec)
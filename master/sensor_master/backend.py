@@ -1,8 +1,58 @@
 from enum import Enum, auto
+import functools
 import threading
 from .boards import BoardManager
 from .scheduler import StreamScheduler
 from .protocol import protocol
+from .archive import SampleArchive
+from .energy import EnergyIntegrator
+from .rollup import RollupStore
+from .sensors import registry
+from .shmring import RingPublisher
+from .store import SampleStore
+from .timealign import TimeMerger
+
+# Queue depth, in batches, for consumers that persist or account for every
+# sample (archive, energy, sinks): deep enough to ride out a slow disk.
+# Like every consumer they never block the bus thread; batches arriving at
+# a full queue are dropped and counted in get_consumer_stats().
+DURABLE_QUEUE = 4096
+
+# The 'period' config field counts sample periods in 100 ms units
+PERIOD_UNIT_MS = 100
+
+
+def _field_spec(fields) -> dict:
+    """
+    A consumer's field declaration as {selector: {field, …}}, where the
+    selector is None (every sensor), a sensor name or a (board, addr) pair.
+    A plain iterable of field names applies to every sensor.
+    """
+    if isinstance(fields, dict):
+        return {k: set(v) for k, v in fields.items()}
+    return {None: set(fields)}
+
+
+def _wanted(spec: dict, board: int, addr: int, sensor: str) -> set:
+    return spec.get(None, set()) | spec.get(sensor, set()) | spec.get((board, addr), set())
+
+
+def _projecting(callback, spec: dict, batched: bool):
+    """Wrap a consumer callback so it only sees 'tick' and its declared fields."""
+    def project(board, addr, name, records):
+        keep = _wanted(spec, board, addr, name)
+        keep.add('tick')
+        return [{k: v for k, v in r.items() if k in keep} for r in records]
+
+    if batched:
+        def deliver(items):
+            callback([(b, a, n, project(b, a, n, recs)) for b, a, n, recs in items])
+    else:
+        def deliver(board, addr, name, records):
+            callback(board, addr, name, project(board, addr, name, records))
+    # consumer stats report the wrapped callback's name
+    deliver.__qualname__ = getattr(callback, '__qualname__', repr(callback))
+    return deliver
 
 
 class Mode(Enum):
@@ -12,7 +62,8 @@ class Mode(Enum):
 
 
 class SensorBackend:
-    def __init__(self, port='COM3', baud=115200, timeout=0.05):
+    def __init__(self, port='COM3', baud=115200, timeout=0.05, history=4096,
+                 history_block=None):
         self.board_mgr = BoardManager(port, baud, timeout)
         self.stream_scheduler = StreamScheduler(self.board_mgr, timeout)
         self.mode = Mode.IDLE
@@ -21,6 +72,26 @@ class SensorBackend:
         # Caches
         self.config_cache = {}  # {(board, addr, sensor): {config_field: value}}
         self.payload_mask_cache = {}  # {(board, addr): mask}
+        self.discovery_cache = None  # last _do_discovery() result; None until the first scan
+        # the scheduler decodes streamed reads with the cached masks
+        self.stream_scheduler.masks = self.payload_mask_cache
+
+        # Payload fields declared by stream consumers: {consumer: field spec}
+        self.field_demand = {}
+        self._auto_masks = set()  # (board, addr) whose mask follows field_demand
+
+        # Recent streamed samples, `history` per sensor (compressed in
+        # blocks of `history_block` samples when given)
+        self.store = SampleStore(history, history_block)
+        self.stream_scheduler.add_consumer(self.store.append, maxsize=256)
+        # Per-second / per-minute aggregates of the same stream
+        self.rollups = RollupStore()
+        self.stream_scheduler.add_consumer(self.rollups.append, maxsize=256)
+        self.archive = None
+        self.energy = None
+        self.rings = None
+        self.sinks = {}  # {sink: consumer}
+        self._durable = {}  # {archive/energy/rings: consumer}, torn down by close()
 
     def set_mode(self, new_mode: Mode):
         with self.lock:
@@ -50,8 +121,20 @@ class SensorBackend:
                 sensor_list.append({'name': name, 'addr': addr, 'config': cfg})
 
             discovery_info[bid] = sensor_list
+        self.discovery_cache = discovery_info
         return discovery_info
 
+    def discover(self, refresh: bool = True) -> dict:
+        """
+        Scan the bus like set_mode(Mode.DISCOVERY), without changing mode.
+        With refresh=False the last result is returned once the bus has
+        been scanned, even if that scan found nothing.
+        """
+        with self.lock:
+            if refresh or self.discovery_cache is None:
+                return self._do_discovery()
+            return self.discovery_cache
+
     def _get_sensor_config(self, bound, board, addr, name):
         key = (board, addr, name)
 
@@ -63,20 +146,49 @@ class SensorBackend:
 
         return self.config_cache[key]
 
-    def start_stream(self, callback):
+    def start_stream(self, callback, only=None, rescan=True):
+        """
+        Discover the bus and stream every sensor found, or only those listed
+        in `only`: an iterable of (board, addr) pairs, where addr may be None
+        to take every sensor of that board. With rescan=False the last
+        discovery result is reused once the bus has been scanned.
+        """
         with self.lock:
             if self.mode == Mode.STREAM:
                 return
 
             self.stream_scheduler.clear_subscriptions()
+            wanted = set(only) if only is not None else None
 
-            discovery_map = self._do_discovery()
+            if rescan or self.discovery_cache is None:
+                discovery_map = self._do_discovery()
+            else:
+                discovery_map = self.discovery_cache
             for bid, sensors in discovery_map.items():
                 for s in sensors:
+                    if wanted is not None and (bid, s['addr']) not in wanted \
+                            and (bid, None) not in wanted:
+                        continue
                     # Use actual config 'period' value in 100ms units → convert to seconds
                     raw_period = s['config'].get('period', 10)  # default to 1000ms
                     interval = max(0.1, raw_period * 0.1)        # ensure at least 100ms
                     self.stream_scheduler.subscriptions.append((bid, s['addr'], s['name'], interval))
+                    if 'period' in s['config']:
+                        # continuity gaps are judged against the sensor's own period
+                        self.stream_scheduler.sample_periods[(bid, s['addr'])] = \
+                            s['config']['period'] * PERIOD_UNIT_MS
+
+            if wanted is not None and not self.stream_scheduler.subscriptions:
+                raise ValueError("No discovered sensor matches the stream filter")
+
+            # streamed reads are decoded with the cached masks: learn the
+            # current ones, then apply what the declared fields call for
+            for bid, addr, name, _ in list(self.stream_scheduler.subscriptions):
+                try:
+                    self.get_payload_mask(bid, addr)
+                except (RuntimeError, IOError, ValueError) as e:
+                    print(f"[Mask error] board {bid} sensor {name}@0x{addr:02X}: {e}")
+            self._sync_masks(live=False)
 
             self.mode = Mode.STREAM
 
@@ -88,11 +200,225 @@ class SensorBackend:
                 self.stream_scheduler.stop()
                 self.mode = Mode.IDLE
 
+    # Stream consumers (each with its own bounded queue and worker thread)
+    def add_consumer(self, callback, maxsize: int = 64, policy: str = 'drop-oldest',
+                     batched: bool = False, fields=None):
+        """
+        Attach a stream consumer. With `fields` (field names, or a dict
+        mapping a sensor name or (board, addr) to field names) the consumer
+        only receives 'tick' plus those fields, and the sensors' payload
+        masks shrink to the union of what declaring consumers need.
+        Consumers without `fields` take whatever the masks carry.
+        """
+        if fields is None:
+            return self.stream_scheduler.add_consumer(callback, maxsize, policy, batched)
+        spec = _field_spec(fields)
+        consumer = self.stream_scheduler.add_consumer(
+            _projecting(callback, spec, batched), maxsize, policy, batched)
+        self.field_demand[consumer] = spec
+        self.update_payload_masks()
+        return consumer
+
+    def remove_consumer(self, consumer):
+        self.stream_scheduler.remove_consumer(consumer)
+        if self.field_demand.pop(consumer, None) is not None:
+            self.update_payload_masks()
+
+    def demanded_fields(self, board: int, addr: int, sensor: str) -> set:
+        """Union of the payload fields declaring consumers want from this sensor."""
+        wanted = set()
+        for spec in list(self.field_demand.values()):
+            wanted |= _wanted(spec, board, addr, sensor)
+        return wanted
+
+    def demanded_mask(self, board: int, addr: int, sensor: str):
+        """
+        Smallest payload mask serving every declaring consumer, or None if
+        none applies. Derived fields (e.g. power_mW) are served from their
+        primaries when the config they need is cached, so only those are sent.
+        """
+        wanted = self.demanded_fields(board, addr, sensor)
+        config = self.config_cache.get((board, addr, sensor), {})
+        return registry.mask_for(sensor, registry.wire_fields(sensor, wanted, config)) or None
+
+    def update_payload_masks(self):
+        """
+        Bring every discovered sensor's payload mask in line with the
+        declared fields. While streaming the change is handed to the
+        scheduler, which applies it between two reads of that sensor; a
+        sensor nobody declares fields for any more returns to its default
+        mask.
+        """
+        self._sync_masks(live=self.mode == Mode.STREAM)
+
+    def _sync_masks(self, live: bool):
+        for board, sensors in list((self.discovery_cache or {}).items()):
+            for s in sensors:
+                key = (board, s['addr'])
+                self._sync_deriver(board, s['addr'], s['name'])
+                mask = self.demanded_mask(board, s['addr'], s['name'])
+                if mask is not None:
+                    self._auto_masks.add(key)
+                elif key in self._auto_masks:
+                    self._auto_masks.discard(key)
+                    mask = sum(1 << b for b in
+                               registry.metadata(s['name']).get('default_payload_bits', []))
+                else:
+                    continue
+                if self.payload_mask_cache.get(key) == mask:
+                    continue
+                if live:
+                    self.stream_scheduler.request_mask(board, s['addr'], mask)
+                    continue
+                try:
+                    self.set_payload_mask(board, s['addr'], mask)
+                except (RuntimeError, IOError, ValueError) as e:
+                    print(f"[Mask error] board {board} sensor {s['name']}@0x{s['addr']:02X}: {e}")
+
+    def _sync_deriver(self, board: int, addr: int, sensor: str):
+        """Have the scheduler compute the demanded derived fields the wire will not carry."""
+        wanted = self.demanded_fields(board, addr, sensor)
+        fields = sorted(f for f in registry.derived_fields(sensor) if f in wanted)
+        if fields:
+            config = self.config_cache.setdefault((board, addr, sensor), {})
+            self.stream_scheduler.derivers[(board, addr)] = functools.partial(
+                registry.derive, sensor, fields=fields, config=config)
+        else:
+            self.stream_scheduler.derivers.pop((board, addr), None)
+
+    def get_consumer_stats(self) -> list[dict]:
+        return self.stream_scheduler.consumer_stats()
+
+    # Recent history kept by the stream path (columnar {name: values} results)
+    def latest_samples(self, board: int, addr: int, n: int = 1) -> dict:
+        return self.store.latest(board, addr, n)
+
+    def samples_since(self, board: int, addr: int, tick: int) -> dict:
+        return self.store.since(board, addr, tick)
+
+    def samples_window(self, board: int, addr: int, start: int, end: int) -> dict:
+        return self.store.window(board, addr, start, end)
+
+    def rollup_series(self, board: int, addr: int, window_ms: int = 1000,
+                      start: int = None, end: int = None, partial: bool = False) -> dict:
+        """min/max/sum/mean/count per field over tumbling windows of board ticks."""
+        return self.rollups.series(board, addr, window_ms, start, end, partial)
+
+    def enable_archive(self, root: str, **options) -> SampleArchive:
+        """Persist every streamed batch under `root` (see SampleArchive)."""
+        if self.archive is None:
+            self.archive = SampleArchive(root, **options)
+            self._durable[self.archive] = self.stream_scheduler.add_consumer(
+                self.archive.append, maxsize=DURABLE_QUEUE, policy='drop-newest')
+        return self.archive
+
+    def enable_shared_rings(self, prefix: str = 'sensor', capacity: int = 4096) -> RingPublisher:
+        """
+        Mirror every streamed batch into shared-memory rings that other
+        processes can read with shmring.RingReader (see shmring.py).
+        """
+        if self.rings is None:
+            self.rings = RingPublisher(prefix, capacity)
+            # readers want the freshest samples: a backlog sheds its oldest batches
+            self._durable[self.rings] = self.stream_scheduler.add_consumer(
+                self.rings.append, maxsize=256, policy='drop-oldest')
+        return self.rings
+
+    def merged_stream(self, window_s: float = 2.0, **options) -> TimeMerger:
+        """
+        A new TimeMerger fed by the stream: every sensor's records on the
+        host timeline, in global time order (see timealign.py). Detach it
+        with remove_consumer(merger.consumer) when done.
+        """
+        merger = TimeMerger(self.stream_scheduler.clocks, window_s, **options)
+        merger.consumer = self.stream_scheduler.add_consumer(merger.append, maxsize=256,
+                                                             policy='drop-oldest')
+        return merger
+
+    def enable_energy(self, checkpoint_path: str = None, **options) -> EnergyIntegrator:
+        """
+        Integrate charge and energy of every streamed sensor (see
+        EnergyIntegrator), scaling the raw counts by each sensor's cached
+        current_lsb_uA.
+        """
+        if self.energy is None:
+            options.setdefault('current_lsb', self._current_lsb_uA)
+            self.energy = EnergyIntegrator(checkpoint_path, **options)
+            self._durable[self.energy] = self.stream_scheduler.add_consumer(
+                self.energy.append, maxsize=DURABLE_QUEUE, policy='drop-newest')
+        return self.energy
+
+    def _current_lsb_uA(self, board: int, addr: int, sensor: str) -> int:
+        # runs on the energy consumer's thread: cached values only, never the bus
+        cached = self.config_cache.get((board, addr, sensor), {})
+        if 'current_lsb_uA' in cached:
+            return cached['current_lsb_uA']
+        return registry.metadata(sensor).get('config_defaults', {}).get('current_lsb_uA', 1)
+
+    def get_energy(self) -> dict:
+        """{ (board, addr): {charge_mAh, energy_Wh, duration_s, samples, gaps} }."""
+        return self.energy.snapshot() if self.energy is not None else {}
+
+    def add_sink(self, sink):
+        """
+        Attach a BatchingSink (see sinks.py) as a stream consumer with a
+        DURABLE_QUEUE-deep queue; batches beyond that are dropped and counted.
+        """
+        self.sinks[sink] = self.stream_scheduler.add_consumer(sink, maxsize=DURABLE_QUEUE,
+                                                              policy='drop-newest')
+        return sink
+
+    def remove_sink(self, sink):
+        """Detach a sink, then flush and close it."""
+        consumer = self.sinks.pop(sink, None)
+        if consumer is not None:
+            self.stream_scheduler.remove_consumer(consumer)
+        sink.close()
+
+    def close(self):
+        """
+        Stop streaming and shut down what the backend opened: sinks are
+        flushed, the archive seals its open segments, the energy
+        integrator writes its checkpoint and the shared rings are
+        unlinked. Each consumer's queue is drained first. Safe to call
+        more than once.
+        """
+        self.stop_stream()
+        for sink in list(self.sinks):
+            self.remove_sink(sink)
+        for part, consumer in list(self._durable.items()):
+            self.stream_scheduler.remove_consumer(consumer)
+            part.close()
+        self._durable.clear()
+        self.archive = self.energy = self.rings = None
+
+    def read_archive(self, board: int, addr: int, start: int, end: int) -> list[dict]:
+        if self.archive is None:
+            raise RuntimeError("Archive not enabled")
+        return self.archive.records(board, addr, start, end)
+
+    # Live subscription changes (take effect at each sensor's next deadline)
+    def subscribe(self, board: int, addr: int, sensor: str, interval: float):
+        self.stream_scheduler.subscribe(board, addr, sensor, interval)
+
+    def unsubscribe(self, board: int, addr: int) -> bool:
+        return self.stream_scheduler.unsubscribe(board, addr)
+
+    def retune(self, board: int, addr: int, interval: float):
+        self.stream_scheduler.retune(board, addr, interval)
+
     # Generic setter
     def set_config(self, board, addr, sensor, field, value):
         status = self.board_mgr.select(board).set_config_field(addr, sensor, field, value)
         if status == protocol.status_codes['STATUS_OK']:
-            self.config_cache.setdefault((board, addr, sensor), {})[field] = value
+            cached = self.config_cache.setdefault((board, addr, sensor), {})
+            cached[field] = value
+            if field == 'period':
+                self.stream_scheduler.sample_periods[(board, addr)] = value * PERIOD_UNIT_MS
+            # computed fields derived from the old value are stale now
+            for computed, depends_on in registry.computed_fields(sensor).items():
+                if field in depends_on:
+                    cached.pop(computed, None)
         return status
 
     # Generic getter
@@ -101,7 +427,13 @@ class SensorBackend:
         if key in self.config_cache and field in self.config_cache[key]:
             return self.config_cache[key][field]
 
-        value = self.board_mgr.select(board).get_config_field(addr, sensor, field)
+        depends_on = registry.computed_fields(sensor).get(field)
+        if depends_on is not None:
+            # evaluated on the host from its (cached or fetched) dependencies
+            value = registry.compute_config(sensor, field, {
+                d: self.get_config_field(board, addr, sensor, d) for d in depends_on})
+        else:
+            value = self.board_mgr.select(board).get_config_field(addr, sensor, field)
         self.config_cache.setdefault(key, {})[field] = value
         return value
 
@@ -130,6 +462,40 @@ class SensorBackend:
 
         return status
 
+    # Transport metrics
+    def enable_metrics(self, enabled: bool = True):
+        """Start (or restart with fresh counters) / stop transport metrics."""
+        self.board_mgr.enable_metrics(enabled)
+
+    def get_stats(self) -> dict:
+        """Snapshot of the transport metrics, or {} when they are disabled."""
+        return self.board_mgr.metrics_snapshot()
+
+    def get_published_metrics(self) -> dict:
+        """
+        Transport, stream and consumer counters as last published by the
+        bus and scheduler threads. Never waits for the bus lock, so it is
+        safe to call from a scrape endpoint at any rate.
+        """
+        metrics = self.board_mgr.metrics
+        return {
+            'transport': metrics.published if metrics is not None else {},
+            'streams':   self.stream_scheduler.published_qos,
+            'consumers': self.stream_scheduler.consumer_stats(),
+        }
+
+    # Raw wire capture
+    def start_capture(self, path: str):
+        """Log every TX/RX chunk to `path`; replay it later with port 'replay://<path>'."""
+        return self.board_mgr.start_capture(path)
+
+    def stop_capture(self):
+        self.board_mgr.stop_capture()
+
+    def get_stream_stats(self) -> dict:
+        """Live per-sensor stream QoS: { (board, addr): {...} }."""
+        return self.stream_scheduler.qos_snapshot()
+
     # Other methods (ping, add_sensor, remove_sensor, etc.) remain unchanged for brevity.
 
     # ————————————————————————
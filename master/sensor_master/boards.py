@@ -30,6 +30,28 @@ class BoardManager:
     def timeout(self, t: float):
         self._sm.timeout = t
 
+    @property
+    def metrics(self):
+        return self._sm.metrics
+
+    def enable_metrics(self, enabled: bool = True):
+        return self._sm.enable_metrics(enabled)
+
+    def metrics_snapshot(self) -> dict:
+        return self._sm.metrics_snapshot()
+
+    def start_capture(self, path: str):
+        return self._sm.start_capture(path)
+
+    def stop_capture(self):
+        self._sm.stop_capture()
+
+    def add_hook(self, event: str, fn):
+        self._sm.add_hook(event, fn)
+
+    def remove_hook(self, event: str, fn):
+        self._sm.remove_hook(event, fn)
+
     def scan(self, start: int = 1, end: int = 255) -> list[int]:
         return self._sm.scan(start, end)
 
@@ -54,8 +76,8 @@ class _BoundMaster:
     def list_sensors(self) -> list[tuple[str, str]]:
         return self._sm.list_sensors(self._bid)
 
-    def read_samples(self, addr: int, sensor_name: str) -> list[dict]:
-        return self._sm.read_samples(self._bid, addr, sensor_name)
+    def read_samples(self, addr: int, sensor_name: str, mask_val: int = None) -> list[dict]:
+        return self._sm.read_samples(self._bid, addr, sensor_name, mask_val=mask_val)
 
     def add_sensor(self, addr: int, sensor_name: str) -> int:
         return self._sm.add_sensor(self._bid, addr, sensor_name)
@@ -103,10 +125,16 @@ class _BoundMaster:
 
     def get_all_config_fields(self, addr: int, sensor: str) -> dict:
         md = registry.metadata(sensor)
-        return {
+        computed = registry.computed_fields(sensor)
+        values = {
             fld['name']: self.get_config_field(addr, sensor, fld['name'])
             for fld in md.get('config_fields', [])
+            if fld['name'] not in computed
         }
+        # computed fields (e.g. calibration) follow from the others: no round trip
+        for field in computed:
+            values[field] = registry.compute_config(sensor, field, values)
+        return {fld['name']: values[fld['name']] for fld in md.get('config_fields', [])}
 
     def execute_cmd(self, addr: int, cmd_name: str, param: int = 0):
         """
@@ -0,0 +1,131 @@
+"""
+Offline bulk decoding of raw RS-485 response traffic with NumPy.
+
+Instead of walking a capture frame by frame, every step works on whole
+arrays: SOF candidates come from one comparison, frame checksums from a
+single prefix-XOR pass (the XOR of any byte range is the XOR of two
+prefix values), and each sensor's records are gathered with one fancy
+index and reinterpreted as a structured array of its payload layout.
+Requires numpy.
+"""
+import numpy as np
+
+from .capture import RX, read_capture
+from .protocol import protocol
+from .sensors import TYPECODES, registry
+
+SOF = protocol.constants['SOF_MARKER']
+CMD_READ_SAMPLES = protocol.commands['CMD_READ_SAMPLES']
+STATUS_OK = protocol.status_codes['STATUS_OK']
+HEADER_LEN = 6  # SOF, board, addr, cmd, status, len
+
+FRAME_DTYPE = np.dtype([
+    ('offset', np.int64), ('board', np.uint8), ('addr', np.uint8),
+    ('cmd', np.uint8), ('status', np.uint8), ('length', np.uint8),
+])
+
+
+def record_dtype(fields: list[dict]) -> np.dtype:
+    """Wire dtype of one payload record: big-endian uint32 tick + `fields`."""
+    spec = [('tick', '>u4')]
+    for f in fields:
+        order = '<' if f.get('endian') == 'little' else '>'
+        spec.append((f['name'], order + TYPECODES.get(f['type'], f"V{f['size']}")))
+    return np.dtype(spec)
+
+
+def load_rx(path: str) -> bytes:
+    """All received bytes of a capture file (see capture.py), concatenated."""
+    return b''.join(data for _, direction, data in read_capture(path) if direction == RX)
+
+
+def find_frames(buf) -> np.ndarray:
+    """
+    Locate every response frame with a valid checksum in `buf` (bytes,
+    bytearray, memoryview or mmap). Returns a FRAME_DTYPE array in stream
+    order; 'offset' is the position of the frame's SOF byte.
+
+    Frames are accepted greedily in stream order: an SOF byte inside an
+    accepted frame is treated as payload, not as the start of another
+    frame, and a candidate that was itself rejected hides nothing.
+    """
+    a = np.frombuffer(buf, dtype=np.uint8)
+    n = len(a)
+    starts = np.flatnonzero(a[:max(0, n - HEADER_LEN)] == SOF)
+    lengths = a[starts + 5].astype(np.int64)
+    ck_at = starts + HEADER_LEN + lengths
+    fits = ck_at < n
+    starts, lengths, ck_at = starts[fits], lengths[fits], ck_at[fits]
+
+    # XOR of a[start+1 : ck_at] == prefix[ck_at-1] ^ prefix[start]
+    prefix = np.bitwise_xor.accumulate(a)
+    ok = (prefix[ck_at - 1] ^ prefix[starts]) == a[ck_at]
+    starts, ck_at = starts[ok], ck_at[ok]
+
+    if len(starts) > 1:
+        # A candidate no earlier candidate reaches is always accepted; only
+        # runs of overlapping candidates (rare: an SOF inside a payload
+        # whose checksum happens to match) need the sequential walk.
+        reach = np.maximum.accumulate(ck_at)
+        keep = np.ones(len(starts), dtype=bool)
+        keep[1:] = starts[1:] > reach[:-1]
+        heads = np.flatnonzero(keep)
+        sizes = np.diff(np.append(heads, len(starts)))
+        for head, size in zip(heads[sizes > 1].tolist(), sizes[sizes > 1].tolist()):
+            end = ck_at[head]
+            for i in range(head + 1, head + size):
+                if starts[i] > end:
+                    keep[i] = True
+                    end = ck_at[i]
+        starts = starts[keep]
+
+    frames = np.empty(len(starts), dtype=FRAME_DTYPE)
+    frames['offset'] = starts
+    for i, name in enumerate(('board', 'addr', 'cmd', 'status', 'length'), start=1):
+        frames[name] = a[starts + i]
+    return frames
+
+
+def decode_samples(buf, sensors: dict, frames: np.ndarray = None) -> dict:
+    """
+    Decode every successful CMD_READ_SAMPLES response in `buf`.
+
+    `sensors` maps (board, addr) to a sensor name or a (name, mask) pair;
+    without a mask the sensor's default payload bits are assumed.
+    Returns {(board, addr): structured array} with a native-endian 'tick'
+    column plus one column per enabled payload field, in stream order.
+    Frames whose length is not a whole number of records are skipped.
+    """
+    a = np.frombuffer(buf, dtype=np.uint8)
+    if frames is None:
+        frames = find_frames(buf)
+    frames = frames[(frames['cmd'] == CMD_READ_SAMPLES)
+                    & (frames['status'] == STATUS_OK)
+                    & (frames['length'] > 0)]
+
+    out = {}
+    for (board, addr), spec in sensors.items():
+        name, mask = (spec, None) if isinstance(spec, str) else spec
+        wire = record_dtype(registry.payload_layout(name, mask))
+        size = wire.itemsize
+
+        mine = frames[(frames['board'] == board) & (frames['addr'] == addr)]
+        mine = mine[mine['length'] % size == 0]
+        lengths = mine['length'].astype(np.int64)
+        total = int(lengths.sum())
+
+        # byte positions of every payload, concatenated: the start of each
+        # frame's payload repeated over its length, plus 0..length-1
+        first = np.repeat(mine['offset'] + HEADER_LEN, lengths)
+        within = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        raw = a[first + within]
+
+        records = raw.view(wire)
+        out[(board, addr)] = records.astype(wire.newbyteorder('='))
+    return out
+
+
+def to_records(array: np.ndarray) -> list[dict]:
+    """Plain-dict records (as SensorMaster.read_samples returns) from a decoded array."""
+    names = array.dtype.names
+    return [dict(zip(names, row)) for row in array.tolist()]
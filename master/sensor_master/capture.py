@@ -0,0 +1,180 @@
+import struct
+import threading
+import time
+
+# Capture file: MAGIC, then one record per serial read()/write() chunk:
+#   uint64 ns since capture start | uint8 direction | uint16 length | data
+MAGIC = b'SMCAP\x01'
+RECORD = struct.Struct('<QBH')
+TX, RX = 0, 1
+
+REPLAY_SCHEME = 'replay://'
+
+
+class ReplayError(RuntimeError):
+    """The host diverged from the capture being replayed, or ran past its end."""
+
+
+class CaptureWriter:
+    """Appends timestamped TX/RX chunks to a capture file."""
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, 'wb')
+        self._f.write(MAGIC)
+        self._t0 = time.monotonic_ns()
+        self._lock = threading.Lock()
+        self.chunks = 0
+        self.bytes = 0
+
+    def write(self, direction: int, data: bytes):
+        t = time.monotonic_ns() - self._t0
+        with self._lock:
+            self._f.write(RECORD.pack(t, direction, len(data)) + data)
+            self.chunks += 1
+            self.bytes += len(data)
+
+    def close(self):
+        with self._lock:
+            self._f.close()
+
+
+def read_capture(path: str):
+    """Yield (ns, direction, data) for every chunk in a capture file."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if not raw.startswith(MAGIC):
+        raise ValueError(f"{path} is not a sensor_master capture")
+    offset = len(MAGIC)
+    size = RECORD.size
+    while offset + size <= len(raw):
+        t, direction, length = RECORD.unpack_from(raw, offset)
+        offset += size
+        yield t, direction, raw[offset:offset + length]
+        offset += length
+
+
+class CaptureSerial:
+    """
+    Transparent wrapper around a pyserial port that logs every chunk
+    written or read. Everything else is forwarded to the wrapped port.
+    """
+    def __init__(self, ser, writer: CaptureWriter):
+        self.__dict__['ser'] = ser
+        self.__dict__['writer'] = writer
+
+    def write(self, data):
+        self.writer.write(TX, bytes(data))
+        return self.ser.write(data)
+
+    def read(self, size: int = 1):
+        data = self.ser.read(size)
+        if data:
+            self.writer.write(RX, data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.ser, name)
+
+    def __setattr__(self, name, value):
+        # timeout / baudrate changes must reach the real port
+        setattr(self.ser, name, value)
+
+
+class ReplaySerial:
+    """
+    pyserial stand-in that plays a capture back to SensorMaster.
+
+    The capture is split into transactions: each recorded write plus the
+    bytes read after it. write() must match the next recorded write
+    (ReplayError otherwise) and makes that transaction's bytes readable;
+    reading past them returns b'' exactly like a serial timeout, so
+    timeouts, resyncs and checksum errors replay as they happened.
+
+    With realtime=True, bytes become readable at their recorded offset
+    from the write (scaled by 1/speed) and empty reads wait for the
+    timeout; otherwise the capture plays back as fast as possible.
+    """
+    def __init__(self, path: str, realtime: bool = False, speed: float = 1.0,
+                 timeout: float = None, baudrate: int = 115200):
+        self.port = REPLAY_SCHEME + path
+        self.timeout = timeout
+        self.baudrate = baudrate
+        self.realtime = realtime
+        self.speed = speed
+        self.is_open = True
+        self._transactions = []  # [(tx bytes, [(offset s, rx bytes), …], ns)]
+        leading = []
+        for t, direction, data in read_capture(path):
+            if direction == TX:
+                self._transactions.append((data, [], t))
+            elif self._transactions:
+                tx_t = self._transactions[-1][2]
+                self._transactions[-1][1].append(((t - tx_t) / 1e9, data))
+            else:
+                leading.append((0.0, data))
+        self._next = 0
+        self._load(leading)
+
+    def _load(self, chunks):
+        self._rx = bytearray()
+        self._due = []  # [(end offset in _rx, due time)]
+        start = time.monotonic()
+        for offset, data in chunks:
+            self._rx += data
+            self._due.append((len(self._rx), start + offset / self.speed))
+        self._pos = 0
+
+    @property
+    def remaining(self) -> int:
+        """Recorded transactions not yet replayed."""
+        return len(self._transactions) - self._next
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self._rx) - self._pos
+
+    def write(self, data) -> int:
+        if self._next >= len(self._transactions):
+            raise ReplayError("Capture exhausted")
+        tx, chunks, _ = self._transactions[self._next]
+        if bytes(data) != tx:
+            raise ReplayError(f"Replay diverged at transaction {self._next}: "
+                              f"sent {bytes(data).hex()}, captured {tx.hex()}")
+        self._next += 1
+        self._load(chunks)
+        return len(data)
+
+    def read(self, size: int = 1) -> bytes:
+        end = min(self._pos + size, len(self._rx))
+        if end == self._pos:
+            if self.realtime and self.timeout:
+                time.sleep(self.timeout / self.speed)
+            return b''
+        if self.realtime:
+            for chunk_end, due in self._due:
+                if chunk_end >= end:
+                    delay = due - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    break
+        data = bytes(self._rx[self._pos:end])
+        self._pos = end
+        return data
+
+    def reset_input_buffer(self):
+        self._pos = len(self._rx)
+
+    def close(self):
+        self.is_open = False
+
+
+def open_replay(url: str, timeout: float = None, baudrate: int = 115200) -> ReplaySerial:
+    """
+    Open a replay:// port: replay://<path> plays as fast as possible,
+    replay://<path>?realtime (optionally &speed=<factor>) in real time.
+    """
+    path, _, query = url[len(REPLAY_SCHEME):].partition('?')
+    options = dict(part.partition('=')[::2] for part in query.split('&') if part)
+    return ReplaySerial(path, realtime='realtime' in options,
+                        speed=float(options.get('speed') or 1.0),
+                        timeout=timeout, baudrate=baudrate)
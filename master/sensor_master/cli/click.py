@@ -13,10 +13,25 @@ STATUS_NAMES = {v: k for k, v in protocol.status_codes.items()}
               help='RS-485 serial port (e.g. COM3)')
 @click.option('--baud', '-b', default=115200, show_default=True,
               help='Serial baud rate')
+@click.option('--capture', type=click.Path(dir_okay=False, writable=True), default=None,
+              help='Log raw bus traffic to FILE (replay with --port replay://FILE)')
+@click.option('--hub', 'hub_socket', envvar='SENSOR_HUB', default=None,
+              help='Talk to a running `sensor-cli hub` daemon on this socket '
+                   'instead of opening the port')
 @click.pass_context
-def cli(ctx, port, baud):
+def cli(ctx, port, baud, capture, hub_socket):
     """CLI for interacting with the STM32 sensor hub."""
+    if hub_socket:
+        from sensor_master.client import HubClient
+        ctx.obj = HubClient(hub_socket)
+        ctx.call_on_close(ctx.obj.close)
+        return
     ctx.obj = SensorBackend(port=port, baud=baud)
+    if capture:
+        ctx.obj.start_capture(capture)
+        ctx.call_on_close(ctx.obj.stop_capture)
+    # runs before stop_capture (LIFO), so the capture sees the stream stop
+    ctx.call_on_close(ctx.obj.close)
 
 
 def handle_result(label, status):
@@ -258,14 +273,26 @@ def getmask(ctx, board, addr):
         click.echo(f"Error getting payload mask: {e}")
 
 
+def parse_sensor_spec(spec):
+    """'BOARD' or 'BOARD:ADDR' → (board, addr or None)."""
+    board, _, addr = spec.partition(':')
+    return int(board, 0), (int(addr, 0) if addr else None)
+
+
 @cli.command()
 @click.option('--interval', '-i', default=1.0, show_default=True, type=float,
               help='Seconds between prints')
+@click.option('--only', '-o', 'only', multiple=True, metavar='BOARD[:ADDR]',
+              help='Stream only this board or sensor (repeatable)')
 @click.pass_context
-def stream(ctx, interval):
-    """Stream all discovered sensors continuously."""
+def stream(ctx, interval, only):
+    """Stream all discovered sensors (or a subset) continuously."""
     import time
     backend = ctx.obj
+    try:
+        selection = [parse_sensor_spec(spec) for spec in only] or None
+    except ValueError:
+        raise click.BadParameter("expected BOARD or BOARD:ADDR", param_hint="--only")
     click.echo(f"→ Streaming every {interval}s. CTRL-C to stop.")
 
     def _cb(board, addr, sensor, records):
@@ -279,7 +306,11 @@ def stream(ctx, interval):
             )
             click.echo(f"  tick={rec['tick']}ms  {vals}")
 
-    backend.start_stream(_cb)
+    try:
+        backend.start_stream(_cb, only=selection)
+    except ValueError as e:
+        click.echo(f"Error: {e}")
+        return
 
     try:
         while backend.mode == Mode.STREAM:
@@ -289,5 +320,119 @@ def stream(ctx, interval):
         click.echo("\n→ Stream stopped.")
 
 
+@cli.command()
+@click.option('--seconds', '-t', default=10.0, show_default=True, type=float,
+              help='How long to stream before reporting')
+@click.pass_context
+def stats(ctx, seconds):
+    """Stream all sensors for a while and report bus timing statistics."""
+    import time
+    backend = ctx.obj
+    click.echo(f"→ Measuring bus traffic for {seconds}s. CTRL-C to stop early.")
+
+    # discovery runs inside start_stream; only measure the streaming traffic
+    backend.start_stream(lambda *args: None)
+    backend.enable_metrics()
+    try:
+        time.sleep(seconds)
+    except KeyboardInterrupt:
+        pass
+    backend.stop_stream()
+
+    snap = backend.get_stats()
+    if not snap:
+        click.echo("No statistics collected")
+        return
+    click.echo(f"Elapsed {snap['elapsed_s']:.2f}s  busy {snap['busy_s']:.3f}s  "
+               f"idle {snap['idle_s']:.3f}s  utilization {snap['utilization'] * 100:.1f}%")
+    if not snap['commands']:
+        click.echo("No transactions")
+        return
+    click.echo(f"{'board':>5} {'command':<22} {'count':>6} {'p50ms':>7} {'p95ms':>7} "
+               f"{'maxms':>7} {'tx':>7} {'rx':>7} {'tmo':>4} {'chk':>4} {'waitms':>7}")
+    for c in snap['commands']:
+        lat = c['latency_ms']
+        click.echo(f"{c['board']:>5} {c['name']:<22} {c['count']:>6} {lat['p50']:>7.1f} "
+                   f"{lat['p95']:>7.1f} {lat['max']:>7.1f} {c['tx_bytes']:>7} {c['rx_bytes']:>7} "
+                   f"{c['timeouts']:>4} {c['checksum_errors']:>4} {c['lock_wait_ms']['mean']:>7.2f}")
+
+
+@cli.command()
+@click.option('--socket', '-s', 'socket_path', default=None,
+              help='Unix socket to serve on (default: <tmpdir>/sensor-hub.sock)')
+@click.pass_context
+def hub(ctx, socket_path):
+    """Run a daemon that owns the port and serves `sensor-cli --hub` clients."""
+    from sensor_master.hub import HubServer
+    from sensor_master.ipc import DEFAULT_SOCKET
+    server = HubServer(ctx.obj, socket_path or DEFAULT_SOCKET)
+    click.echo(f"Serving on {server.path} (Ctrl-C to stop)")
+    try:
+        server.serve_forever()
+    except FileExistsError as e:
+        raise click.ClickException(str(e))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+@cli.command()
+@click.option('--host', default='127.0.0.1', show_default=True, help='Address to listen on')
+@click.option('--http-port', default=8080, show_default=True, help='HTTP port')
+@click.option('--metrics-port', default=None, type=int,
+              help='Also serve Prometheus metrics at http://HOST:PORT/metrics')
+@click.pass_context
+def web(ctx, host, http_port, metrics_port):
+    """Serve a local JSON + Server-Sent Events API for dashboards."""
+    from sensor_master.web import WebServer
+    server = WebServer(ctx.obj, host, http_port)
+    ctx.obj.discover()
+    exporter = None
+    if metrics_port is not None:
+        from sensor_master.exposition import MetricsServer
+        ctx.obj.enable_metrics()
+        exporter = MetricsServer(ctx.obj, host, metrics_port)
+        exporter.start()
+        click.echo(f"Metrics on http://{host}:{exporter.port}/metrics")
+    click.echo(f"Serving on http://{host}:{http_port}/api/ (Ctrl-C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if exporter is not None:
+            exporter.close()
+        ctx.obj.stop_stream()
+
+
+@cli.command()
+@click.option('--host', default='127.0.0.1', show_default=True, help='Address to listen on')
+@click.option('--tcp-port', default=5020, show_default=True, help='Modbus TCP port')
+@click.option('--rtu-pty', is_flag=True, help='Also act as an RTU slave on a pseudo-terminal')
+@click.pass_context
+def modbus(ctx, host, tcp_port, rtu_pty):
+    """Stream all sensors and serve their latest values over Modbus."""
+    import time
+    from sensor_master.modbus import ModbusGateway
+    backend = ctx.obj
+    backend.start_stream(None)
+    gateway = ModbusGateway(backend, host, tcp_port)
+    gateway.start()
+    click.echo(f"Modbus TCP on {host}:{gateway.port} (unit id = board id)")
+    if rtu_pty:
+        click.echo(f"Modbus RTU on {gateway.start_rtu_pty()}")
+    click.echo("Ctrl-C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        gateway.close()
+        backend.stop_stream()
+
+
 if __name__ == '__main__':
     cli()
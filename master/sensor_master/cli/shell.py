@@ -6,6 +6,8 @@ import time
 from sensor_master.protocol import protocol
 from sensor_master.sensors import registry
 from sensor_master.backend import SensorBackend, Mode
+from sensor_master.cli.click import parse_sensor_spec
+from sensor_master.store import to_records
 
 STATUS_NAMES = {v: k for k, v in protocol.status_codes.items()}
 
@@ -187,16 +189,51 @@ class SensorShell(cmd.Cmd):
         except Exception as e:
             print("Error reading samples:", e)
 
+    def do_history(self, arg):
+        """
+        Show the newest streamed samples kept for the current sensor.
+        Usage: history [n]
+        """
+        if None in (self.current_board, self.current_addr):
+            print("Select board and sensor first.")
+            return
+        try:
+            n = int(shlex.split(arg)[0]) if arg.strip() else 10
+            recs = to_records(self.backend.latest_samples(
+                self.current_board, self.current_addr, n
+            ))
+            if not recs:
+                print("No data")
+                return
+            fields = [k for k in recs[0] if k != 'tick']
+            headers = ["tick(ms)"] + fields
+            print("\t".join(f"{h:>12}" for h in headers))
+            for rec in recs:
+                print("\t".join(f"{rec[h]:>12}" for h in ['tick'] + fields))
+        except Exception as e:
+            print("Error reading history:", e)
+
     # --- Streaming commands ---
 
     def do_stream(self, arg):
         """
-        Stream all known sensors continuously.
-        Usage: stream [interval_s]
+        Stream all known sensors, or only the listed boards/sensors, continuously.
+        Usage: stream [interval_s] [board[:addr] ...]
         """
-        interval = float(shlex.split(arg)[0]) if arg else 1.0
-        print(f"→ Streaming all sensors every {interval}s. Press CTRL-C or 'stop'.")
-        self.backend.start_stream(self._print_cb)
+        args = shlex.split(arg)
+        try:
+            interval = float(args[0]) if args else 1.0
+            only = [parse_sensor_spec(spec) for spec in args[1:]]
+        except ValueError:
+            print("Usage: stream [interval_s] [board[:addr] ...]")
+            return
+        what = "selected sensors" if only else "all sensors"
+        print(f"→ Streaming {what} every {interval}s. Press CTRL-C or 'stop'.")
+        try:
+            self.backend.start_stream(self._print_cb, only=only or None)
+        except ValueError as e:
+            print("Error:", e)
+            return
         try:
             # loop until user interrupts
             while self.backend.mode == Mode.STREAM:
@@ -384,6 +421,10 @@ class SensorShell(cmd.Cmd):
             md = registry.metadata(name)
             print(f"{name} → defaults {md.get('config_defaults', {})}")
 
+    def postloop(self):
+        # quit, exit and Ctrl-D all end here
+        self.backend.close()
+
     def do_quit(self, arg):
         """Exit the shell."""
         return True
@@ -0,0 +1,149 @@
+import builtins
+import itertools
+import socket
+import threading
+
+from .backend import Mode
+from .dispatch import Consumer, DROP_OLDEST
+from .hub import METHODS
+from .ipc import (BATCH, DEFAULT_SOCKET, ERROR, REPLY, REQUEST,
+                  decode_batch, decode_value, encode_value, frame, read_frame)
+
+# exception types re-raised as themselves; anything else becomes HubError
+_REMOTE_ERRORS = ('ValueError', 'KeyError', 'RuntimeError', 'IOError', 'OSError',
+                  'TimeoutError', 'TypeError')
+
+
+class HubError(RuntimeError):
+    """An error raised inside the hub that has no local equivalent."""
+
+
+class HubClient:
+    """
+    Talks to a HubServer over its Unix socket and mirrors the SensorBackend
+    API: every method in hub.METHODS is a remote call taking the same
+    arguments, plus set_mode/discover and start_stream/stop_stream below.
+
+    A reader thread matches replies to requests and queues pushed stream
+    batches for a separate delivery thread that runs the stream callback,
+    so calls may be made from any thread while streaming, including from
+    inside the callback. A callback slower than the stream loses the
+    oldest undelivered batches (counted in `stream.dropped`).
+    """
+    def __init__(self, path: str = DEFAULT_SOCKET, timeout: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        self.mode = Mode.IDLE
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(path)
+        self._send_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._pending = {}  # {request id: [Event, kind, body]}
+        self._callback = None
+        self._closed = False
+        # batched=True only so the encoded batch is passed through as one argument
+        self.stream = Consumer(self._deliver, maxsize=256, policy=DROP_OLDEST, batched=True)
+        self.stream.start()
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+    def close(self):
+        self._closed = True
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)  # wakes the reader thread
+        except OSError:
+            pass
+        self._sock.close()
+        self._reader.join()
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ——— transport ———
+
+    def call(self, method: str, *args, **kwargs):
+        req_id = next(self._ids)
+        slot = self._pending[req_id] = [threading.Event(), None, None]
+        with self._send_lock:
+            self._sock.sendall(frame(REQUEST, req_id, encode_value((method, args, kwargs))))
+        if not slot[0].wait(self.timeout):
+            self._pending.pop(req_id, None)
+            raise TimeoutError(f"No reply from hub for '{method}'")
+        _, kind, body = slot
+        if kind is None:
+            raise ConnectionError("Hub connection closed")
+        value = decode_value(body)
+        if kind == ERROR:
+            name, message = value
+            exc = getattr(builtins, name, None) if name in _REMOTE_ERRORS else None
+            raise (exc or HubError)(message if exc else f"{name}: {message}")
+        return value
+
+    def _read_loop(self):
+        try:
+            while True:
+                kind, req_id, body = read_frame(self._sock)
+                if kind == BATCH:
+                    if self._callback is not None:
+                        self.stream.offer(body)
+                elif kind in (REPLY, ERROR):
+                    slot = self._pending.pop(req_id, None)
+                    if slot is not None:
+                        slot[1], slot[2] = kind, body
+                        slot[0].set()
+        except (ConnectionError, OSError) as e:
+            if not self._closed:
+                print(f"[Hub error] {e}")
+        finally:
+            # wake everyone still waiting
+            for slot in list(self._pending.values()):
+                slot[0].set()
+            self._pending.clear()
+
+    def _deliver(self, body: bytes):
+        callback = self._callback
+        if callback is not None:
+            try:
+                callback(*decode_batch(body))
+            except Exception as e:
+                print(f"[Stream error] hub client callback: {e}")
+
+    def __getattr__(self, name):
+        if name in METHODS:
+            def remote(*args, **kwargs):
+                return self.call(name, *args, **kwargs)
+            remote.__name__ = name
+            return remote
+        raise AttributeError(name)
+
+    # ——— SensorBackend counterparts that need local state ———
+
+    def discover(self, refresh: bool = False) -> dict:
+        """The hub's cached discovery (rescan with refresh=True)."""
+        return self.call('discover', refresh)
+
+    def set_mode(self, new_mode: Mode):
+        if new_mode != Mode.STREAM:
+            self.stop_stream()
+        self.mode = new_mode
+        if new_mode == Mode.DISCOVERY:
+            return self.discover(refresh=True)
+
+    def start_stream(self, callback, only=None):
+        """
+        Receive batches as callback(board, addr, name, records) on the
+        client's delivery thread; `only` filters like SensorBackend.start_stream.
+        """
+        self._callback = callback
+        self.call('start_stream', [tuple(k) for k in only] if only else None)
+        self.mode = Mode.STREAM
+
+    def stop_stream(self):
+        if self.mode == Mode.STREAM:
+            self.call('stop_stream')
+            self.mode = Mode.IDLE
+        self._callback = None
@@ -0,0 +1,157 @@
+"""
+Gorilla-style compression for sample columns.
+
+A block holds rows of (tick, value, value, …) integers. Ticks are stored
+as delta-of-delta and every value column as the zig-zag delta from its
+previous value, each with a variable-length prefix code:
+
+    0                       zero
+    10   + 7 bits           |zig-zag| < 2**7
+    110  + 12 bits          |zig-zag| < 2**12
+    1110 + 20 bits          |zig-zag| < 2**20
+    1111 + 66 bits          anything else (any difference of two int64s)
+
+A fixed-period stream therefore costs one bit per tick and a slowly
+changing reading a handful of bits per sample. Blocks are independent,
+start with a little-endian uint32 row count, and can be encoded and
+decoded incrementally.
+"""
+import struct
+
+_COUNT = struct.Struct('<I')
+_BUCKETS = ((7, 0b10, 2), (12, 0b110, 3), (20, 0b1110, 4))
+_ESCAPE_BITS = 66
+
+
+def zigzag(v: int) -> int:
+    return (v << 1) if v >= 0 else ((-v << 1) - 1)
+
+
+def unzigzag(z: int) -> int:
+    return (z >> 1) if not z & 1 else -((z + 1) >> 1)
+
+
+class BitWriter:
+    def __init__(self):
+        self._buf = bytearray()
+        self._acc = 0
+        self._n = 0
+
+    def write(self, value: int, width: int):
+        self._acc = (self._acc << width) | value
+        self._n += width
+        while self._n >= 8:
+            self._n -= 8
+            self._buf.append((self._acc >> self._n) & 0xFF)
+        self._acc &= (1 << self._n) - 1
+
+    def write_signed(self, v: int):
+        if v == 0:
+            self.write(0, 1)
+            return
+        z = zigzag(v)
+        for width, prefix, plen in _BUCKETS:
+            if z < (1 << width):
+                self.write((prefix << width) | z, plen + width)
+                return
+        self.write(0b1111, 4)
+        self.write(z, _ESCAPE_BITS)
+
+    def getvalue(self) -> bytes:
+        if self._n:
+            return bytes(self._buf) + bytes([(self._acc << (8 - self._n)) & 0xFF])
+        return bytes(self._buf)
+
+    def __len__(self):
+        return len(self._buf) + (1 if self._n else 0)
+
+
+class BitReader:
+    def __init__(self, data, offset: int = 0):
+        self._data = data
+        self._pos = offset  # byte position of the next unread byte
+        self._acc = 0
+        self._n = 0
+
+    def read(self, width: int) -> int:
+        while self._n < width:
+            self._acc = (self._acc << 8) | self._data[self._pos]
+            self._pos += 1
+            self._n += 8
+        self._n -= width
+        value = self._acc >> self._n
+        self._acc &= (1 << self._n) - 1
+        return value
+
+    def read_signed(self) -> int:
+        if not self.read(1):
+            return 0
+        for width, _, plen in _BUCKETS:
+            if not self.read(1):
+                return unzigzag(self.read(width))
+        return unzigzag(self.read(_ESCAPE_BITS))
+
+
+class BlockEncoder:
+    """
+    Streaming encoder for one block of rows with `width` value columns.
+    append() costs O(columns); getvalue() may be called at any time.
+    """
+    def __init__(self, width: int):
+        self.width = width
+        self.count = 0
+        self.first_tick = None
+        self.last_tick = None
+        self._bits = BitWriter()
+        self._delta = 0
+        self._prev = None
+
+    def append(self, tick: int, values):
+        bits = self._bits
+        if self._prev is None:
+            bits.write_signed(tick)
+            for v in values:
+                bits.write_signed(v)
+            self.first_tick = tick
+        else:
+            delta = tick - self.last_tick
+            bits.write_signed(delta - self._delta)
+            self._delta = delta
+            for v, p in zip(values, self._prev):
+                bits.write_signed(v - p)
+        self._prev = values
+        self.last_tick = tick
+        self.count += 1
+
+    @property
+    def nbytes(self) -> int:
+        return _COUNT.size + len(self._bits)
+
+    def getvalue(self) -> bytes:
+        return _COUNT.pack(self.count) + self._bits.getvalue()
+
+
+def encode_block(rows, width: int) -> bytes:
+    """Encode an iterable of (tick, *values) rows."""
+    enc = BlockEncoder(width)
+    for row in rows:
+        enc.append(row[0], row[1:])
+    return enc.getvalue()
+
+
+def decode_block(data, width: int):
+    """Yield the (tick, *values) rows of an encoded block, in order."""
+    (count,) = _COUNT.unpack_from(data, 0)
+    if not count:
+        return
+    bits = BitReader(data, _COUNT.size)
+    read = bits.read_signed
+    tick = read()
+    values = [read() for _ in range(width)]
+    yield (tick, *values)
+    delta = 0
+    for _ in range(count - 1):
+        delta += read()
+        tick += delta
+        values = [v + read() for v in values]
+        yield (tick, *values)
@@ -0,0 +1,105 @@
+from .protocol import protocol
+
+# Firmware ticks are uint32 milliseconds and wrap every ~49.7 days
+TICK_MODULO = 1 << (8 * protocol.constants['TICK_BYTES'])
+_HALF_RANGE = TICK_MODULO // 2
+# A retried read replays at most one firmware queue of samples; a tick
+# further behind than that (and than MIN_REPLAY_MS) means the board reset
+QUEUE_DEPTH = protocol.constants['QUEUE_DEPTH']
+MIN_REPLAY_MS = 10_000
+
+
+class TickTracker:
+    """
+    Continuity state for one (board, addr) stream.
+
+    process() rewrites each record's 'tick' into a 64-bit monotonic value
+    (unwrapping uint32 rollover), drops records whose tick is not newer
+    than the last accepted one but within replay_window_ms() of it
+    (duplicates from retried reads), and counts holes larger than 1.5×
+    the configured sample period as lost samples. A tick further back
+    is a board reset: it is counted in `resets` and starts a new epoch
+    one period after the last accepted tick, so the output timeline
+    keeps increasing and downstream stores never see a reset. Work per
+    record is constant.
+    """
+    __slots__ = ('period_ms', 'last_tick', 'board_tick', 'offset', 'samples',
+                 'duplicates', 'gaps', 'lost', 'wraps', 'resets')
+
+    def __init__(self, period_ms: float = None):
+        self.period_ms = period_ms
+        self.last_tick = None   # last accepted tick on the output timeline
+        self.board_tick = None  # the same sample on the board's unwrapped timeline
+        self.offset = 0         # output tick - board tick, bumped by each reset
+        self.samples = 0
+        self.duplicates = 0
+        self.gaps = 0
+        self.lost = 0
+        self.wraps = 0
+        self.resets = 0
+
+    def replay_window_ms(self) -> float:
+        """How far behind the last tick a retried read can still land."""
+        if self.period_ms:
+            return max(MIN_REPLAY_MS, 2 * QUEUE_DEPTH * self.period_ms)
+        return MIN_REPLAY_MS
+
+    def unwrap(self, raw: int) -> int:
+        """Map a raw uint32 tick onto the board's 64-bit timeline nearest the last tick."""
+        last = self.board_tick
+        if last is None:
+            return raw
+        tick = last - (last % TICK_MODULO) + raw
+        diff = tick - last
+        if diff < -_HALF_RANGE:
+            tick += TICK_MODULO
+        elif diff > _HALF_RANGE and tick >= TICK_MODULO:
+            tick -= TICK_MODULO
+        return tick
+
+    def process(self, records: list[dict]) -> list[dict]:
+        out = []
+        last = self.board_tick
+        period = self.period_ms
+        for rec in records:
+            raw = rec.get('tick')
+            if raw is None:
+                out.append(rec)
+                continue
+
+            tick = self.unwrap(raw)
+            if last is not None and tick <= last:
+                if last - tick <= self.replay_window_ms():
+                    self.duplicates += 1
+                    continue
+                # far behind anything a retry could replay: the board restarted
+                self.resets += 1
+                tick = raw
+                self.offset = self.last_tick + max(1, round(period or 1)) - raw
+            elif last is not None:
+                if tick // TICK_MODULO > last // TICK_MODULO:
+                    self.wraps += 1
+                if period:
+                    gap = tick - last
+                    if gap > 1.5 * period:
+                        self.gaps += 1
+                        self.lost += max(1, round(gap / period) - 1)
+
+            self.board_tick = last = tick
+            self.last_tick = rec['tick'] = tick + self.offset
+            out.append(rec)
+            self.samples += 1
+        return out
+
+    def snapshot(self) -> dict:
+        return {
+            'period_ms':  self.period_ms,
+            'last_tick':  self.last_tick,
+            'offset':     self.offset,
+            'samples':    self.samples,
+            'duplicates': self.duplicates,
+            'gaps':       self.gaps,
+            'lost':       self.lost,
+            'wraps':      self.wraps,
+            'resets':     self.resets,
+        }
@@ -1,13 +1,25 @@
 import serial
 import struct
 import threading
+import time
 from tqdm import tqdm
 
+from .capture import REPLAY_SCHEME, CaptureSerial, CaptureWriter, open_replay
+from .metrics import TransportMetrics
 from .protocol import protocol
 from .sensors import registry
 
 STATUS_OK = protocol.status_codes['STATUS_OK']
 
+# Transport events observable through SensorMaster.add_hook(); every hook
+# receives a time.monotonic() timestamp as its first argument:
+#   on_tx(ts, frame)                        command frame written
+#   on_rx(ts, frame)                        valid response frame (SOF..checksum)
+#   on_timeout(ts)                          no SOF before the serial timeout
+#   on_checksum_error(ts, frame, expected, got)
+#   on_resync(ts, skipped)                  bytes discarded while hunting for SOF
+HOOK_EVENTS = ('on_tx', 'on_rx', 'on_timeout', 'on_checksum_error', 'on_resync')
+
 class SensorMaster:
     """
     Low-level communication class for sending command frames and parsing responses.
@@ -20,10 +32,17 @@ class SensorMaster:
         self._lock = threading.Lock()
         self._SOF = protocol.constants['SOF_MARKER']
         self._CK_LEN = protocol.constants['CHECKSUM_LENGTH']
+        self._rx_bytes = 0
+        self.metrics = None  # TransportMetrics when enabled
+        self._hooks = {event: () for event in HOOK_EVENTS}
         self._open_serial()
 
     def _open_serial(self):
-        self.ser = serial.Serial(self._port, self._baud, timeout=self._timeout)
+        if self._port.startswith(REPLAY_SCHEME):
+            # play a capture back instead of opening hardware
+            self.ser = open_replay(self._port, self._timeout, self._baud)
+        else:
+            self.ser = serial.Serial(self._port, self._baud, timeout=self._timeout)
 
     @property
     def port(self):
@@ -52,39 +71,155 @@ class SensorMaster:
         self._timeout = new_timeout
         self.ser.timeout = new_timeout
 
+    def enable_metrics(self, enabled=True):
+        """Switch transport metrics on (fresh counters) or off."""
+        self.metrics = TransportMetrics() if enabled else None
+        return self.metrics
+
+    def metrics_snapshot(self) -> dict:
+        """
+        Fresh snapshot of the transport metrics, or {} when they are off.
+        Taken under the bus lock: the bus thread adds (board, cmd) keys
+        while it records, so the counters can't be walked concurrently.
+        """
+        with self._lock:
+            metrics = self.metrics
+            return metrics.snapshot() if metrics is not None else {}
+
+    def start_capture(self, path: str) -> CaptureWriter:
+        """
+        Log every chunk written to or read from the port, with timestamps,
+        to `path` (see capture.py). Open it later as port 'replay://<path>'.
+        """
+        with self._lock:
+            if isinstance(self.ser, CaptureSerial):
+                raise RuntimeError("Capture already running")
+            writer = CaptureWriter(path)
+            self.ser = CaptureSerial(self.ser, writer)
+        return writer
+
+    def stop_capture(self):
+        with self._lock:
+            if isinstance(self.ser, CaptureSerial):
+                self.ser.writer.close()
+                self.ser = self.ser.ser
+
+    def add_hook(self, event: str, fn):
+        """
+        Register fn for a transport event (see HOOK_EVENTS). Hook tuples are
+        replaced rather than mutated, so the bus thread never needs a lock
+        and an empty tuple costs a single truth test per frame.
+        """
+        if event not in self._hooks:
+            raise ValueError(f"Unknown hook event '{event}'")
+        self._hooks[event] = self._hooks[event] + (fn,)
+
+    def remove_hook(self, event: str, fn):
+        if event not in self._hooks:
+            raise ValueError(f"Unknown hook event '{event}'")
+        self._hooks[event] = tuple(h for h in self._hooks[event] if h is not fn)
+
+    def _emit(self, event, *args):
+        ts = time.monotonic()
+        for fn in self._hooks[event]:
+            fn(ts, *args)
+
     def _send(self, board_id, addr, cmd, param=0):
         frame = bytearray([
             self._SOF, board_id, addr, cmd, param
         ])
         frame.append(frame[1] ^ frame[2] ^ frame[3] ^ frame[4])
         self.ser.write(frame)
+        if self._hooks['on_tx']:
+            self._emit('on_tx', bytes(frame))
+        return len(frame)
 
     def _recv(self):
+        hooks = self._hooks
+        skipped = None
         while True:
             b = self.ser.read(1)
+            self._rx_bytes += len(b)
             if not b:
+                if skipped:
+                    self._emit('on_resync', bytes(skipped))
+                if hooks['on_timeout']:
+                    self._emit('on_timeout')
                 raise IOError('Timeout waiting for SOF')
             if b[0] == self._SOF:
                 break
+            if hooks['on_resync']:
+                if skipped is None:
+                    skipped = bytearray()
+                skipped += b
+        if skipped:
+            self._emit('on_resync', bytes(skipped))
 
         hdr = self.ser.read(5)
+        self._rx_bytes += len(hdr)
+        if len(hdr) < 5:
+            self._short_read('header')
         board, addr, cmd, status, length = struct.unpack('5B', hdr)
         payload = self.ser.read(length)
-        chksum = self.ser.read(self._CK_LEN)[0]
+        self._rx_bytes += len(payload)
+        if len(payload) < length:
+            self._short_read('payload')
+        ck = self.ser.read(self._CK_LEN)
+        self._rx_bytes += len(ck)
+        if len(ck) < self._CK_LEN:
+            self._short_read('checksum')
+        chksum = ck[0]
 
         chk = 0
         for byte in hdr + payload:
             chk ^= byte
+
+        if hooks['on_rx'] or hooks['on_checksum_error']:
+            frame = bytes([self._SOF]) + hdr + payload + bytes([chksum])
+            if chk != chksum:
+                self._emit('on_checksum_error', frame, chk, chksum)
+            else:
+                self._emit('on_rx', frame)
+
         if chk != chksum:
             raise ValueError(f'Checksum mismatch: expected 0x{chk:02X}, got 0x{chksum:02X}')
 
         return board, addr, cmd, status, payload
 
+    def _short_read(self, part):
+        # a frame cut off by the read timeout is a timeout, not a garbled frame
+        if self._hooks['on_timeout']:
+            self._emit('on_timeout')
+        raise IOError(f'Timeout reading frame {part}')
+
     def _execute(self, board_id, addr, cmd, param=0):
+        metrics = self.metrics
+        if metrics is None:
+            with self._lock:
+                self.ser.reset_input_buffer()
+                self._send(board_id, addr, cmd, param)
+                return self._recv()
+
+        t_wait = time.perf_counter()
         with self._lock:
-            self.ser.reset_input_buffer()
-            self._send(board_id, addr, cmd, param)
-            return self._recv()
+            t_start = time.perf_counter()
+            self._rx_bytes = 0
+            tx_bytes = 0
+            outcome = TransportMetrics.OK
+            try:
+                self.ser.reset_input_buffer()
+                tx_bytes = self._send(board_id, addr, cmd, param)
+                return self._recv()
+            except ValueError:
+                outcome = TransportMetrics.CHECKSUM
+                raise
+            except IOError:
+                outcome = TransportMetrics.TIMEOUT
+                raise
+            finally:
+                metrics.record(board_id, cmd, t_start - t_wait,
+                               time.perf_counter() - t_start,
+                               tx_bytes, self._rx_bytes, outcome)
 
     # High-level APIs
 
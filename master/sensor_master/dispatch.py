@@ -0,0 +1,180 @@
+import collections
+import threading
+import time
+
+# Backpressure policies applied when a consumer's queue is full
+BLOCK = 'block'              # wait for room (lossless, but stalls the producer)
+DROP_OLDEST = 'drop-oldest'  # discard the oldest queued item
+DROP_NEWEST = 'drop-newest'  # discard the item being offered
+POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST)
+
+
+class Consumer:
+    """
+    A stream callback serviced by its own worker thread from a bounded queue.
+
+    Plain consumers are called as callback(board, addr, name, records);
+    batched consumers are called once per scheduler tick as
+    callback([(board, addr, name, records), …]).
+    """
+    def __init__(self, callback, maxsize: int = 64, policy: str = DROP_OLDEST,
+                 batched: bool = False, observer=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown backpressure policy '{policy}'")
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.callback = callback
+        self.maxsize = maxsize
+        self.policy = policy
+        self.batched = batched
+        self.observer = observer  # observer(item, seconds) after each delivery
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = True
+        self._thread = None
+
+    @property
+    def name(self) -> str:
+        return getattr(self.callback, '__qualname__', repr(self.callback))
+
+    def offer(self, item) -> bool:
+        """
+        Queue an item for the worker. Never waits unless the policy is BLOCK.
+        Returns False if the item (or, for DROP_OLDEST, nothing) was dropped.
+        """
+        with self._cond:
+            if len(self._queue) >= self.maxsize:
+                if self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                if self.policy == DROP_OLDEST:
+                    self._queue.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self._queue) >= self.maxsize and not self._closed:
+                        self._cond.wait()
+            self._queue.append(item)
+            self._cond.notify_all()
+        return True
+
+    def start(self):
+        with self._cond:
+            if not self._closed:
+                return
+            self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Deliver whatever is still queued, then stop the worker."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                item = self._queue.popleft()
+                self._cond.notify_all()
+            self._deliver(item)
+
+    def _deliver(self, item):
+        t0 = time.perf_counter()
+        try:
+            if self.batched:
+                self.callback(item)
+            else:
+                self.callback(*item)
+            self.delivered += 1
+        except Exception as e:
+            # a failing consumer must not take its worker down
+            self.errors += 1
+            print(f"[Consumer error] {self.name}: {e}")
+            return
+        if self.observer is not None:
+            self.observer(item, time.perf_counter() - t0)
+
+    def stats(self) -> dict:
+        return {
+            'name':      self.name,
+            'policy':    self.policy,
+            'maxsize':   self.maxsize,
+            'batched':   self.batched,
+            'queued':    len(self._queue),
+            'delivered': self.delivered,
+            'dropped':   self.dropped,
+            'errors':    self.errors,
+        }
+
+
+class Dispatcher:
+    """
+    Fans decoded batches out to consumers so the bus thread only ever
+    appends to queues. Batched consumers receive everything published
+    between two end_tick() calls as one list.
+    """
+    def __init__(self):
+        self._consumers = ()  # replaced, never mutated, so publish() needs no lock
+        self._tick = []
+        self._running = False
+
+    @property
+    def consumers(self) -> tuple:
+        return self._consumers
+
+    def add_consumer(self, callback, maxsize: int = 64, policy: str = DROP_OLDEST,
+                     batched: bool = False, observer=None) -> Consumer:
+        consumer = Consumer(callback, maxsize, policy, batched, observer)
+        self._consumers = self._consumers + (consumer,)
+        if self._running:
+            consumer.start()
+        return consumer
+
+    def remove_consumer(self, consumer: Consumer):
+        self._consumers = tuple(c for c in self._consumers if c is not consumer)
+        consumer.close()
+
+    def publish(self, board, addr, name, records):
+        item = (board, addr, name, records)
+        tick = False
+        for consumer in self._consumers:
+            if consumer.batched:
+                tick = True
+            else:
+                consumer.offer(item)
+        if tick:
+            self._tick.append(item)
+
+    def end_tick(self):
+        """Hand the batches published since the last tick to batched consumers."""
+        if not self._tick:
+            return
+        batch, self._tick = self._tick, []
+        for consumer in self._consumers:
+            if consumer.batched:
+                consumer.offer(batch)
+
+    def start(self):
+        self._running = True
+        for consumer in self._consumers:
+            consumer.start()
+
+    def stop(self):
+        """Flush the pending tick, drain every queue and join the workers."""
+        self.end_tick()
+        self._running = False
+        for consumer in self._consumers:
+            consumer.close()
+
+    def stats(self) -> list[dict]:
+        return [c.stats() for c in self._consumers]
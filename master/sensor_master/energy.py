@@ -0,0 +1,190 @@
+import json
+import os
+import threading
+import time
+
+# Quantities integrated over board ticks (ms): field -> result name
+INTEGRATED = {'current_uA': 'charge', 'power_mW': 'energy'}
+# Tracks hold µA·ms and µW·ms: µA·ms -> mAh divides by this, µW·ms -> Wh by 1000× it
+_MS_PER_HOUR_X1000 = 3_600_000 * 1000
+
+
+class _Track:
+    """Running trapezoid for one field of one sensor."""
+    __slots__ = ('area2', 'last_tick', 'last_value')
+
+    def __init__(self, area2=0, last_tick=None, last_value=None):
+        self.area2 = area2  # twice the integral, in µA·ms or µW·ms (exact integer)
+        self.last_tick = last_tick
+        self.last_value = last_value
+
+
+class _SensorEnergy:
+    __slots__ = ('tracks', 'samples', 'gaps', 'covered_ms', 'interval_ms')
+
+    def __init__(self):
+        self.tracks = {field: _Track() for field in INTEGRATED}
+        self.samples = 0
+        self.gaps = 0
+        self.covered_ms = 0
+        self.interval_ms = None  # smoothed sample interval
+
+
+class EnergyIntegrator:
+    """
+    Stream consumer keeping running charge (mAh, from current_uA) and
+    energy (Wh, from power_mW) per sensor, e.g. for INA219 streams.
+
+    On the wire those fields are register counts, not physical units:
+    one current count is current_lsb_uA µA, and the power field (the
+    power register ×20, as the firmware sends it) is in units of
+    current_lsb_uA µW. `current_lsb(board, addr, name)` supplies that
+    LSB per sensor; without it the fields are taken at face value, as
+    µA and mW.
+
+    Each batch is folded in with the trapezoidal rule over board ticks;
+    the running area is an exact integer, so nothing is lost across
+    batches. An interval longer than `gap_factor` × the smoothed sample
+    interval (or `max_gap_ms`, if given) is a gap: it is counted and
+    skipped rather than bridged. A backwards tick (board reset) restarts
+    the trapezoid the same way.
+
+    With `checkpoint_path`, totals are written there as JSON at most every
+    `checkpoint_every` seconds and on close(), and loaded back on start.
+    """
+    def __init__(self, checkpoint_path: str = None, checkpoint_every: float = 30.0,
+                 gap_factor: float = 4.0, max_gap_ms: int = None, current_lsb=None):
+        self.checkpoint_path = checkpoint_path
+        self.current_lsb = current_lsb
+        self.checkpoint_every = checkpoint_every
+        self.gap_factor = gap_factor
+        self.max_gap_ms = max_gap_ms
+        self._sensors = {}  # {(board, addr): _SensorEnergy}
+        self._lock = threading.Lock()
+        self._saved = time.monotonic()
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            self._load()
+
+    # ——— integration ———
+
+    def append(self, board: int, addr: int, name: str, records: list[dict]):
+        """Stream-consumer entry point: integrate one decoded batch."""
+        if not records or not any(f in records[0] for f in INTEGRATED):
+            return
+        with self._lock:
+            st = self._sensors.get((board, addr))
+            if st is None:
+                st = self._sensors[(board, addr)] = _SensorEnergy()
+            self._integrate(st, records, self._scales(board, addr, name))
+        if self.checkpoint_path and time.monotonic() - self._saved >= self.checkpoint_every:
+            self.checkpoint()
+
+    __call__ = append
+
+    def _scales(self, board: int, addr: int, name: str) -> dict:
+        """Factors turning each integrated field into µA or µW."""
+        if self.current_lsb is None:
+            return {'current_uA': 1, 'power_mW': 1000}
+        lsb = self.current_lsb(board, addr, name)
+        return {'current_uA': lsb, 'power_mW': lsb}
+
+    def _is_gap(self, st: _SensorEnergy, dt: int) -> bool:
+        if self.max_gap_ms is not None:
+            return dt > self.max_gap_ms
+        return st.interval_ms is not None and dt > self.gap_factor * st.interval_ms
+
+    def _integrate(self, st: _SensorEnergy, records, scales: dict):
+        tracks = [(field, st.tracks[field], scales[field])
+                  for field in INTEGRATED if field in records[0]]
+        last = next((t.last_tick for _, t, _ in tracks if t.last_tick is not None), None)
+        for rec in records:
+            tick = rec['tick']
+            bridge = False
+            if last is not None:
+                dt = tick - last
+                if dt <= 0 or self._is_gap(st, dt):
+                    st.gaps += 1
+                else:
+                    bridge = True
+                    st.covered_ms += dt
+                    st.interval_ms = dt if st.interval_ms is None \
+                        else st.interval_ms + (dt - st.interval_ms) / 8.0
+            for field, track, scale in tracks:
+                v = rec[field] * scale
+                if bridge and track.last_tick == last:
+                    track.area2 += (track.last_value + v) * (tick - last)
+                track.last_tick = tick
+                track.last_value = v
+            last = tick
+            st.samples += 1
+
+    # ——— results ———
+
+    @staticmethod
+    def _summary(st: _SensorEnergy) -> dict:
+        return {
+            'charge_mAh': st.tracks['current_uA'].area2 / 2 / _MS_PER_HOUR_X1000,
+            'energy_Wh':  st.tracks['power_mW'].area2 / 2 / _MS_PER_HOUR_X1000 / 1000,
+            'duration_s': st.covered_ms / 1000.0,
+            'samples':    st.samples,
+            'gaps':       st.gaps,
+        }
+
+    def totals(self, board: int, addr: int) -> dict:
+        """Running totals for one sensor ({} if nothing was integrated yet)."""
+        with self._lock:
+            st = self._sensors.get((board, addr))
+            return self._summary(st) if st is not None else {}
+
+    def snapshot(self) -> dict:
+        """{ (board, addr): totals } for every sensor seen."""
+        with self._lock:
+            return {key: self._summary(st) for key, st in self._sensors.items()}
+
+    def reset(self, board: int, addr: int):
+        with self._lock:
+            self._sensors.pop((board, addr), None)
+
+    # ——— checkpoints ———
+
+    def checkpoint(self):
+        """Write all running state to checkpoint_path atomically."""
+        if not self.checkpoint_path:
+            return
+        with self._lock:
+            state = {
+                f"{b}:{a}": {
+                    'samples': st.samples, 'gaps': st.gaps, 'covered_ms': st.covered_ms,
+                    'interval_ms': st.interval_ms,
+                    'tracks': {f: [t.area2, t.last_tick, t.last_value]
+                               for f, t in st.tracks.items()},
+                }
+                for (b, a), st in self._sensors.items()
+            }
+            self._saved = time.monotonic()
+        tmp = self.checkpoint_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def _load(self):
+        try:
+            with open(self.checkpoint_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[Energy error] cannot load checkpoint {self.checkpoint_path}: {e}")
+            return
+        for key, saved in state.items():
+            board, addr = (int(x) for x in key.split(':'))
+            st = _SensorEnergy()
+            st.samples = saved['samples']
+            st.gaps = saved['gaps']
+            st.covered_ms = saved['covered_ms']
+            st.interval_ms = saved['interval_ms']
+            for field, values in saved['tracks'].items():
+                if field in st.tracks:
+                    st.tracks[field] = _Track(*values)
+            self._sensors[(board, addr)] = st
+
+    def close(self):
+        self.checkpoint()
@@ -0,0 +1,180 @@
+"""
+Prometheus text exposition of bus and stream health.
+
+render() turns SensorBackend.get_published_metrics() into the text
+format; MetricsServer serves it at GET /metrics. Every value comes from
+snapshots the bus and scheduler threads publish by swapping a reference,
+so a scrape never takes SensorMaster._lock or touches live counters.
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _number(v) -> str:
+    if v == float('inf'):
+        return '+Inf'
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Family:
+    """Samples of one metric name, rendered with a single HELP/TYPE header."""
+    def __init__(self, name: str, kind: str, help_text: str):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.lines = []
+
+    def add(self, labels: dict, value, suffix: str = ''):
+        self.lines.append(f"{self.name}{suffix}{_labels(labels)} {_number(value)}")
+
+    def add_histogram(self, labels: dict, hist: dict):
+        """hist is a metrics.Histogram snapshot (per-bucket, not cumulative)."""
+        seen = 0
+        for bound, n in hist['buckets']:
+            seen += n
+            self.add({**labels, 'le': _number(float(bound))}, seen, '_bucket')
+        self.add(labels, hist['sum'], '_sum')
+        self.add(labels, hist['count'], '_count')
+
+    def render(self) -> str:
+        head = f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.kind}\n"
+        return head + ''.join(line + '\n' for line in self.lines)
+
+
+def _merge(hists: list[dict]) -> dict:
+    """Sum histogram snapshots sharing the same bucket bounds."""
+    buckets = [[b, 0] for b, _ in hists[0]['buckets']]
+    for h in hists:
+        for slot, (_, n) in zip(buckets, h['buckets']):
+            slot[1] += n
+    return {'buckets': buckets,
+            'sum': sum(h['sum'] for h in hists),
+            'count': sum(h['count'] for h in hists)}
+
+
+def render(snapshot: dict) -> str:
+    """
+    Text exposition of { 'transport': TransportMetrics snapshot or {},
+    'streams': { (board, addr): QoS snapshot }, 'consumers': [stats] }.
+    """
+    families = []
+
+    def family(name, kind, help_text):
+        f = _Family(name, kind, help_text)
+        families.append(f)
+        return f
+
+    transport = snapshot.get('transport') or {}
+    if transport:
+        tx = family('sensor_bus_transactions_total', 'counter', 'Bus transactions.')
+        tmo = family('sensor_bus_timeouts_total', 'counter', 'Transactions that timed out.')
+        chk = family('sensor_bus_checksum_errors_total', 'counter',
+                     'Responses with a bad checksum.')
+        txb = family('sensor_bus_tx_bytes_total', 'counter', 'Bytes written to the bus.')
+        rxb = family('sensor_bus_rx_bytes_total', 'counter', 'Bytes read from the bus.')
+        rtt = family('sensor_bus_rtt_ms', 'histogram', 'Transaction round-trip time per board.')
+        per_board = {}
+        for c in transport['commands']:
+            labels = {'board': c['board'], 'command': c['name']}
+            tx.add(labels, c['count'])
+            tmo.add(labels, c['timeouts'])
+            chk.add(labels, c['checksum_errors'])
+            txb.add(labels, c['tx_bytes'])
+            rxb.add(labels, c['rx_bytes'])
+            per_board.setdefault(c['board'], []).append(c['latency_ms'])
+        for board, hists in sorted(per_board.items()):
+            rtt.add_histogram({'board': board}, _merge(hists))
+        family('sensor_bus_utilization', 'gauge',
+               'Fraction of time the bus was busy.').add({}, transport['utilization'])
+
+    streams = snapshot.get('streams') or {}
+    if streams:
+        samples = family('sensor_stream_samples_total', 'counter', 'Samples accepted per sensor.')
+        rate = family('sensor_stream_samples_per_second', 'gauge',
+                      'Samples accepted per second since the previous publish.')
+        errors = family('sensor_stream_poll_errors_total', 'counter', 'Polls that failed.')
+        full = family('sensor_stream_full_polls_total', 'counter',
+                      'Polls that found the firmware queue full (possible overflow).')
+        gaps = family('sensor_stream_gaps_total', 'counter', 'Tick gaps between samples.')
+        lost = family('sensor_stream_lost_samples_total', 'counter',
+                      'Samples estimated lost in tick gaps.')
+        late = family('sensor_stream_poll_lateness_ms', 'histogram',
+                      'How late each poll ran versus its deadline.')
+        for (board, addr), q in sorted(streams.items()):
+            labels = {'board': board, 'addr': f"0x{addr:02X}"}
+            cont = q.get('continuity', {})
+            samples.add(labels, cont.get('samples', q['records']))
+            rate.add(labels, q.get('samples_per_s', 0.0))
+            errors.add(labels, q['errors'])
+            full.add(labels, q['full_polls'])
+            gaps.add(labels, cont.get('gaps', q['gap_overruns']))
+            lost.add(labels, cont.get('lost', 0))
+            late.add_histogram(labels, q['lateness_ms'])
+
+    consumers = snapshot.get('consumers') or []
+    if consumers:
+        delivered = family('sensor_consumer_delivered_total', 'counter',
+                           'Items delivered to a stream consumer.')
+        dropped = family('sensor_consumer_dropped_total', 'counter',
+                         'Items dropped by a full consumer queue.')
+        queued = family('sensor_consumer_queued', 'gauge', 'Items waiting in a consumer queue.')
+        for c in consumers:
+            labels = {'consumer': c['name'], 'policy': c['policy']}
+            delivered.add(labels, c['delivered'])
+            dropped.add(labels, c['dropped'])
+            queued.add(labels, c['queued'])
+
+    return ''.join(f.render() for f in families)
+
+
+class MetricsServer:
+    """Serves render(backend.get_published_metrics()) at GET /metrics."""
+    def __init__(self, backend, host: str = '127.0.0.1', port: int = 9108):
+        self.backend = backend
+        self.host = host
+        self.port = port
+        self._httpd = None
+        self._thread = None
+
+    def start(self):
+        backend = self.backend
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0].rstrip('/') != '/metrics':
+                    self.send_error(404)
+                    return
+                body = render(backend.get_published_metrics()).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+            self._thread = None
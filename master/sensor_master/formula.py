@@ -0,0 +1,205 @@
+"""
+Safe evaluation of the arithmetic formulas in sensor metadata.
+
+Formulas are parsed with Python's own parser and checked against a small
+whitelist (numbers, variable names, + - * / // % **, unary minus and a
+few pure functions) before being compiled once, so evaluating metadata
+can never reach attributes, builtins or anything else in the process.
+
+Config formulas are written in the C the firmware generator emits, e.g.
+    ((uint16_t)(0.04096f / ((float)c->current_lsb_uA / 1e6f) + 0.5f))
+Formula.from_c() accepts the subset those use (numeric literals with
+C suffixes, `c->field`, casts to float/integer types, + - * / % and
+parentheses) and translates it into the whitelisted form above, keeping
+C's truncating integer division and wrap-around on integer casts.
+"""
+import ast
+import re
+
+FUNCTIONS = {'abs': abs, 'min': min, 'max': max, 'round': round, 'int': int, 'float': float}
+
+
+def _int_cast(bits: int, signed: bool):
+    def cast(v):
+        v = int(v) & ((1 << bits) - 1)  # int() truncates toward zero, as C does
+        return v - (1 << bits) if signed and v >> (bits - 1) else v
+    return cast
+
+
+def _cdiv(a, b):
+    if isinstance(a, int) and isinstance(b, int):
+        q = abs(a) // abs(b)
+        return q if (a < 0) == (b < 0) else -q
+    return a / b
+
+
+def _cmod(a, b):
+    if isinstance(a, int) and isinstance(b, int):
+        return a - b * _cdiv(a, b)
+    raise FormulaError("'%' needs integer operands")
+
+
+C_TYPES = {'float': 'c_float', 'double': 'c_float'}
+C_FUNCTIONS = {'c_float': float, 'c_div': _cdiv, 'c_mod': _cmod}
+for _bits in (8, 16, 32):
+    for _signed in (False, True):
+        _t = f"{'' if _signed else 'u'}int{_bits}_t"
+        C_TYPES[_t] = f"c_{_t}"
+        C_FUNCTIONS[f"c_{_t}"] = _int_cast(_bits, _signed)
+C_TYPES['int'] = C_TYPES['int32_t']
+
+_C_TOKEN = re.compile(r"""
+    \s*(?:
+      (?P<num>0[xX][0-9A-Fa-f]+[uUlL]*|(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?[fFuUlL]*)
+    | (?P<name>[A-Za-z_]\w*)
+    | (?P<op>->|[-+*/%()])
+    )""", re.VERBOSE)
+
+_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load, ast.Call,
+          ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+          ast.USub, ast.UAdd)
+
+
+class FormulaError(ValueError):
+    """A formula uses syntax outside the permitted subset."""
+
+
+class Formula:
+    """
+    One compiled formula. `names` are the variables it reads; call it
+    with a mapping that provides them.
+    """
+    __slots__ = ('text', 'names', 'functions', '_code')
+
+    def __init__(self, text: str, functions: dict = FUNCTIONS):
+        self.text = text
+        self.functions = functions
+        try:
+            tree = ast.parse(text.strip(), mode='eval')
+        except SyntaxError as e:
+            raise FormulaError(f"Cannot parse formula '{text}': {e.msg}") from None
+        names = set()
+        for node in ast.walk(tree):
+            if not isinstance(node, _NODES):
+                raise FormulaError(f"'{type(node).__name__}' is not allowed in formula '{text}'")
+            if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+                raise FormulaError(f"Only numeric constants are allowed in formula '{text}'")
+            if isinstance(node, ast.Call):
+                if not isinstance(node.func, ast.Name) or node.func.id not in functions \
+                        or node.keywords:
+                    raise FormulaError(f"Only {', '.join(functions)} may be called in formula '{text}'")
+            elif isinstance(node, ast.Name) and node.id not in functions:
+                names.add(node.id)
+        self.names = frozenset(names)
+        self._code = compile(tree, '<formula>', 'eval')
+
+    def __call__(self, values: dict):
+        missing = self.names.difference(values)
+        if missing:
+            raise KeyError(f"Formula '{self.text}' needs {', '.join(sorted(missing))}")
+        env = dict(self.functions)
+        env.update((n, values[n]) for n in self.names)
+        return eval(self._code, {'__builtins__': {}}, env)
+
+    @classmethod
+    def from_c(cls, text: str) -> 'Formula':
+        """Compile a C config formula (see the module docstring); `c->x` reads `x`."""
+        formula = cls(_CParser(text).translate(), {**FUNCTIONS, **C_FUNCTIONS})
+        formula.text = text
+        return formula
+
+    def __repr__(self):
+        return f"Formula({self.text!r})"
+
+
+class _CParser:
+    """Recursive-descent translation of a C expression into Formula syntax."""
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = []
+        pos, end = 0, len(text.rstrip())
+        while pos < end:
+            m = _C_TOKEN.match(text, pos)
+            if m is None or m.end() == pos:
+                raise FormulaError(f"Unexpected '{text[pos:].strip()[:10]}' in formula '{text}'")
+            self.tokens.append((m.lastgroup, m.group(m.lastgroup)))
+            pos = m.end()
+        self.pos = 0
+
+    def translate(self) -> str:
+        out = self._sum()
+        if self.pos != len(self.tokens):
+            self._fail()
+        return out
+
+    def _peek(self, offset: int = 0):
+        i = self.pos + offset
+        return self.tokens[i] if i < len(self.tokens) else (None, None)
+
+    def _take(self, value: str = None):
+        tok = self._peek()
+        if tok[0] is None or (value is not None and tok[1] != value):
+            self._fail()
+        self.pos += 1
+        return tok[1]
+
+    def _fail(self):
+        tok = self._peek()[1]
+        where = f"'{tok}'" if tok is not None else 'end of input'
+        raise FormulaError(f"Unexpected {where} in formula '{self.text}'")
+
+    def _sum(self) -> str:
+        out = self._product()
+        while self._peek()[1] in ('+', '-'):
+            op = self._take()
+            out = f"({out} {op} {self._product()})"
+        return out
+
+    def _product(self) -> str:
+        out = self._unary()
+        while self._peek()[1] in ('*', '/', '%'):
+            op = self._take()
+            rhs = self._unary()
+            out = f"({out} * {rhs})" if op == '*' else \
+                f"c_{'div' if op == '/' else 'mod'}({out}, {rhs})"
+        return out
+
+    def _unary(self) -> str:
+        kind, value = self._peek()
+        if value in ('-', '+'):
+            self._take()
+            return f"({value}{self._unary()})"
+        if value == '(' and self._peek(1)[1] in C_TYPES and self._peek(2)[1] == ')':
+            self.pos += 3
+            return f"{C_TYPES[self._peek(-2)[1]]}({self._unary()})"
+        return self._primary()
+
+    def _primary(self) -> str:
+        kind, value = self._peek()
+        if kind == 'num':
+            self._take()
+            return self._number(value)
+        if kind == 'name':
+            self._take()
+            if self._peek()[1] == '->':  # c->field
+                self._take()
+                if self._peek()[0] != 'name':
+                    self._fail()
+                value = self._take()
+            if value in FUNCTIONS or value in C_FUNCTIONS:
+                raise FormulaError(f"'{value}' is reserved in formula '{self.text}'")
+            return value
+        if value == '(':
+            self._take()
+            out = self._sum()
+            self._take(')')
+            return out
+        self._fail()
+
+    @staticmethod
+    def _number(literal: str) -> str:
+        if literal[:2].lower() == '0x':
+            return str(int(literal.rstrip('uUlL'), 16))
+        is_float = literal[-1] in 'fF' or any(ch in literal for ch in '.eE')
+        literal = literal.rstrip('fFuUlL')
+        return repr(float(literal)) if is_float else str(int(literal))
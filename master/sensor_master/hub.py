@@ -0,0 +1,195 @@
+import os
+import socket
+import threading
+
+from .backend import SensorBackend
+from .dispatch import Consumer, DROP_OLDEST
+from .ipc import (BATCH, DEFAULT_SOCKET, ERROR, REPLY, REQUEST,
+                  decode_value, encode_batch, encode_value, frame, read_frame)
+
+# SensorBackend methods a client may call directly, by name
+METHODS = frozenset((
+    'ping', 'scan_boards', 'list_sensors', 'add_sensor', 'remove_sensor', 'read_samples',
+    'set_config', 'get_config_field', 'get_all_configs',
+    'get_payload_mask', 'set_payload_mask',
+    'enable_metrics', 'get_stats', 'get_stream_stats', 'get_consumer_stats', 'get_energy',
+    'latest_samples', 'samples_since', 'samples_window', 'rollup_series', 'read_archive',
+    'subscribe', 'unsubscribe', 'retune',
+))
+
+
+def _shutdown(sock):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class _Client:
+    """
+    One connected client. Writes are serialized by a lock; stream batches
+    go through the client's own bounded Consumer, so a slow reader only
+    ever loses its own (oldest) batches.
+    """
+    def __init__(self, sock):
+        self.sock = sock
+        self.only = None  # set of (board, addr|None) while streaming; empty = everything
+        self._lock = threading.Lock()
+        # batched=True only so the encoded frame is passed through as one argument
+        self.stream = Consumer(self.send, maxsize=256, policy=DROP_OLDEST, batched=True)
+
+    def send(self, data: bytes):
+        with self._lock:
+            self.sock.sendall(data)
+
+    def wants(self, board: int, addr: int) -> bool:
+        only = self.only
+        return only is not None and (not only or (board, addr) in only or (board, None) in only)
+
+
+class HubServer:
+    """
+    Long-running daemon owning one SensorBackend (and so the serial port),
+    serving many local clients over a Unix socket (see ipc.py for the
+    wire format and client.py for the client library).
+
+    Discovery runs once at start and is served from cache afterwards;
+    config and payload masks are cached by the backend as usual. The bus
+    streams while at least one client is subscribed; every batch is
+    encoded once and fanned out to the interested clients.
+    """
+    def __init__(self, backend: SensorBackend, path: str = DEFAULT_SOCKET):
+        self.backend = backend
+        self.path = path
+        self._clients = set()
+        self._lock = threading.Lock()
+        self._sock = None
+        self._inode = None  # of the socket file we bound, so close() removes only ours
+        self._thread = None
+        self.backend.add_consumer(self._broadcast, maxsize=256)
+
+    # ——— lifecycle ———
+
+    def start(self, discover: bool = True):
+        """
+        Bind the socket and accept clients on a background thread. Raises
+        FileExistsError if another hub is already serving the path; a
+        socket file nobody answers on is left over from a previous run
+        and replaced.
+        """
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except FileNotFoundError:
+                pass  # removed meanwhile
+            except ConnectionRefusedError:
+                os.unlink(self.path)  # stale socket from a previous run
+            else:
+                raise FileExistsError(f"A hub is already serving {self.path}")
+            finally:
+                probe.close()
+        if discover:
+            self.backend.discover()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        self._inode = os.stat(self.path).st_ino
+        self._sock.listen()
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+        self._thread.start()
+
+    def serve_forever(self, discover: bool = True):
+        self.start(discover)
+        self._thread.join()
+
+    def close(self):
+        # shutdown() rather than close() alone: it wakes threads blocked in accept/recv
+        if self._sock is not None:
+            _shutdown(self._sock)
+            self._sock.close()
+            self._sock = None
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            _shutdown(client.sock)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.backend.stop_stream()
+        try:
+            if self._inode is not None and os.stat(self.path).st_ino == self._inode:
+                os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self._inode = None
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return  # socket closed
+            client = _Client(conn)
+            with self._lock:
+                self._clients.add(client)
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    # ——— requests ———
+
+    def _serve(self, client: _Client):
+        try:
+            while True:
+                kind, req_id, body = read_frame(client.sock)
+                if kind != REQUEST:
+                    continue
+                try:
+                    method, args, kwargs = decode_value(body)
+                    reply = frame(REPLY, req_id, encode_value(self._call(client, method, args, kwargs)))
+                except Exception as e:
+                    reply = frame(ERROR, req_id, encode_value((type(e).__name__, str(e))))
+                client.send(reply)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self._stop_streaming(client)
+            with self._lock:
+                self._clients.discard(client)
+            client.sock.close()
+
+    def _call(self, client: _Client, method: str, args, kwargs):
+        if method == 'discover':
+            return self.backend.discover(*args, **kwargs)
+        if method == 'start_stream':
+            return self._start_streaming(client, *args, **kwargs)
+        if method == 'stop_stream':
+            return self._stop_streaming(client)
+        if method not in METHODS:
+            raise ValueError(f"Unknown hub method '{method}'")
+        return getattr(self.backend, method)(*args, **kwargs)
+
+    # ——— streaming ———
+
+    def _start_streaming(self, client: _Client, only=None):
+        client.only = {tuple(k) for k in only} if only else set()
+        client.stream.start()
+        # the first subscriber starts the bus stream from cached discovery
+        self.backend.start_stream(None, rescan=False)
+
+    def _stop_streaming(self, client: _Client):
+        if client.only is None:
+            return
+        client.only = None
+        client.stream.close()
+        with self._lock:
+            streaming = any(c.only is not None for c in self._clients)
+        if not streaming:
+            self.backend.stop_stream()
+
+    def _broadcast(self, board, addr, name, records):
+        data = None
+        with self._lock:
+            clients = [c for c in self._clients if c.wants(board, addr)]
+        for client in clients:
+            if data is None:
+                data = frame(BATCH, 0, encode_batch(board, addr, name, records))
+            client.stream.offer(data)
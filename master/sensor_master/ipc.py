@@ -0,0 +1,176 @@
+"""
+Binary framing shared by the hub daemon (hub.py) and its client (client.py).
+
+Every message is a FRAME header (kind, request id, body length) followed
+by the body. Requests and replies carry values in a small tagged encoding
+(encode_value / decode_value); stream batches are sent as fixed-width
+little-endian records of the sensor's payload layout, the same records
+the on-disk archive uses.
+"""
+import os
+import struct
+import tempfile
+
+from .archive import record_struct
+from .sensors import registry
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), 'sensor-hub.sock')
+
+FRAME = struct.Struct('<BII')  # kind, request id, body length
+REQUEST, REPLY, ERROR, BATCH = 1, 2, 3, 4
+
+BATCH_HEADER = struct.Struct('<BBBBI')  # board, addr, sensor type code, mask, count
+
+_F64 = struct.Struct('<d')
+
+
+# ——— values ———
+
+def _varint(out: bytearray, n: int):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(buf, pos: int):
+    n = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _encode(out: bytearray, v):
+    if v is None:
+        out += b'N'
+    elif v is True:
+        out += b'T'
+    elif v is False:
+        out += b'F'
+    elif isinstance(v, int):
+        out += b'i'
+        _varint(out, (v << 1) if v >= 0 else ((-v << 1) - 1))
+    elif isinstance(v, float):
+        out += b'f' + _F64.pack(v)
+    elif isinstance(v, str):
+        data = v.encode()
+        out += b's'
+        _varint(out, len(data))
+        out += data
+    elif isinstance(v, (bytes, bytearray)):
+        out += b'b'
+        _varint(out, len(v))
+        out += v
+    elif isinstance(v, dict):
+        out += b'd'
+        _varint(out, len(v))
+        for k, item in v.items():
+            _encode(out, k)
+            _encode(out, item)
+    elif isinstance(v, tuple):
+        out += b't'
+        _varint(out, len(v))
+        for item in v:
+            _encode(out, item)
+    else:
+        # lists, and any other sequence (e.g. array columns) as a list
+        items = list(v)
+        out += b'l'
+        _varint(out, len(items))
+        for item in items:
+            _encode(out, item)
+
+
+def encode_value(v) -> bytes:
+    out = bytearray()
+    _encode(out, v)
+    return bytes(out)
+
+
+def _decode(buf, pos: int):
+    tag = buf[pos]
+    pos += 1
+    if tag == 0x4E:    # N
+        return None, pos
+    if tag == 0x54:    # T
+        return True, pos
+    if tag == 0x46:    # F
+        return False, pos
+    if tag == 0x69:    # i
+        z, pos = _read_varint(buf, pos)
+        return (z >> 1) if not z & 1 else -((z + 1) >> 1), pos
+    if tag == 0x66:    # f
+        return _F64.unpack_from(buf, pos)[0], pos + _F64.size
+    if tag in (0x73, 0x62):  # s, b
+        n, pos = _read_varint(buf, pos)
+        data = bytes(buf[pos:pos + n])
+        return (data.decode() if tag == 0x73 else data), pos + n
+    if tag == 0x64:    # d
+        n, pos = _read_varint(buf, pos)
+        out = {}
+        for _ in range(n):
+            k, pos = _decode(buf, pos)
+            out[k], pos = _decode(buf, pos)
+        return out, pos
+    if tag in (0x6C, 0x74):  # l, t
+        n, pos = _read_varint(buf, pos)
+        items = []
+        for _ in range(n):
+            item, pos = _decode(buf, pos)
+            items.append(item)
+        return (tuple(items) if tag == 0x74 else items), pos
+    raise ValueError(f"Bad value tag 0x{tag:02X}")
+
+
+def decode_value(buf):
+    return _decode(buf, 0)[0]
+
+
+# ——— stream batches ———
+
+def encode_batch(board: int, addr: int, name: str, records: list[dict]) -> bytes:
+    """One decoded batch as BATCH_HEADER + fixed-width records."""
+    present = [k for k in records[0] if k != 'tick'] if records else []
+    mask = registry.mask_for(name, present)
+    layout = registry.payload_layout(name, mask)
+    names = [f['name'] for f in layout]
+    pack = record_struct(layout).pack
+    body = b''.join(pack(r['tick'], *[r[n] for n in names]) for r in records)
+    return BATCH_HEADER.pack(board, addr, registry.type_code(name), mask, len(records)) + body
+
+
+def decode_batch(buf) -> tuple:
+    """Inverse of encode_batch: (board, addr, name, records)."""
+    board, addr, code, mask, count = BATCH_HEADER.unpack_from(buf, 0)
+    name = registry.name_from_type(code)
+    layout = registry.payload_layout(name, mask)
+    keys = ['tick'] + [f['name'] for f in layout]
+    rec = record_struct(layout)
+    body = memoryview(buf)[BATCH_HEADER.size:BATCH_HEADER.size + count * rec.size]
+    return board, addr, name, [dict(zip(keys, row)) for row in rec.iter_unpack(body)]
+
+
+# ——— framing ———
+
+def frame(kind: int, req_id: int, body: bytes) -> bytes:
+    return FRAME.pack(kind, req_id, len(body)) + body
+
+
+def _recv_exact(sock, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("Hub connection closed")
+        buf += chunk
+    return bytes(buf)
+
+
+def read_frame(sock) -> tuple:
+    """Block for the next frame: (kind, request id, body)."""
+    kind, req_id, length = FRAME.unpack(_recv_exact(sock, FRAME.size))
+    return kind, req_id, _recv_exact(sock, length) if length else b''
@@ -0,0 +1,242 @@
+import bisect
+import time
+
+from .protocol import protocol
+
+# Upper bounds (ms) of the latency histogram buckets; a final +Inf bucket is implied
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+COMMAND_NAMES = {v: k for k, v in protocol.commands.items()}
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. The bucket array is allocated once, so
+    observe() is a bisect plus three additions.
+    """
+    __slots__ = ('bounds', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (max for +Inf)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= rank:
+                return float(bound)
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            'buckets': list(zip(self.bounds + (float('inf'),), self.counts)),
+            'count':   self.count,
+            'sum':     self.sum,
+            'mean':    self.sum / self.count if self.count else 0.0,
+            'max':     self.max,
+            'p50':     self.quantile(0.50),
+            'p95':     self.quantile(0.95),
+            'p99':     self.quantile(0.99),
+        }
+
+
+class CommandStats:
+    """Counters for one (board, command) pair."""
+    __slots__ = ('latency', 'lock_wait', 'tx_bytes', 'rx_bytes',
+                 'timeouts', 'checksum_errors', 'busy_s')
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.lock_wait = Histogram()
+        self.tx_bytes = 0
+        self.rx_bytes = 0
+        self.timeouts = 0
+        self.checksum_errors = 0
+        self.busy_s = 0.0
+
+
+class TransportMetrics:
+    """
+    Per-board, per-command transport statistics collected by
+    SensorMaster._execute while the bus lock is held, so recording
+    needs no locking of its own.
+
+    Busy time is the time spent holding the bus for a transaction;
+    idle time is the rest of the wall-clock time since the last reset.
+
+    Readers on other threads should use `published`: a snapshot rebuilt
+    by the recording thread at most every `publish_interval` seconds and
+    swapped in as a whole, so reading it never waits for the bus.
+    snapshot() walks the live counters and must run under the bus lock
+    (SensorMaster.metrics_snapshot takes it).
+    """
+    OK = 'ok'
+    TIMEOUT = 'timeout'
+    CHECKSUM = 'checksum'
+
+    def __init__(self, publish_interval: float = 1.0):
+        self.publish_interval = publish_interval
+        self.reset()
+
+    def reset(self):
+        self._stats = {}  # {(board, cmd): CommandStats}
+        self._started = time.monotonic()
+        self._published_at = float('-inf')
+        self.busy_s = 0.0
+        self.published = {}
+
+    def record(self, board: int, cmd: int, lock_wait_s: float, busy_s: float,
+               tx_bytes: int, rx_bytes: int, outcome: str = OK):
+        st = self._stats.get((board, cmd))
+        if st is None:
+            st = self._stats[(board, cmd)] = CommandStats()
+
+        st.lock_wait.observe(lock_wait_s * 1000.0)
+        st.latency.observe(busy_s * 1000.0)
+        st.tx_bytes += tx_bytes
+        st.rx_bytes += rx_bytes
+        st.busy_s += busy_s
+        self.busy_s += busy_s
+
+        if outcome == self.TIMEOUT:
+            st.timeouts += 1
+        elif outcome == self.CHECKSUM:
+            st.checksum_errors += 1
+
+        now = time.monotonic()
+        if now - self._published_at >= self.publish_interval:
+            self._published_at = now
+            self.published = self.snapshot()
+
+    def snapshot(self) -> dict:
+        """
+        Return a plain-dict copy of all counters:
+          { 'elapsed_s', 'busy_s', 'idle_s', 'utilization',
+            'commands': [ {board, cmd, name, count, latency_ms, lock_wait_ms, ...}, … ] }
+        """
+        elapsed = time.monotonic() - self._started
+        busy = self.busy_s
+        commands = []
+        for (board, cmd), st in sorted(self._stats.items()):
+            commands.append({
+                'board':           board,
+                'cmd':             cmd,
+                'name':            COMMAND_NAMES.get(cmd, f"0x{cmd:02X}"),
+                'count':           st.latency.count,
+                'tx_bytes':        st.tx_bytes,
+                'rx_bytes':        st.rx_bytes,
+                'timeouts':        st.timeouts,
+                'checksum_errors': st.checksum_errors,
+                'busy_s':          st.busy_s,
+                'latency_ms':      st.latency.snapshot(),
+                'lock_wait_ms':    st.lock_wait.snapshot(),
+            })
+        return {
+            'elapsed_s':   elapsed,
+            'busy_s':      busy,
+            'idle_s':      max(0.0, elapsed - busy),
+            'utilization': busy / elapsed if elapsed > 0 else 0.0,
+            'commands':    commands,
+        }
+
+
+# Bucket bounds for the per-subscription stream histograms
+LATENESS_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+TICK_GAP_BUCKETS_MS = (10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class StreamQoS:
+    """
+    Service-quality counters for one stream subscription (board, addr):
+    how late each poll ran versus its deadline, how many records each poll
+    returned, the firmware tick gaps between consecutive samples and how
+    long the consumer callback took.
+
+    A poll returning QUEUE_DEPTH records means the firmware queue was full,
+    so older samples may have been overwritten; a tick gap larger than
+    1.5× the expected sample period is counted as a gap overrun.
+    """
+    QUEUE_DEPTH = protocol.constants['QUEUE_DEPTH']
+
+    def __init__(self, period_ms: float):
+        self.period_ms = period_ms
+        self.polls = 0
+        self.errors = 0
+        self.records = 0
+        self.full_polls = 0
+        self.gap_overruns = 0
+        self.jitter_ms = 0.0
+        self.last_tick = None
+        self._last_lateness = None
+        self.lateness = Histogram(LATENESS_BUCKETS_MS)
+        self.per_poll = Histogram(tuple(range(self.QUEUE_DEPTH + 1)))
+        self.tick_gaps = Histogram(TICK_GAP_BUCKETS_MS)
+        self.callback = Histogram()
+
+    def record_poll(self, scheduled: float, started: float, records):
+        """Account for one poll that was due at `scheduled` and ran at `started` (seconds)."""
+        late_ms = max(0.0, (started - scheduled) * 1000.0)
+        self.lateness.observe(late_ms)
+        if self._last_lateness is not None:
+            # RFC 3550-style smoothed jitter of the lateness
+            self.jitter_ms += (abs(late_ms - self._last_lateness) - self.jitter_ms) / 16.0
+        self._last_lateness = late_ms
+
+        n = len(records)
+        self.polls += 1
+        self.records += n
+        self.per_poll.observe(n)
+        if n >= self.QUEUE_DEPTH:
+            self.full_polls += 1
+
+        limit = 1.5 * self.period_ms
+        last = self.last_tick
+        for rec in records:
+            tick = rec.get('tick')
+            if tick is None:
+                continue
+            if last is not None and tick > last:
+                gap = tick - last
+                self.tick_gaps.observe(gap)
+                if gap > limit:
+                    self.gap_overruns += 1
+            last = tick
+        self.last_tick = last
+
+    def record_error(self):
+        self.polls += 1
+        self.errors += 1
+
+    def record_callback(self, seconds: float):
+        self.callback.observe(seconds * 1000.0)
+
+    def snapshot(self) -> dict:
+        return {
+            'period_ms':    self.period_ms,
+            'polls':        self.polls,
+            'errors':       self.errors,
+            'records':      self.records,
+            'full_polls':   self.full_polls,
+            'gap_overruns': self.gap_overruns,
+            'jitter_ms':    self.jitter_ms,
+            'last_tick':    self.last_tick,
+            'lateness_ms':  self.lateness.snapshot(),
+            'per_poll':     self.per_poll.snapshot(),
+            'tick_gap_ms':  self.tick_gaps.snapshot(),
+            'callback_ms':  self.callback.snapshot(),
+        }
@@ -0,0 +1,259 @@
+"""
+Modbus gateway serving the backend's caches to SCADA pollers.
+
+Every request is answered from the stream history (latest samples) and
+the config cache; nothing here ever touches the RS-485 bus, so any
+number of pollers can read at any rate.
+
+Addressing: the Modbus unit id is the board id, and each sensor owns a
+block of REGS_PER_SENSOR registers starting at addr × REGS_PER_SENSOR.
+
+  Input registers (FC 4), per sensor block:
+    0-3   tick of the latest sample (uint64, big-endian words)
+    4     bitmask of the payload fields present in that sample
+    5…    payload_fields in metadata order, one register per 16 bits
+  Holding registers (FC 3), per sensor block:
+    0…    scalar config_fields in metadata order, as last cached
+
+Signed values are two's complement. Only reads (FC 3 and 4) are served;
+anything else gets an ILLEGAL FUNCTION exception.
+"""
+import os
+import socketserver
+import struct
+import threading
+
+from .sensors import TYPECODES, registry
+
+REGS_PER_SENSOR = 32
+TICK_REGS = 4
+VALID_REG = 4
+FIELDS_REG = 5
+
+READ_HOLDING, READ_INPUT = 0x03, 0x04
+ILLEGAL_FUNCTION, ILLEGAL_ADDRESS, ILLEGAL_VALUE = 0x01, 0x02, 0x03
+GATEWAY_NO_RESPONSE = 0x0B
+BROADCAST = 0  # RTU unit id that slaves must never answer
+MAX_READ = 125
+
+MBAP = struct.Struct('>HHHB')  # transaction, protocol, length, unit
+
+
+def _regs(ctype: str) -> int:
+    """16-bit registers holding one value of a payload/config C type."""
+    return max(1, struct.calcsize('>' + TYPECODES[ctype]) // 2)
+
+
+def register_map(sensor: str) -> dict:
+    """
+    Register layout of one sensor block, derived from its metadata:
+      { 'input':   [(name, offset, count, type), …],
+        'holding': [(name, offset, count, type), …] }
+    """
+    md = registry.metadata(sensor)
+    inputs = [('tick', 0, TICK_REGS, 'uint64'), ('valid_mask', VALID_REG, 1, 'uint16')]
+    offset = FIELDS_REG
+    for f in md['payload_fields']:
+        n = _regs(f['type']) if f['type'] in TYPECODES else 1
+        inputs.append((f['name'], offset, n, f['type']))
+        offset += n
+    holding = []
+    offset = 0
+    for f in md.get('config_fields', []):
+        if f['type'] not in TYPECODES:
+            continue  # e.g. the uint8[8] bulk 'all' field
+        n = _regs(f['type'])
+        holding.append((f['name'], offset, n, f['type']))
+        offset += n
+    return {'input': inputs, 'holding': holding}
+
+
+def _words(value: int, count: int) -> list[int]:
+    value &= (1 << (16 * count)) - 1  # two's complement for negatives
+    return [(value >> (16 * (count - 1 - i))) & 0xFFFF for i in range(count)]
+
+
+def crc16(data: bytes) -> int:
+    """Modbus RTU CRC (poly 0xA001, init 0xFFFF)."""
+    crc = 0xFFFF
+    for b in data:
+        crc ^= b
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+class ModbusGateway:
+    """
+    Modbus TCP server (and optional RTU slave on a pseudo-terminal) over
+    a SensorBackend's caches. The backend should be streaming, since the
+    input registers show the latest streamed sample.
+    """
+    def __init__(self, backend, host: str = '127.0.0.1', port: int = 5020):
+        self.backend = backend
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.exceptions = 0
+        self._maps = {}  # {sensor: register_map()}
+        self._tcp = None
+        self._threads = []
+        self._pty = None  # (master fd, slave fd)
+
+    # ——— register image ———
+
+    def _sensors(self, board: int) -> dict:
+        """{addr: sensor name} on `board`, from discovery or streamed history."""
+        found = {s['addr']: s['name'] for s in (self.backend.discovery_cache or {}).get(board, [])}
+        for b, a in self.backend.store.keys():
+            if b == board and a not in found:
+                found[a] = self.backend.store.sensor(b, a)
+        return found
+
+    def _block(self, board: int, addr: int, sensor: str, function: int) -> list[int]:
+        layout = self._maps.get(sensor)
+        if layout is None:
+            layout = self._maps[sensor] = register_map(sensor)
+        regs = [0] * REGS_PER_SENSOR
+        if function == READ_INPUT:
+            latest = self.backend.store.latest(board, addr, 1)
+            if latest and len(latest['tick']):
+                valid = 0
+                for bit, (name, offset, count, _) in enumerate(layout['input']):
+                    if name in latest:
+                        regs[offset:offset + count] = _words(latest[name][-1], count)
+                        if offset >= FIELDS_REG:
+                            valid |= 1 << (bit - 2)
+                regs[VALID_REG] = valid
+        else:
+            config = self.backend.config_cache.get((board, addr, sensor), {})
+            for name, offset, count, _ in layout['holding']:
+                value = config.get(name)
+                if isinstance(value, int):
+                    regs[offset:offset + count] = _words(value, count)
+        return regs
+
+    def read_registers(self, unit: int, function: int, start: int, count: int) -> list[int]:
+        """
+        Registers [start, start+count) of board `unit`. Raises ValueError with
+        a Modbus exception code as its argument when the request is invalid.
+        """
+        if function not in (READ_HOLDING, READ_INPUT):
+            raise ValueError(ILLEGAL_FUNCTION)
+        if not 1 <= count <= MAX_READ or start + count > 0x10000:
+            raise ValueError(ILLEGAL_VALUE)
+        sensors = self._sensors(unit)
+        if not sensors:
+            raise ValueError(GATEWAY_NO_RESPONSE)
+        out = []
+        for addr in range(start // REGS_PER_SENSOR, (start + count - 1) // REGS_PER_SENSOR + 1):
+            if addr not in sensors:
+                raise ValueError(ILLEGAL_ADDRESS)
+            out += self._block(unit, addr, sensors[addr], function)
+        first = start % REGS_PER_SENSOR
+        return out[first:first + count]
+
+    def handle_pdu(self, unit: int, pdu: bytes) -> bytes:
+        """Answer one request PDU (function code + data) with a response PDU."""
+        self.requests += 1
+        function = pdu[0] if pdu else 0
+        try:
+            if len(pdu) != 5:
+                raise ValueError(ILLEGAL_FUNCTION if function not in (READ_HOLDING, READ_INPUT)
+                                 else ILLEGAL_VALUE)
+            start, count = struct.unpack('>HH', pdu[1:5])
+            regs = self.read_registers(unit, function, start, count)
+        except ValueError as e:
+            self.exceptions += 1
+            return bytes([function | 0x80, e.args[0]])
+        return bytes([function, 2 * len(regs)]) + struct.pack(f'>{len(regs)}H', *regs)
+
+    # ——— Modbus TCP ———
+
+    def start(self):
+        """Serve Modbus TCP on host:port from a background thread."""
+        gateway = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                sock = self.request
+                while True:
+                    header = _recv_exact(sock, MBAP.size)
+                    if header is None:
+                        return
+                    tid, proto, length, unit = MBAP.unpack(header)
+                    pdu = _recv_exact(sock, length - 1) if length > 1 else b''
+                    if pdu is None:
+                        return
+                    if proto != 0:
+                        continue
+                    reply = gateway.handle_pdu(unit, pdu)
+                    sock.sendall(MBAP.pack(tid, 0, len(reply) + 1, unit) + reply)
+
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        self._tcp = Server((self.host, self.port), Handler)
+        self.port = self._tcp.server_address[1]
+        thread = threading.Thread(target=self._tcp.serve_forever, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    # ——— Modbus RTU on a pseudo-terminal ———
+
+    def start_rtu_pty(self) -> str:
+        """
+        Act as an RTU slave on a new pseudo-terminal and return the path of
+        its other end for the poller to open. Requests are the fixed
+        8-byte read frames (unit, function, start, count, CRC); broadcast
+        frames (unit 0) get no reply, as on a real RTU line.
+        """
+        master, slave = os.openpty()
+        # keep our slave fd until close(): the master reads EIO whenever no
+        # process has the slave open, e.g. between two poller connections
+        self._pty = (master, slave)
+        thread = threading.Thread(target=self._serve_rtu, args=(master,), daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return os.ttyname(slave)
+
+    def _serve_rtu(self, fd: int):
+        buf = b''
+        while True:
+            try:
+                chunk = os.read(fd, 256)
+            except OSError:
+                return
+            if not chunk:
+                return
+            buf += chunk
+            while len(buf) >= 8:
+                frame, buf = buf[:8], buf[8:]
+                if crc16(frame[:6]) != int.from_bytes(frame[6:], 'little'):
+                    buf = b''  # lost sync: drop and wait for the next request
+                    break
+                if frame[0] == BROADCAST:
+                    continue
+                reply = bytes([frame[0]]) + self.handle_pdu(frame[0], frame[1:6])
+                os.write(fd, reply + crc16(reply).to_bytes(2, 'little'))
+
+    def close(self):
+        if self._tcp is not None:
+            self._tcp.shutdown()
+            self._tcp.server_close()
+            self._tcp = None
+        if self._pty is not None:
+            for fd in self._pty:
+                os.close(fd)
+            self._pty = None
+
+
+def _recv_exact(sock, n: int):
+    buf = b''
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return buf
@@ -0,0 +1,139 @@
+import bisect
+import collections
+import threading
+
+# Default tumbling windows, in board-tick milliseconds
+DEFAULT_WINDOWS_MS = (1000, 60_000)
+
+
+class Rollup:
+    """
+    Tumbling-window aggregates for one sensor at one window size.
+
+    Each sample updates running min/max/sum/count per field in O(1); when
+    a sample's tick falls into a later window the open window is closed
+    and appended to the series. Windows are aligned to multiples of
+    `window_ms` on the board tick, and only the newest `retention`
+    closed windows are kept.
+
+    A tick more than a window behind the open one means the board's
+    clock restarted: the open window is closed and a new epoch begins,
+    whose windows follow the earlier epochs' in the series.
+    """
+    def __init__(self, fields: tuple, window_ms: int, retention: int = 1440):
+        self.fields = tuple(fields)
+        self.window_ms = window_ms
+        self.late = 0  # samples from just before the open window (ignored)
+        self.epoch = 0  # board tick restarts seen
+        self._starts = collections.deque(maxlen=retention)  # (epoch, window start)
+        self._closed = collections.deque(maxlen=retention)  # (count, [[min, max, sum], …])
+        self._start = None
+        self._count = 0
+        self._acc = None
+
+    def add(self, rec: dict):
+        tick = rec['tick']
+        start = tick - tick % self.window_ms
+        if start != self._start:
+            if self._start is not None and start < self._start:
+                if self._start - start <= self.window_ms:
+                    self.late += 1
+                    return
+                self._close()
+                self.epoch += 1
+            else:
+                self._close()
+            self._start = start
+            self._count = 0
+            self._acc = [[v, v, v] for v in (rec[f] for f in self.fields)]
+        else:
+            for acc, f in zip(self._acc, self.fields):
+                v = rec[f]
+                if v < acc[0]:
+                    acc[0] = v
+                elif v > acc[1]:
+                    acc[1] = v
+                acc[2] += v
+        self._count += 1
+
+    def extend(self, records):
+        for rec in records:
+            self.add(rec)
+
+    def _close(self):
+        if self._count:
+            self._starts.append((self.epoch, self._start))
+            self._closed.append((self._count, self._acc))
+
+    def series(self, start: int = None, end: int = None, partial: bool = False) -> dict:
+        """
+        Closed windows with start <= window start < end as columns:
+          { 'epoch': [...], 'start': [...], 'count': [...],
+            '<field>_min', '<field>_max', '<field>_sum', '<field>_mean': [...] }
+        `start` and `end` are ticks of the current epoch; earlier epochs
+        come before it. With partial=True the still-open window is
+        included as well.
+        """
+        starts = self._starts
+        lo = 0 if start is None else bisect.bisect_left(starts, (self.epoch, start))
+        hi = len(starts) if end is None else bisect.bisect_left(starts, (self.epoch, end))
+        rows = [starts[i] + self._closed[i] for i in range(lo, hi)]
+        if partial and self._count and (start is None or self._start >= start) \
+                and (end is None or self._start < end):
+            rows.append((self.epoch, self._start, self._count, [list(a) for a in self._acc]))
+
+        out = {'epoch': [r[0] for r in rows], 'start': [r[1] for r in rows],
+               'count': [r[2] for r in rows]}
+        for i, f in enumerate(self.fields):
+            out[f + '_min'] = [r[3][i][0] for r in rows]
+            out[f + '_max'] = [r[3][i][1] for r in rows]
+            out[f + '_sum'] = [r[3][i][2] for r in rows]
+            out[f + '_mean'] = [r[3][i][2] / r[2] for r in rows]
+        return out
+
+
+class RollupStore:
+    """
+    Stream consumer maintaining Rollups for every sensor at each window
+    size in `windows_ms`, so dashboards can query per-second or
+    per-minute series without touching raw samples.
+
+    As with SampleStore, a sensor whose record layout changes starts
+    fresh rollups.
+    """
+    def __init__(self, windows_ms=DEFAULT_WINDOWS_MS, retention: int = 1440):
+        self.windows_ms = tuple(windows_ms)
+        self.retention = retention
+        self._rollups = {}  # {(board, addr): (sensor, record keys, {window_ms: Rollup})}
+        self._lock = threading.Lock()
+
+    def append(self, board: int, addr: int, name: str, records: list[dict]):
+        """Stream-consumer entry point: fold one decoded batch in."""
+        if not records:
+            return
+        present = tuple(k for k in records[0] if k != 'tick')
+        key = (board, addr)
+        with self._lock:
+            entry = self._rollups.get(key)
+            if entry is None or entry[0] != name or entry[1] != present:
+                rollups = {w: Rollup(present, w, self.retention) for w in self.windows_ms}
+                entry = self._rollups[key] = (name, present, rollups)
+            for rollup in entry[2].values():
+                rollup.extend(records)
+
+    __call__ = append
+
+    def keys(self) -> list[tuple]:
+        return list(self._rollups)
+
+    def series(self, board: int, addr: int, window_ms: int,
+               start: int = None, end: int = None, partial: bool = False) -> dict:
+        """Rollup.series() for one sensor and window size ({} if unknown)."""
+        with self._lock:
+            entry = self._rollups.get((board, addr))
+            if entry is None:
+                return {}
+            rollup = entry[2].get(window_ms)
+            if rollup is None:
+                raise KeyError(f"No {window_ms} ms rollup (have {self.windows_ms})")
+            return rollup.series(start, end, partial)
@@ -3,12 +3,105 @@ import time
 import sched
 
 from .boards import BoardManager
+from .continuity import TickTracker
+from .dispatch import Dispatcher, DROP_OLDEST
+from .metrics import StreamQoS
+from .protocol import protocol
 from .sensors import registry
+from .timealign import TickClock
+
+STATUS_OK = protocol.status_codes['STATUS_OK']
+
+# Polls due within this many seconds of each other belong to the same tick
+TICK_GRACE = 0.002
+
+class _Subscription:
+    """One live subscription; replaced (not mutated) on re-subscribe."""
+    __slots__ = ('board', 'addr', 'name', 'interval')
+
+    def __init__(self, board, addr, name, interval):
+        self.board = board
+        self.addr = addr
+        self.name = name
+        self.interval = interval
+
+    def as_tuple(self):
+        return (self.board, self.addr, self.name, self.interval)
+
+
+class SubscriptionSet:
+    """
+    Thread-safe live set of stream subscriptions keyed by (board, addr).
+    Iteration yields (board, addr, name, interval) tuples from a snapshot,
+    so it reads like the plain list it replaces while the stream thread
+    keeps polling.
+    """
+    def __init__(self, entries=()):
+        self._lock = threading.Lock()
+        self._subs = {}  # {(board, addr): _Subscription}
+        self.extend(entries)
+
+    def subscribe(self, board, addr, name, interval) -> _Subscription:
+        sub = _Subscription(board, addr, name, interval)
+        with self._lock:
+            self._subs[(board, addr)] = sub
+        return sub
+
+    def unsubscribe(self, board, addr) -> bool:
+        with self._lock:
+            return self._subs.pop((board, addr), None) is not None
+
+    def retune(self, board, addr, interval):
+        with self._lock:
+            sub = self._subs.get((board, addr))
+            if sub is None:
+                raise KeyError(f"No subscription for board {board} addr 0x{addr:02X}")
+            sub.interval = interval
+
+    def get(self, board, addr):
+        with self._lock:
+            return self._subs.get((board, addr))
+
+    def is_live(self, sub: _Subscription) -> bool:
+        return self._subs.get((sub.board, sub.addr)) is sub
+
+    # list-compatible helpers
+    def append(self, entry):
+        self.subscribe(*entry)
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def clear(self):
+        with self._lock:
+            self._subs.clear()
+
+    def __iter__(self):
+        with self._lock:
+            return iter([sub.as_tuple() for sub in self._subs.values()])
+
+    def __len__(self):
+        return len(self._subs)
+
+    def __contains__(self, item):
+        sub = self._subs.get(tuple(item[:2]))
+        if sub is None:
+            return False
+        return len(item) == 2 or sub.as_tuple() == tuple(item)
+
+    def __repr__(self):
+        return f"SubscriptionSet({list(self)!r})"
+
 
 class StreamScheduler:
     """
     Periodically reads all sensors discovered on the bus.
     Scans with a short timeout, then streams with a longer one.
+    Subscriptions can be added, removed or retuned while streaming;
+    changes take effect at the affected sensor's next deadline.
+    Decoded batches are handed to a Dispatcher, so consumers run on their
+    own threads and never delay the next bus transaction.
     """
     def __init__(self,
                  bm: BoardManager = None,
@@ -25,9 +118,34 @@ class StreamScheduler:
 
         self._running      = False
         self._stop         = threading.Event()
+        self._wake         = threading.Event()
         self._thread       = None
-        self.subscriptions = []  # list of (board, addr, name, interval)
+        self._sched        = None
+        self._main         = None  # consumer wrapping start()'s callback
+        self.dispatcher    = Dispatcher()
+        self._subs         = SubscriptionSet()
         self.system_info   = {}  # { board_id: { 'sensors': [...] } }
+        self.qos           = {}  # { (board, addr): StreamQoS }
+        self.continuity    = {}  # { (board, addr): TickTracker }, kept across restarts
+        self.clocks        = {}  # { board: TickClock }, tick → host time, kept across restarts
+        self.masks         = {}  # { (board, addr): payload mask } used to decode reads
+        self.sample_periods = {}  # { (board, addr): the sensor's sample period in ms }
+        self.pending_masks = {}  # { (board, addr): mask } to apply after the next read
+        self.derivers      = {}  # { (board, addr): fn(records) } filling host-computed fields
+        self.published_qos = {}  # qos_snapshot() as of the last publish, swapped whole
+        self.publish_interval = 1.0
+        self._published_at = None
+
+    @property
+    def subscriptions(self) -> SubscriptionSet:
+        """Live set of (board, addr, name, interval) subscriptions."""
+        return self._subs
+
+    @subscriptions.setter
+    def subscriptions(self, entries):
+        # keep the same object so a running stream sees the new contents
+        self._subs.clear()
+        self._subs.extend(entries)
 
     def setup_stream(self):
         """
@@ -70,10 +188,193 @@ class StreamScheduler:
         """Remove all pending subscriptions."""
         self.subscriptions.clear()
 
+    def subscribe(self, board: int, addr: int, sensor: str, interval: float):
+        """
+        Poll `sensor` at board/addr every `interval` seconds. Replaces any
+        existing subscription for that sensor; when streaming, the first
+        poll happens right away.
+        """
+        sub = self._subs.subscribe(board, addr, sensor, interval)
+        if self._running and self._sched is not None:
+            self._sched.enter(0, 1, self._make_job(sub))
+            self._wake.set()
+
+    def unsubscribe(self, board: int, addr: int) -> bool:
+        """Stop polling board/addr after its pending poll. Returns False if unknown."""
+        return self._subs.unsubscribe(board, addr)
+
+    def retune(self, board: int, addr: int, interval: float):
+        """Change the polling interval; used when the next poll is scheduled."""
+        self._subs.retune(board, addr, interval)
+
+    def request_mask(self, board: int, addr: int, mask: int):
+        """
+        Change a streamed sensor's payload mask from the scheduler thread,
+        right after its next read: samples queued under the old mask are
+        decoded with it by that read, and anything the board queued while
+        switching is discarded, so no batch mixes layouts.
+        """
+        self.pending_masks[(board, addr)] = mask
+
+    def add_consumer(self, callback, maxsize: int = 64, policy: str = DROP_OLDEST,
+                     batched: bool = False):
+        """
+        Attach a stream consumer with its own bounded queue and worker thread.
+        policy is one of 'block', 'drop-oldest' or 'drop-newest'; batched
+        consumers get callback([(board, addr, name, records), …]) once per
+        scheduler tick. Consumers stay attached across start()/stop().
+        """
+        return self.dispatcher.add_consumer(
+            callback, maxsize, policy, batched,
+            observer=None if batched else self._observe_callback,
+        )
+
+    def remove_consumer(self, consumer):
+        self.dispatcher.remove_consumer(consumer)
+
+    def consumer_stats(self) -> list[dict]:
+        """Queue depth, deliveries and drop counters for every consumer."""
+        return self.dispatcher.stats()
+
+    def _observe_callback(self, item, seconds):
+        qos = self.qos.get((item[0], item[1]))
+        if qos is not None:
+            qos.record_callback(seconds)
+
+    def qos_snapshot(self) -> dict:
+        """
+        Live per-subscription QoS counters: { (board, addr): {...} },
+        including the sample-continuity counters under 'continuity'.
+        """
+        snap = {}
+        for key, q in list(self.qos.items()):
+            snap[key] = q.snapshot()
+            tracker = self.continuity.get(key)
+            if tracker is not None:
+                snap[key]['continuity'] = tracker.snapshot()
+        return snap
+
+    def publish_qos(self):
+        """
+        Rebuild published_qos from the live counters, adding each sensor's
+        accepted samples per second since the previous publish. Runs on the
+        scheduler thread; readers just take the reference.
+        """
+        now = time.monotonic()
+        previous, since = self.published_qos, self._published_at
+        snap = self.qos_snapshot()
+        for key, entry in snap.items():
+            samples = entry.get('continuity', {}).get('samples', entry['records'])
+            old = previous.get(key)
+            rate = 0.0
+            if old is not None and since is not None and now > since:
+                old_samples = old.get('continuity', {}).get('samples', old['records'])
+                rate = max(0, samples - old_samples) / (now - since)
+            entry['samples_per_s'] = rate
+        self._published_at = now
+        self.published_qos = snap
+
+    def _make_job(self, sub: _Subscription):
+        b, a, name = sub.board, sub.addr, sub.name
+        qos = self.qos[(b, a)] = StreamQoS(self._period_ms(b, a, sub.interval))
+        tracker = self.continuity.get((b, a))
+        if tracker is None:
+            tracker = self.continuity[(b, a)] = TickTracker()
+        tracker.period_ms = qos.period_ms
+        due = time.time()
+
+        def job():
+            nonlocal due
+            if self._stop.is_set() or not self._subs.is_live(sub):
+                return
+            started = time.time()
+            try:
+                bound = self._bm.select(b)
+                recs = bound.read_samples(a, name, self.masks.get((b, a)))
+                received = time.time()
+                recs = tracker.process(recs)
+                if recs and recs[-1].get('tick') is not None:
+                    clock = self.clocks.get(b)
+                    if clock is None:
+                        clock = self.clocks[b] = TickClock()
+                    clock.observe(recs[-1]['tick'], received)
+                qos.record_poll(due, started, recs)
+                derive = self.derivers.get((b, a))
+                if derive is not None:
+                    derive(recs)
+                self.dispatcher.publish(b, a, name, recs)
+                mask = self.pending_masks.pop((b, a), None)
+                if mask is not None and mask != self.masks.get((b, a)):
+                    self._switch_mask(bound, b, a, name, mask)
+            except Exception as e:
+                # never let one error kill the thread
+                qos.record_error()
+                print(f"[Stream error] board {b} sensor {name}@0x{a:02X}: {e}")
+            finally:
+                # re-schedule regardless of success/failure, picking up retunes
+                interval = sub.interval
+                qos.period_ms = tracker.period_ms = self._period_ms(b, a, interval)
+                due = time.time() + interval
+                self._sched.enter(interval, 1, job)
+        return job
+
+    def _period_ms(self, b: int, a: int, interval: float) -> float:
+        """
+        Expected tick spacing of a sensor's samples: its configured sample
+        period, so an on-device queue overflowing between slow polls shows
+        up as gaps. Only while that is unknown is the poll interval assumed.
+        """
+        return self.sample_periods.get((b, a)) or interval * 1000.0
+
+    def _switch_mask(self, bound, b: int, a: int, name: str, mask: int):
+        """
+        Apply a requested payload mask right after a read. The firmware
+        serializes each sample with the mask current when it was acquired
+        and flushes its queue on a mask change, but a sample acquired
+        across the switch can still be queued in the old layout; whatever
+        is queued once the board confirms is read and discarded, so only
+        samples acquired under `mask` are ever decoded with it. The few
+        samples lost during the switch show up as a continuity gap.
+        """
+        if bound.set_payload_mask(a, mask) != STATUS_OK:
+            print(f"[Stream error] board {b} sensor {name}@0x{a:02X}: "
+                  f"payload mask 0x{mask:02X} rejected")
+            return
+        try:
+            bound.read_samples(a, name, self.masks.get((b, a)))
+        except RuntimeError:
+            pass  # nothing queued: the firmware answers an empty read with an error
+        self.masks[(b, a)] = mask
+
+    def _delay(self, seconds):
+        # sleep until the next deadline, waking early on stop or new subscriptions
+        if seconds > TICK_GRACE:
+            # nothing else is due right now: this scheduler tick is complete
+            self.dispatcher.end_tick()
+            if self._published_at is None \
+                    or time.monotonic() - self._published_at >= self.publish_interval:
+                self.publish_qos()
+        if self._stop.is_set():
+            # drop pending polls so sched.run() returns instead of spinning
+            for event in self._sched.queue:
+                try:
+                    self._sched.cancel(event)
+                except ValueError:
+                    pass
+            return
+        if seconds > 0:
+            self._wake.wait(seconds)
+            self._wake.clear()
+
     def start(self, callback):
         """
         Begin streaming. callback(board, addr, name, records) is invoked
-        periodically for each sensor. Raises if already running.
+        periodically for each sensor, from a consumer thread (see
+        add_consumer); pass None to rely on attached consumers only.
+        Records pass through a per-sensor TickTracker first, so 'tick' is
+        a 64-bit unwrapped value that keeps increasing across board resets and
+        duplicate samples are already dropped.
+        Raises if already running.
         """
         if self._running:
             raise RuntimeError("Already streaming")
@@ -85,40 +386,48 @@ class StreamScheduler:
         # switch to a longer timeout so reads can complete
         self._bm.timeout = self.timeout
 
-        self._running = True
+        if callback is not None:
+            self._main = self.add_consumer(callback)
+        self.dispatcher.start()
         self._stop.clear()
+        self._wake.clear()
+        self.qos = {}
+        self._sched = sched.scheduler(time.time, self._delay)
+
+        # enqueue initial jobs
+        for key in [(b, a) for b, a, _, _ in self.subscriptions]:
+            sub = self._subs.get(*key)
+            if sub is not None:
+                self._sched.enter(0, 1, self._make_job(sub))
+        self._running = True
 
         def _loop():
-            scheduler = sched.scheduler(time.time, time.sleep)
-
-            def make_job(b, a, name, interval):
-                def job():
-                    if self._stop.is_set():
-                        return
-                    try:
-                        recs = self._bm.select(b).read_samples(a, name)
-                        callback(b, a, name, recs)
-                    except Exception as e:
-                        # never let one error kill the thread
-                        print(f"[Stream error] board {b} sensor {name}@0x{a:02X}: {e}")
-                    finally:
-                        # re-schedule regardless of success/failure
-                        scheduler.enter(interval, 1, job)
-                return job
-
-            # enqueue initial jobs
-            for b, a, name, interval in self.subscriptions:
-                scheduler.enter(0, 1, make_job(b, a, name, interval))
-
-            # this will block until .stop() is called
-            scheduler.run()
+            # run() returns once no jobs are pending (everything unsubscribed);
+            # idle until a new subscription arrives or .stop() is called
+            while not self._stop.is_set():
+                self._sched.run()
+                self.dispatcher.end_tick()
+                if not self._stop.is_set():
+                    self._wake.wait(0.1)
+                    self._wake.clear()
 
         self._thread = threading.Thread(target=_loop, daemon=True)
         self._thread.start()
 
     def stop(self):
-        """Signal the thread to exit, then wait for it to finish."""
+        """
+        Signal the thread to exit, then wait for it to finish. Mask
+        switches not applied yet are dropped: once idle, the backend sets
+        masks directly, and a stale request must not resurface on the
+        next start().
+        """
         self._stop.set()
+        self._wake.set()
         if self._thread:
             self._thread.join()
+        self.pending_masks.clear()
+        self.dispatcher.stop()
+        if self._main is not None:
+            self.dispatcher.remove_consumer(self._main)
+            self._main = None
         self._running = False
@@ -1,12 +1,22 @@
 import json
 import os
 import struct
+from .formula import C_FUNCTIONS, C_TYPES, Formula
 from .protocol import protocol
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 REPO_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir, os.pardir))
 SENSORS_DIR = os.path.join(REPO_ROOT, 'metadata', 'sensors')
 
+# Exact-width typecode of each C type used in payload/config fields. The
+# codes mean the same size to struct (with '<' or '>'), array and numpy,
+# so every binary layout of a record is built from this one table.
+TYPECODES = {
+    'uint8': 'B', 'int8': 'b',
+    'uint16': 'H', 'int16': 'h',
+    'uint32': 'I', 'int32': 'i',
+}
+
 
 class SensorRegistry:
     """
@@ -18,6 +28,13 @@ class SensorRegistry:
       • metadata(name)            → the full JSON dict (including config_fields)
       • available()               → list of all sensor‐names
       • parse_payload(name, raw, mask)  → splits a raw-bytes payload into a dict
+      • payload_layout(name, mask)      → payload_fields enabled by a mask
+      • mask_for(name, fields)          → smallest mask carrying those fields
+      • derived_fields(name)            → payload fields the host can compute
+      • wire_fields(name, fields, config) → what must be sent to serve fields
+      • derive(name, records, fields, config) → fill derived fields in place
+      • computed_fields(name)           → config fields evaluated from others
+      • compute_config(name, field, config) → evaluate one of those
     """
     def __init__(self):
         self._load()
@@ -27,6 +44,8 @@ class SensorRegistry:
         self._reverse_types = {}   # type code → name
         self._payload_sizes = {}   # name → total payload size
         self._metadata = {}        # name → full JSON metadata
+        self._derived = {}         # name → {field: (depends_on, config, Formula, C cast)}
+        self._config_formulas = {} # C formula text → compiled Formula
         for fn in os.listdir(SENSORS_DIR):
             if not fn.endswith('.json'):
                 continue
@@ -52,6 +71,17 @@ class SensorRegistry:
             
             self._payload_sizes[name] = size
 
+            # payload fields the host can compute from other fields + config
+            derived = {}
+            for fld in meta['payload_fields']:
+                spec = fld.get('derived')
+                if spec:
+                    # stored as the firmware's C assignment to the field would
+                    cast = C_FUNCTIONS[C_TYPES[f"{fld['type']}_t"]]
+                    derived[fld['name']] = (tuple(spec['depends_on']), tuple(spec.get('config', ())),
+                                            Formula(spec['formula']), cast)
+            self._derived[name] = derived
+
     def type_code(self, name: str) -> int:
         """Given a sensor‐name (e.g. "ina219"), return its numeric type code."""
         return self._types[name.lower()]
@@ -82,6 +112,106 @@ class SensorRegistry:
         """List all known sensor type names (e.g. ["ina219", "mpu6050", …])."""
         return list(self._metadata.keys())
 
+    def payload_layout(self, name: str, mask: int = None) -> list[dict]:
+        """
+        The payload_fields present in a record for `mask` (default: the
+        sensor's default_payload_bits), in wire order.
+        """
+        md = self.metadata(name)
+        if mask is None:
+            mask = sum(1 << b for b in md.get('default_payload_bits', []))
+        return [fld for idx, fld in enumerate(md['payload_fields'])
+                if mask & (1 << idx)]
+
+    def mask_for(self, name: str, fields) -> int:
+        """Payload mask enabling exactly the named payload fields (others are ignored)."""
+        wanted = set(fields)
+        return sum(1 << idx for idx, fld in enumerate(self.metadata(name)['payload_fields'])
+                   if fld['name'] in wanted)
+
+    def derived_fields(self, name: str) -> dict:
+        """{field: (payload fields, config fields)} for fields the host can compute."""
+        return {f: (deps, cfg) for f, (deps, cfg, *_)
+                in self._derived[name.lower()].items()}
+
+    def wire_fields(self, name: str, fields, config: dict) -> set:
+        """
+        The payload fields to put on the wire so that `fields` can be
+        served: derived fields are replaced by their dependencies when
+        every config value they need is known (and non-zero).
+        """
+        derived = self._derived[name.lower()]
+        out = set()
+        for f in fields:
+            spec = derived.get(f)
+            try:
+                known = spec is not None and all(self._config_values(name, spec[1], config).values())
+            except KeyError:
+                known = False
+            if known:
+                out.update(spec[0])
+            else:
+                out.add(f)
+        return out
+
+    def derive(self, name: str, records: list[dict], fields, config: dict) -> list[dict]:
+        """
+        Compute the derived `fields` missing from a batch in place, from
+        the primaries it carries and `config`. Fields whose inputs are not
+        all present are left out. Formulas produce the firmware's encoding
+        of the field (e.g. INA219 current in register counts), and results
+        are converted to the field's C type as the firmware stores them, so
+        a derived value equals the one the wire would have carried.
+        """
+        if not records:
+            return records
+        derived = self._derived[name.lower()]
+        first = records[0]
+        for f in fields:
+            spec = derived.get(f)
+            if spec is None or f in first or not all(d in first for d in spec[0]):
+                continue
+            deps, cfg, formula, cast = spec
+            try:
+                values = self._config_values(name, cfg, config)
+                for r in records:
+                    values.update((d, r[d]) for d in deps)
+                    r[f] = cast(formula(values))
+            except (KeyError, ZeroDivisionError):
+                for r in records:
+                    r.pop(f, None)
+        return records
+
+    def _config_values(self, name: str, fields, config: dict) -> dict:
+        """`fields` from `config`, evaluating computed ones that are not cached (KeyError if unknown)."""
+        computed = self.computed_fields(name)
+        out = {}
+        for c in fields:
+            if c in config:
+                out[c] = config[c]
+            elif c in computed:
+                out[c] = self.compute_config(name, c, config)
+            else:
+                raise KeyError(c)
+        return out
+
+    def computed_fields(self, name: str) -> dict:
+        """{config field: depends_on} for config fields marked computed with a formula."""
+        return {f['name']: tuple(f.get('depends_on', ()))
+                for f in self.metadata(name).get('config_fields', [])
+                if f.get('computed') and f.get('formula')}
+
+    def compute_config(self, name: str, field: str, config: dict):
+        """
+        Evaluate computed config field `field` from the other values in
+        `config`, as the firmware does (KeyError if one it needs is missing).
+        """
+        fld = next(f for f in self.metadata(name)['config_fields'] if f['name'] == field)
+        formula = self._config_formulas.get(fld['formula'])
+        if formula is None:
+            formula = self._config_formulas[fld['formula']] = Formula.from_c(fld['formula'])
+        return formula(config)
+
     def parse_payload(self, name: str, raw: bytes, mask: int) -> dict:
         """
         Given a raw payload (the bytes from CMD_READ_SAMPLES) AND a one-byte mask,
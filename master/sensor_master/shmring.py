@@ -0,0 +1,225 @@
+"""
+Shared-memory rings for consumers in other processes.
+
+One single-producer / multi-consumer ring per (board, addr, sensor, mask)
+layout, in a multiprocessing.shared_memory block named by ring_name().
+The block holds a HEADER, then `capacity` fixed-width records in the
+archive's record_struct layout (int64 tick + payload fields).
+
+The writer fills slots first and then publishes the total number of
+records written (the sequence), so readers need no locks: each reader
+keeps its own cursor, reads up to the published sequence and can tell
+from it alone whether the writer lapped it. The sequence is stored twice
+and a reader retries until both copies agree, so a torn 8-byte store is
+never observed.
+"""
+import os
+import struct
+from multiprocessing import shared_memory, resource_tracker
+
+from .archive import RecordView, layout_dir, record_struct
+from .sensors import registry
+
+MAGIC = b'SMRING\x01\x00'
+# magic, record size, capacity, board, addr, sensor type code, mask, writer pid
+HEADER = struct.Struct('<8sIIBBBBI')
+SEQ = struct.Struct('<QQ')  # published sequence, twice
+SEQ_OFFSET = HEADER.size
+DATA_OFFSET = SEQ_OFFSET + SEQ.size
+
+
+def ring_name(prefix: str, board: int, addr: int, sensor: str, mask: int) -> str:
+    """Shared-memory name of one layout's ring."""
+    return f"{prefix}_{layout_dir(board, addr, sensor, mask)}"
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    shm = shared_memory.SharedMemory(name=name)
+    # Attaching registers the block with this process's resource tracker,
+    # which would unlink it when we exit; only the writer owns it.
+    try:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+    return shm
+
+
+def _writer_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, owned by someone else
+    return True
+
+
+class RingWriter:
+    """
+    The producer side of one ring. Creates the block, replacing one left
+    behind by a writer that has exited; a ring whose writer process is
+    still running is never taken over (FileExistsError).
+    """
+    def __init__(self, name: str, board: int, addr: int, sensor: str, mask: int,
+                 capacity: int = 4096):
+        self.name = name
+        self.layout = registry.payload_layout(sensor, mask)
+        self.names = tuple(f['name'] for f in self.layout)
+        self.rec = record_struct(self.layout)
+        self.capacity = capacity
+        size = DATA_OFFSET + capacity * self.rec.size
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            stale = _attach(name)
+            try:
+                magic, *_, pid = HEADER.unpack_from(stale.buf, 0)
+            except struct.error:
+                magic, pid = None, 0
+            stale.close()
+            if magic != MAGIC:
+                raise FileExistsError(f"'{name}' exists and is not a sample ring") from None
+            if _writer_alive(pid):
+                raise FileExistsError(f"Ring '{name}' is still written by process {pid}") from None
+            # left behind by a writer that did not shut down cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.buf = self.shm.buf
+        HEADER.pack_into(self.buf, 0, MAGIC, self.rec.size, capacity,
+                         board, addr, registry.type_code(sensor), mask, os.getpid())
+        self.seq = 0
+        SEQ.pack_into(self.buf, SEQ_OFFSET, 0, 0)
+
+    def write(self, records: list[dict]):
+        pack_into = self.rec.pack_into
+        size, cap, names = self.rec.size, self.capacity, self.names
+        seq = self.seq
+        for r in records:
+            pack_into(self.buf, DATA_OFFSET + (seq % cap) * size, r['tick'], *[r[k] for k in names])
+            seq += 1
+        self.seq = seq
+        SEQ.pack_into(self.buf, SEQ_OFFSET, seq, seq)
+
+    def close(self, unlink: bool = True):
+        self.buf = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class RingReader:
+    """
+    Attach to a ring by name from any process. Starts at the oldest record
+    still in the ring, or at the newest with from_start=False.
+    """
+    def __init__(self, name: str, from_start: bool = True):
+        self.shm = _attach(name)
+        self.buf = self.shm.buf
+        magic, size, self.capacity, self.board, self.addr, code, self.mask, self.writer_pid = \
+            HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"'{name}' is not a sample ring")
+        self.sensor = registry.name_from_type(code)
+        self.layout = registry.payload_layout(self.sensor, self.mask)
+        self.rec = record_struct(self.layout)
+        self.lost = 0
+        head = self.sequence()
+        self.cursor = max(0, head - self.capacity) if from_start else head
+        self._last = None  # (first seq, count) handed out by the last read()
+
+    def sequence(self) -> int:
+        """Total records written so far."""
+        while True:
+            a, b = SEQ.unpack_from(self.buf, SEQ_OFFSET)
+            if a == b:
+                return a
+
+    def read(self, limit: int = None) -> list[RecordView]:
+        """
+        Records published since the last read, as zero-copy RecordViews
+        over the shared block (two when the run wraps around). Records the
+        writer already overwrote are skipped and counted in `lost`.
+        Call confirm() after using the views to learn whether the writer
+        caught up with them meanwhile.
+        """
+        head = self.sequence()
+        start = self.cursor
+        if head - start > self.capacity:
+            self.lost += head - self.capacity - start
+            start = head - self.capacity
+        if limit is not None:
+            head = min(head, start + limit)
+        self.cursor = head
+        self._last = (start, head - start)
+        size, cap = self.rec.size, self.capacity
+        views = []
+        seq = start
+        while seq < head:
+            slot = seq % cap
+            n = min(head - seq, cap - slot)
+            lo = DATA_OFFSET + slot * size
+            views.append(RecordView(self.buf[lo:lo + n * size], self.layout))
+            seq += n
+        return views
+
+    def confirm(self) -> int:
+        """
+        How many records of the last read() may have been overwritten while
+        they were in use (0 when the reader kept up); those are added to `lost`.
+        """
+        if self._last is None:
+            return 0
+        start, count = self._last
+        self._last = None
+        clobbered = max(0, min(count, self.sequence() - self.capacity - start))
+        self.lost += clobbered
+        return clobbered
+
+    def records(self, limit: int = None) -> list[dict]:
+        """Copying convenience over read(): new records as dicts."""
+        out = []
+        for view in self.read(limit):
+            out += view.records()
+        clobbered = self.confirm()
+        return out[clobbered:]
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+
+
+class RingPublisher:
+    """
+    Stream consumer writing each batch into its layout's ring, creating
+    rings on first use. Readers attach with RingReader(ring_name(prefix, …)).
+    """
+    def __init__(self, prefix: str = 'sensor', capacity: int = 4096):
+        self.prefix = prefix
+        self.capacity = capacity
+        self._rings = {}  # {(board, addr, sensor, mask): RingWriter}
+
+    def append(self, board: int, addr: int, name: str, records: list[dict]):
+        if not records:
+            return
+        mask = registry.mask_for(name, records[0].keys())
+        key = (board, addr, name, mask)
+        ring = self._rings.get(key)
+        if ring is None:
+            ring = self._rings[key] = RingWriter(ring_name(self.prefix, *key), *key,
+                                                 capacity=self.capacity)
+        ring.write(records)
+
+    __call__ = append
+
+    def names(self) -> list[str]:
+        return [ring.name for ring in list(self._rings.values())]
+
+    def close(self):
+        for ring in self._rings.values():
+            ring.close()
+        self._rings.clear()
@@ -0,0 +1,278 @@
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+from .sensors import TYPECODES, registry
+
+
+class BatchingSink:
+    """
+    Base class for stream sinks that write in bulk.
+
+    A sink is a plain stream consumer, callable as
+    sink(board, addr, name, records), and does its work on the thread
+    that calls it: attached with Backend.add_sink(), that is the
+    dispatcher consumer's worker, whose bounded queue is the only one
+    in front of the sink. Batches are buffered via _add() and _flush()
+    runs once `flush_rows` samples are pending or a batch arrives
+    `flush_interval` seconds after the last flush, whichever comes
+    first. close() writes whatever is still buffered and releases the
+    output. The sink's lock serializes both, since a restarted stream
+    feeds the sink from a new worker thread and close() may come from
+    yet another one.
+    """
+    def __init__(self, flush_rows: int = 10000, flush_interval: float = 5.0):
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self.flushes = 0
+        self.errors = 0
+        self._pending = 0
+        self._deadline = None
+        self._lock = threading.Lock()
+
+    def __call__(self, board: int, addr: int, name: str, records: list[dict]):
+        if not records:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if self._deadline is None:
+                self._deadline = now + self.flush_interval
+            self._add(board, addr, name, records)
+            self._pending += len(records)
+            if self._pending >= self.flush_rows or now >= self._deadline:
+                self._flush_pending()
+                self._deadline = now + self.flush_interval
+
+    def close(self):
+        """Flush everything still buffered, then close the output."""
+        with self._lock:
+            self._flush_pending()
+            self._close()
+
+    def _flush_pending(self):
+        if not self._pending:
+            return
+        try:
+            self._flush()
+            self.rows_written += self._pending
+            self.flushes += 1
+        except Exception as e:
+            # keep the sink usable; the buffered rows are lost
+            self.errors += 1
+            print(f"[Sink error] {type(self).__name__}: {e}")
+        self._pending = 0
+
+    def stats(self) -> dict:
+        return {
+            'pending':      self._pending,
+            'rows_written': self.rows_written,
+            'flushes':      self.flushes,
+            'errors':       self.errors,
+        }
+
+    # subclass hooks, all called with the sink's lock held
+    def _add(self, board: int, addr: int, name: str, records: list[dict]):
+        raise NotImplementedError
+
+    def _flush(self):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+
+class _ColumnBuilder:
+    """Growable typed columns for one (sensor, fields) layout."""
+    def __init__(self, sensor: str, fields: list[dict]):
+        self.sensor = sensor
+        self.fields = fields
+        self.names = tuple(f['name'] for f in fields)
+        self.mask = registry.mask_for(sensor, self.names)
+        self.reset()
+
+    def reset(self):
+        self.columns = {'board': array('B'), 'addr': array('B'), 'tick': array('q')}
+        for f in self.fields:
+            # exact item sizes, so a filled column goes to Arrow as a buffer as is
+            self.columns[f['name']] = array(TYPECODES.get(f['type'], 'q'))
+
+    def __len__(self):
+        return len(self.columns['tick'])
+
+    def extend(self, board: int, addr: int, records: list[dict]):
+        cols = self.columns
+        n = len(records)
+        cols['board'].extend([board] * n)
+        cols['addr'].extend([addr] * n)
+        cols['tick'].extend([r['tick'] for r in records])
+        for name in self.names:
+            cols[name].extend([r[name] for r in records])
+
+
+class ColumnarSink(BatchingSink):
+    """
+    Writes streamed samples as columnar files for offline analysis, one
+    file per (sensor, payload mask) layout under `root`:
+    <sensor>_m<mask>_<start time>.parquet (or .arrow for Arrow IPC).
+
+    Samples accumulate in typed column builders; each flush turns them
+    into one Parquet row group / IPC record batch per layout. The schema
+    is board, addr, tick plus the enabled payload_fields with their
+    declared integer types. Requires pyarrow.
+    """
+    FORMATS = ('parquet', 'arrow')
+
+    def __init__(self, root: str, format: str = 'parquet', flush_rows: int = 65536,
+                 flush_interval: float = 10.0):
+        if format not in self.FORMATS:
+            raise ValueError(f"Unknown columnar format '{format}'")
+        try:
+            import pyarrow
+        except ImportError as e:
+            raise ImportError("ColumnarSink needs pyarrow (pip install pyarrow)") from e
+        super().__init__(flush_rows, flush_interval)
+        self._pa = pyarrow
+        self.root = root
+        self.format = format
+        self._stamp = time.strftime('%Y%m%dT%H%M%S')
+        self._builders = {}  # {(sensor, field names): _ColumnBuilder}
+        self._writers = {}   # {(sensor, field names): (schema, writer)}
+        os.makedirs(root, exist_ok=True)
+
+    def arrow_type(self, ctype: str):
+        # Arrow names its integer types after the C types
+        return getattr(self._pa, ctype)() if ctype in TYPECODES else self._pa.int64()
+
+    def schema(self, sensor: str, fields: list[dict]):
+        pa = self._pa
+        return pa.schema(
+            [('board', pa.uint8()), ('addr', pa.uint8()), ('tick', pa.int64())]
+            + [(f['name'], self.arrow_type(f['type'])) for f in fields],
+            metadata={'sensor': sensor},
+        )
+
+    def _add(self, board, addr, name, records):
+        present = tuple(k for k in records[0] if k != 'tick')
+        builder = self._builders.get((name, present))
+        if builder is None:
+            fields = [f for f in registry.metadata(name)['payload_fields'] if f['name'] in present]
+            builder = self._builders[(name, present)] = _ColumnBuilder(name, fields)
+        builder.extend(board, addr, records)
+
+    def _flush(self):
+        pa = self._pa
+        for key, builder in self._builders.items():
+            n = len(builder)
+            if not n:
+                continue
+            columns = builder.columns
+            builder.reset()
+            schema, writer = self._writer(key, builder)
+            arrays = [
+                pa.Array.from_buffers(field.type, n, [None, pa.py_buffer(columns[field.name])])
+                for field in schema
+            ]
+            batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+            if self.format == 'parquet':
+                writer.write_batch(batch, row_group_size=n)
+            else:
+                writer.write_batch(batch)
+
+    def _writer(self, key, builder):
+        entry = self._writers.get(key)
+        if entry is None:
+            schema = self.schema(builder.sensor, builder.fields)
+            path = os.path.join(
+                self.root, f"{builder.sensor}_m{builder.mask:02x}_{self._stamp}.{self.format}")
+            if self.format == 'parquet':
+                import pyarrow.parquet as pq
+                writer = pq.ParquetWriter(path, schema)
+            else:
+                writer = self._pa.ipc.new_file(path, schema)
+            entry = self._writers[key] = (schema, writer)
+        return entry
+
+    def paths(self) -> list[str]:
+        return sorted(os.path.join(self.root, f) for f in os.listdir(self.root)
+                      if f.endswith(f"_{self._stamp}.{self.format}"))
+
+    def _close(self):
+        for _, writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+
+class SQLiteSink(BatchingSink):
+    """
+    Stores streamed samples in a local SQLite database, one table per
+    sensor type with board, addr, tick and every payload field from the
+    metadata (fields outside the current payload mask are NULL).
+
+    The database is opened in WAL mode on the first flush and shared by
+    whichever thread feeds or closes the sink later (access is
+    serialized by the sink's lock). Each flush runs one transaction with
+    a prepared executemany() per (sensor, enabled fields) combination,
+    so commits happen per batch of `flush_rows` samples rather than per
+    row.
+    """
+    def __init__(self, path: str, flush_rows: int = 5000, flush_interval: float = 1.0):
+        super().__init__(flush_rows, flush_interval)
+        self.path = path
+        self._db = None
+        self._tables = set()
+        self._rows = {}  # {(sensor, field names): [row tuples]}
+        self._sql = {}   # {(sensor, field names): INSERT statement}
+
+    @staticmethod
+    def table_sql(sensor: str) -> list[str]:
+        fields = registry.metadata(sensor)['payload_fields']
+        cols = ''.join(f', "{f["name"]}" INTEGER' for f in fields)
+        return [
+            f'CREATE TABLE IF NOT EXISTS "{sensor}" '
+            f'(board INTEGER NOT NULL, addr INTEGER NOT NULL, tick INTEGER NOT NULL{cols})',
+            f'CREATE INDEX IF NOT EXISTS "{sensor}_sensor_tick" ON "{sensor}" (board, addr, tick)',
+        ]
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        return db
+
+    def _add(self, board, addr, name, records):
+        names = tuple(k for k in records[0] if k != 'tick')
+        rows = self._rows.get((name, names))
+        if rows is None:
+            rows = self._rows[(name, names)] = []
+            cols = ', '.join(f'"{n}"' for n in ('board', 'addr', 'tick') + names)
+            marks = ', '.join('?' * (len(names) + 3))
+            self._sql[(name, names)] = f'INSERT INTO "{name}" ({cols}) VALUES ({marks})'
+        rows.extend((board, addr, r['tick'], *[r[n] for n in names]) for r in records)
+
+    def _flush(self):
+        if self._db is None:
+            self._db = self._connect()
+        pending, self._rows = self._rows, {}
+        db = self._db
+        db.execute('BEGIN')
+        try:
+            for (name, names), rows in pending.items():
+                if not rows:
+                    continue
+                if name not in self._tables:
+                    for stmt in self.table_sql(name):
+                        db.execute(stmt)
+                    self._tables.add(name)
+                db.executemany(self._sql[(name, names)], rows)
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+
+    def _close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
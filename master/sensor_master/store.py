@@ -0,0 +1,251 @@
+import collections
+import threading
+from array import array
+
+from .codec import decode_block, encode_block
+from .sensors import TYPECODES, registry
+
+TICK_TYPECODE = 'q'  # unwrapped 64-bit ticks
+
+
+def to_records(columns: dict) -> list[dict]:
+    """Turn a {column: values} query result back into a list of record dicts."""
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+
+class RingBuffer:
+    """
+    Fixed-capacity columnar ring of samples for one sensor: a preallocated
+    array for 'tick' plus one per payload field. Appends are O(1); once
+    full, each append overwrites the oldest sample.
+
+    Ticks are expected to increase (the stream path guarantees this), which
+    lets since()/window() binary-search instead of scanning.
+    """
+    def __init__(self, fields: list[dict], capacity: int = 4096):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.fields = tuple(f['name'] for f in fields)
+        self._cols = {'tick': array(TICK_TYPECODE, [0]) * capacity}
+        for f in fields:
+            self._cols[f['name']] = array(TYPECODES.get(f['type'], 'q'), [0]) * capacity
+        self._items = tuple(self._cols.items())
+        self._head = 0  # next slot to write
+        self._size = 0
+        self.appended = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        return sum(col.itemsize * len(col) for col in self._cols.values())
+
+    def append(self, rec: dict):
+        i = self._head
+        for name, col in self._items:
+            col[i] = rec[name]
+        self._head = (i + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+        self.appended += 1
+
+    def extend(self, records):
+        for rec in records:
+            self.append(rec)
+
+    def _physical(self, k: int) -> int:
+        return (self._head - self._size + k) % self.capacity
+
+    def _tick_at(self, k: int) -> int:
+        return self._cols['tick'][self._physical(k)]
+
+    def _bisect(self, tick: int, right: bool) -> int:
+        """First logical index whose tick is > tick (right) or >= tick (left)."""
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            t = self._tick_at(mid)
+            if t < tick or (right and t == tick):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _slice(self, start: int, stop: int) -> dict:
+        """Columns for logical indices [start, stop), oldest first."""
+        out = {}
+        if start >= stop:
+            return {name: col[:0] for name, col in self._items}
+        p0 = self._physical(start)
+        p1 = p0 + (stop - start)
+        for name, col in self._items:
+            if p1 <= self.capacity:
+                out[name] = col[p0:p1]
+            else:
+                out[name] = col[p0:] + col[:p1 - self.capacity]
+        return out
+
+    def latest(self, n: int = 1) -> dict:
+        """The newest n samples as {column: array}, oldest first."""
+        n = max(0, min(n, self._size))
+        return self._slice(self._size - n, self._size)
+
+    def since(self, tick: int) -> dict:
+        """All samples with a tick strictly after `tick`."""
+        return self._slice(self._bisect(tick, right=True), self._size)
+
+    def window(self, start: int, end: int) -> dict:
+        """Samples with start <= tick < end."""
+        return self._slice(self._bisect(start, right=False),
+                           self._bisect(end, right=False))
+
+
+class CompressedRing:
+    """
+    RingBuffer variant for long retention. Samples collect in a short
+    uncompressed tail; every `block` samples the tail is sealed into a
+    delta-of-delta / zig-zag encoded block (see codec.py). Whole blocks
+    are evicted once at least `capacity` newer samples remain.
+
+    Queries decode only the blocks overlapping the requested range and
+    return the same {column: array} results as RingBuffer.
+    """
+    def __init__(self, fields: list[dict], capacity: int = 4096, block: int = 256):
+        if capacity < 1 or block < 1:
+            raise ValueError("capacity and block must be at least 1")
+        self.capacity = capacity
+        self.block = block
+        self.fields = tuple(f['name'] for f in fields)
+        self._typecodes = (TICK_TYPECODE,) + tuple(TYPECODES.get(f['type'], 'q') for f in fields)
+        self._blocks = collections.deque()  # (first tick, last tick, count, encoded)
+        self._tail = []  # (tick, *values) rows not sealed yet
+        self._size = 0
+        self.appended = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        tail = len(self._tail) * sum(array(tc).itemsize for tc in self._typecodes)
+        return sum(len(b[3]) for b in self._blocks) + tail
+
+    def append(self, rec: dict):
+        self._tail.append((rec['tick'],) + tuple(rec[name] for name in self.fields))
+        self._size += 1
+        self.appended += 1
+        if len(self._tail) >= self.block:
+            tail, self._tail = self._tail, []
+            self._blocks.append((tail[0][0], tail[-1][0], len(tail),
+                                 encode_block(tail, len(self.fields))))
+            while self._blocks and self._size - self._blocks[0][2] >= self.capacity:
+                self._size -= self._blocks.popleft()[2]
+
+    def extend(self, records):
+        for rec in records:
+            self.append(rec)
+
+    def _rows(self, blocks):
+        width = len(self.fields)
+        for block in blocks:
+            yield from decode_block(block[3], width)
+        yield from self._tail
+
+    def _columns(self, rows) -> dict:
+        cols = [array(tc) for tc in self._typecodes]
+        for row in rows:
+            for col, v in zip(cols, row):
+                col.append(v)
+        return dict(zip(('tick',) + self.fields, cols))
+
+    def latest(self, n: int = 1) -> dict:
+        n = max(0, min(n, self._size))
+        need = n - len(self._tail)
+        blocks = []
+        for block in reversed(self._blocks):
+            if need <= 0:
+                break
+            blocks.append(block)
+            need -= block[2]
+        rows = list(self._rows(reversed(blocks)))
+        return self._columns(rows[len(rows) - n:])
+
+    def since(self, tick: int) -> dict:
+        blocks = [b for b in self._blocks if b[1] > tick]
+        return self._columns(r for r in self._rows(blocks) if r[0] > tick)
+
+    def window(self, start: int, end: int) -> dict:
+        blocks = [b for b in self._blocks if b[1] >= start and b[0] < end]
+        return self._columns(r for r in self._rows(blocks) if start <= r[0] < end)
+
+
+class SampleStore:
+    """
+    Backend-owned recent history: one RingBuffer per (board, addr), created
+    on the first batch from that sensor. Memory is bounded by
+    capacity × number of sensors regardless of how long the stream runs.
+
+    A sensor whose record layout changes (e.g. a new payload mask) gets a
+    fresh ring, since columns cannot change type in place.
+
+    With compress_block set, each sensor gets a CompressedRing sealing
+    blocks of that many samples, trading query CPU for memory.
+    """
+    def __init__(self, capacity: int = 4096, compress_block: int = None):
+        self.capacity = capacity
+        self.compress_block = compress_block
+        self._rings = {}  # {(board, addr): (sensor, record keys, RingBuffer)}
+        self._lock = threading.Lock()
+
+    def append(self, board: int, addr: int, name: str, records: list[dict]):
+        """Stream-consumer entry point: store one decoded batch."""
+        if not records:
+            return
+        # every record of a batch shares one payload mask, so one layout
+        present = tuple(k for k in records[0] if k != 'tick')
+        key = (board, addr)
+        with self._lock:
+            entry = self._rings.get(key)
+            if entry is None or entry[0] != name or entry[1] != present:
+                fields = [f for f in registry.metadata(name)['payload_fields']
+                          if f['name'] in present]
+                if self.compress_block:
+                    ring = CompressedRing(fields, self.capacity, self.compress_block)
+                else:
+                    ring = RingBuffer(fields, self.capacity)
+                entry = self._rings[key] = (name, present, ring)
+            entry[2].extend(records)
+
+    __call__ = append
+
+    def ring(self, board: int, addr: int):
+        entry = self._rings.get((board, addr))
+        return entry[2] if entry is not None else None
+
+    def keys(self) -> list[tuple]:
+        return list(self._rings)
+
+    def sensor(self, board: int, addr: int):
+        entry = self._rings.get((board, addr))
+        return entry[0] if entry is not None else None
+
+    def _query(self, board, addr, method, *args) -> dict:
+        with self._lock:
+            ring = self.ring(board, addr)
+            return getattr(ring, method)(*args) if ring is not None else {}
+
+    def latest(self, board: int, addr: int, n: int = 1) -> dict:
+        return self._query(board, addr, 'latest', n)
+
+    def since(self, board: int, addr: int, tick: int) -> dict:
+        return self._query(board, addr, 'since', tick)
+
+    def window(self, board: int, addr: int, start: int, end: int) -> dict:
+        return self._query(board, addr, 'window', start, end)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(entry[2].nbytes for entry in list(self._rings.values()))
@@ -0,0 +1,210 @@
+"""
+Process-per-bus collection.
+
+BusSupervisor runs one worker process per RS-485 port. Each worker owns a
+SensorBackend and its scheduler, so decoding, scaling and the worker's own
+consumers for one bus run on their own core. Decoded batches come back to
+the parent over a pipe, using the same fixed-width batch encoding as the
+hub (ipc.encode_batch), and are fanned out to the supervisor's consumers
+as one merged stream:
+
+    callback(port, board, addr, name, records)
+
+A worker that dies is restarted after `restart_delay` seconds.
+"""
+import multiprocessing
+import threading
+import time
+from multiprocessing.connection import wait
+
+from .backend import SensorBackend
+from .dispatch import Consumer, DROP_OLDEST
+from .ipc import decode_batch, encode_batch
+
+_STOP = b'stop'
+
+
+def _worker(conn, port: str, baud: int, timeout: float, only, factory):
+    """Worker process body: stream one port into `conn` until told to stop."""
+    backend = factory(port=port, baud=baud, timeout=timeout)
+
+    def forward(board, addr, name, records):
+        if records:
+            conn.send_bytes(encode_batch(board, addr, name, records))
+
+    # a slow parent backs up this consumer's queue, never the worker's bus thread
+    backend.add_consumer(forward, maxsize=256, policy='drop-oldest')
+    backend.start_stream(None, only=only)
+    try:
+        while conn.recv_bytes() != _STOP:
+            pass
+    except (EOFError, OSError):
+        pass  # parent went away
+    finally:
+        backend.stop_stream()
+        conn.close()
+
+
+class _Worker:
+    __slots__ = ('port', 'process', 'conn', 'restarts', 'batches', 'started', 'restart_at')
+
+    def __init__(self, port: str):
+        self.port = port
+        self.process = None
+        self.conn = None
+        self.restarts = 0
+        self.batches = 0
+        self.started = None
+        self.restart_at = None
+
+
+class BusSupervisor:
+    """
+    Supervise one collector process per port and merge their streams.
+
+    `only` optionally maps a port to the (board, addr) pairs to stream
+    there, as for SensorBackend.start_stream. `factory` builds the
+    backend inside each worker (SensorBackend by default; it must be
+    importable by name, since workers are started with `context`).
+    """
+    def __init__(self, ports: list[str], baud: int = 115200, timeout: float = 0.05,
+                 restart_delay: float = 1.0, factory=SensorBackend, context: str = 'spawn'):
+        self.ports = list(ports)
+        self.baud = baud
+        self.timeout = timeout
+        self.restart_delay = restart_delay
+        self.factory = factory
+        self._ctx = multiprocessing.get_context(context)
+        self._workers = {port: _Worker(port) for port in self.ports}
+        self._consumers = ()  # replaced, never mutated, as in Dispatcher
+        self._only = {}
+        self._running = False
+        self._stop_by = None
+        self._monitor = None
+
+    # ——— merged subscription API ———
+
+    def add_consumer(self, callback, maxsize: int = 64, policy: str = DROP_OLDEST) -> Consumer:
+        """Attach callback(port, board, addr, name, records) with its own bounded queue."""
+        consumer = Consumer(callback, maxsize, policy)
+        self._consumers = self._consumers + (consumer,)
+        if self._running:
+            consumer.start()
+        return consumer
+
+    def remove_consumer(self, consumer: Consumer):
+        self._consumers = tuple(c for c in self._consumers if c is not consumer)
+        consumer.close()
+
+    def start(self, callback=None, only: dict = None):
+        """Start every worker; `callback`, if given, is attached as a consumer."""
+        if self._running:
+            raise RuntimeError("Already streaming")
+        if callback is not None:
+            self.add_consumer(callback)
+        self._only = dict(only or {})
+        for consumer in self._consumers:
+            consumer.start()
+        self._running = True
+        for worker in self._workers.values():
+            self._spawn(worker)
+        self._monitor = threading.Thread(target=self._run, daemon=True)
+        self._monitor.start()
+
+    def stop(self, grace: float = 5.0):
+        """Ask every worker to stop, wait up to `grace` seconds, then drain the consumers."""
+        if not self._running:
+            return
+        self._running = False
+        self._stop_by = time.monotonic() + grace
+        for worker in self._workers.values():
+            try:
+                worker.conn.send_bytes(_STOP)
+            except (OSError, AttributeError):
+                pass
+        self._monitor.join()
+        self._monitor = None
+        for worker in self._workers.values():
+            if worker.process is not None:
+                worker.process.join(max(0.0, self._stop_by - time.monotonic()))
+                if worker.process.is_alive():
+                    worker.process.terminate()
+                    worker.process.join()
+            if worker.conn is not None:
+                worker.conn.close()
+            worker.process = worker.conn = None
+        for consumer in self._consumers:
+            consumer.close()
+
+    def stats(self) -> dict:
+        """{ port: {alive, pid, restarts, batches, uptime_s} }"""
+        now = time.monotonic()
+        out = {}
+        for port, w in self._workers.items():
+            p = w.process
+            out[port] = {
+                'alive':    bool(p is not None and p.is_alive()),
+                'pid':      p.pid if p is not None else None,
+                'restarts': w.restarts,
+                'batches':  w.batches,
+                'uptime_s': now - w.started if w.started is not None and p is not None else 0.0,
+            }
+        return out
+
+    # ——— workers ———
+
+    def _spawn(self, worker: _Worker):
+        old = worker.process
+        if old is not None and old.is_alive():
+            old.terminate()  # lost its pipe but never exited; start() reaps it later
+        parent, child = self._ctx.Pipe()
+        worker.process = self._ctx.Process(
+            target=_worker, name=f"bus-{worker.port}", daemon=True,
+            args=(child, worker.port, self.baud, self.timeout,
+                  self._only.get(worker.port), self.factory),
+        )
+        worker.process.start()
+        child.close()  # keep only the worker's copy, so its exit reads as EOF here
+        worker.conn = parent
+        worker.started = time.monotonic()
+        worker.restart_at = None
+
+    def _run(self):
+        while True:
+            live = {w.conn: w for w in self._workers.values() if w.conn is not None}
+            if not self._running and (not live or time.monotonic() > self._stop_by):
+                return
+            pending = [w.restart_at for w in self._workers.values() if w.restart_at is not None]
+            wake = max(0.0, min(pending) - time.monotonic()) if pending else 0.5
+            for conn in wait(list(live), min(wake, 0.5)):
+                worker = live[conn]
+                try:
+                    data = conn.recv_bytes()
+                except (EOFError, OSError):
+                    self._lost(worker)
+                    continue
+                worker.batches += 1
+                item = (worker.port,) + decode_batch(data)
+                for consumer in self._consumers:
+                    consumer.offer(item)
+            if self._running:
+                now = time.monotonic()
+                for worker in self._workers.values():
+                    if worker.restart_at is not None and now >= worker.restart_at:
+                        worker.restarts += 1
+                        self._spawn(worker)
+
+    def _lost(self, worker: _Worker):
+        """
+        A worker's pipe closed: schedule a restart unless stopping. Runs on
+        the monitor thread, so it only polls the exit code; a worker still
+        shutting down is reaped when the next one starts.
+        """
+        worker.conn.close()
+        worker.conn = None
+        code = worker.process.exitcode
+        if self._running:
+            status = 'still exiting' if code is None else code
+            print(f"[Supervisor error] worker for {worker.port} exited ({status}); "
+                  f"restarting in {self.restart_delay}s")
+            worker.restart_at = time.monotonic() + self.restart_delay
@@ -0,0 +1,174 @@
+"""
+Board tick → host time alignment and a time-ordered merge across boards.
+
+Each board counts its own millisecond ticks. The scheduler feeds a
+TickClock per board with (newest tick in a response, host time the
+response arrived); transport and queueing only ever add delay, so the
+lower envelope of host − tick tracks the board's offset, and its slope
+across the window tracks the crystal's drift.
+
+TimeMerger is a stream consumer that places every record on the host
+timeline and releases them in global time order from a heap, holding
+each one at most `window_s` seconds (the reorder window).
+"""
+import collections
+import heapq
+import itertools
+import threading
+import time
+
+MAX_DRIFT = 1e-3  # 1000 ppm: anything steeper is noise, not a crystal
+
+
+class TickClock:
+    """
+    Offset and drift of one board's tick clock relative to host time,
+    estimated from the last `window` observations.
+    """
+    __slots__ = ('window', '_obs', '_fit')
+
+    def __init__(self, window: int = 64):
+        self.window = window
+        self._obs = collections.deque(maxlen=window)  # (tick ms, host ms − tick)
+        self._fit = None  # (anchor tick, residual at anchor, drift)
+
+    def observe(self, tick: int, host_s: float):
+        """Record that `tick` had been sampled by host time `host_s` (seconds)."""
+        obs = self._obs
+        if obs and tick < obs[-1][0]:
+            obs.clear()  # board reset: the old relation no longer holds
+        obs.append((tick, host_s * 1000.0 - tick))
+        self._fit = None
+
+    def _estimate(self):
+        if self._fit is None:
+            obs = list(self._obs)
+            half = len(obs) // 2
+            t2, r2 = min(obs[half:], key=lambda o: o[1])
+            drift = 0.0
+            if half:
+                t1, r1 = min(obs[:half], key=lambda o: o[1])
+                if t2 > t1:
+                    drift = max(-MAX_DRIFT, min(MAX_DRIFT, (r2 - r1) / (t2 - t1)))
+            self._fit = (t2, r2, drift)
+        return self._fit
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._obs)
+
+    def to_host(self, tick: int) -> float:
+        """Host time (seconds) at which the board's clock read `tick`."""
+        anchor, residual, drift = self._estimate()
+        return (tick + residual + drift * (tick - anchor)) / 1000.0
+
+    def snapshot(self) -> dict:
+        if not self._obs:
+            return {'observations': 0}
+        anchor, residual, drift = self._estimate()
+        return {'observations': len(self._obs), 'anchor_tick': anchor,
+                'offset_ms': residual, 'drift_ppm': drift * 1e6}
+
+
+class TimeMerger:
+    """
+    K-way merge of every sensor's stream into one feed ordered by host
+    time. Records are released once they are `window_s` old, or earlier
+    once every stream seen in the last window has moved past them, so the
+    window should exceed the slowest poll interval.
+    Records older than what was already released arrive too late to keep
+    the order; they are counted in `late` and dropped.
+
+    Use as a stream consumer; read with drain() or by iterating, which
+    blocks and yields (host_time, board, addr, name, record) tuples.
+    """
+    def __init__(self, clocks: dict, window_s: float = 2.0, max_pending: int = 100_000,
+                 clock=time.time):
+        self.clocks = clocks  # {board: TickClock}, e.g. StreamScheduler.clocks
+        self.window_s = window_s
+        self.max_pending = max_pending
+        self.late = 0
+        self.forced = 0
+        self._clock = clock
+        self._heap = []
+        self._seq = itertools.count()
+        self._latest = {}  # {(board, addr): (newest host time, arrival)}
+        self._released = float('-inf')
+        self._cond = threading.Condition()
+        self._closed = False
+        self.consumer = None  # the stream Consumer feeding us, when attached by a backend
+
+    def append(self, board: int, addr: int, name: str, records: list[dict]):
+        clock = self.clocks.get(board)
+        if not records or clock is None or not clock.ready:
+            return
+        with self._cond:
+            newest = None
+            for rec in records:
+                t = clock.to_host(rec['tick'])
+                if t < self._released:
+                    self.late += 1
+                    continue
+                heapq.heappush(self._heap, (t, next(self._seq), board, addr, name, rec))
+                newest = t if newest is None or t > newest else newest
+            if newest is not None:
+                self._latest[(board, addr)] = (newest, self._clock())
+            self._cond.notify_all()
+
+    __call__ = append
+
+    def _watermark(self, now: float) -> float:
+        mark = now - self.window_s
+        active = [t for t, seen in self._latest.values() if seen >= mark]
+        if active:
+            mark = max(mark, min(active))
+        return mark
+
+    def _pop_ready(self, now: float) -> list:
+        heap = self._heap
+        mark = self._watermark(now)
+        out = []
+        while heap and (heap[0][0] <= mark or len(heap) > self.max_pending):
+            if heap[0][0] > mark:
+                self.forced += 1
+            t, _, board, addr, name, rec = heapq.heappop(heap)
+            self._released = t
+            out.append((t, board, addr, name, rec))
+        return out
+
+    def drain(self) -> list:
+        """Every record that is ready now, in host-time order."""
+        with self._cond:
+            return self._pop_ready(self._clock())
+
+    def flush(self) -> list:
+        """Release everything still held, in order (e.g. at shutdown)."""
+        with self._cond:
+            out = [(t, b, a, n, r) for t, _, b, a, n, r in sorted(self._heap)]
+            self._heap.clear()
+            if out:
+                self._released = out[-1][0]
+            return out
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __iter__(self):
+        while True:
+            with self._cond:
+                ready = self._pop_ready(self._clock())
+                if not ready:
+                    if self._closed:
+                        return
+                    wait = self.window_s
+                    if self._heap:
+                        wait = max(0.001, self._heap[0][0] + self.window_s - self._clock())
+                    self._cond.wait(min(wait, self.window_s))
+                    continue
+            yield from ready
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap)
@@ -0,0 +1,240 @@
+"""
+Local HTTP API over a SensorBackend, for dashboards.
+
+  GET /api/discovery                     cached discovery result
+  GET /api/config/<board>/<addr>         cached config of one sensor
+  GET /api/latest/<board>/<addr>?n=1     newest samples from stream history
+  GET /api/stream?only=1:0x40&only=2     Server-Sent Events, one 'batch'
+                                         event per decoded batch
+
+Boards and addresses accept decimal or 0x-hex. JSON endpoints are served
+from the backend's caches; the stream runs while at least one SSE client
+is connected.
+"""
+import json
+import queue
+import select
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .backend import SensorBackend
+
+KEEPALIVE_S = 15.0
+POLL_S = 0.5  # how often an idle stream checks whether its client went away
+
+
+def _json(value) -> bytes:
+    # array.array columns and other iterables become lists
+    return json.dumps(value, default=list).encode()
+
+
+def encode_event(board: int, addr: int, name: str, records: list[dict]) -> bytes:
+    """One batch as a complete SSE 'batch' event."""
+    data = _json({'board': board, 'addr': addr, 'sensor': name, 'records': records})
+    return b'event: batch\ndata: ' + data + b'\n\n'
+
+
+def _parse_only(values: list[str]):
+    """['1:0x40', '2'] -> {(1, 0x40), (2, None)}; empty means everything."""
+    only = set()
+    for v in values:
+        board, _, addr = v.partition(':')
+        only.add((int(board, 0), int(addr, 0) if addr else None))
+    return only
+
+
+class _EventClient:
+    """
+    One connected SSE client. Events are queued for its handler thread to
+    write; a client whose queue fills up is dropped rather than letting
+    it hold back the stream.
+    """
+    def __init__(self, sock, only: set, maxsize: int):
+        self.sock = sock
+        self.only = only
+        self.queue = queue.Queue(maxsize)
+        self.dropped = False
+
+    def wants(self, board: int, addr: int) -> bool:
+        only = self.only
+        return not only or (board, addr) in only or (board, None) in only
+
+    def offer(self, data: bytes):
+        try:
+            self.queue.put_nowait(data)
+        except queue.Full:
+            self.drop()
+
+    def gone(self) -> bool:
+        """True once the peer has closed its end (idle streams never write)."""
+        readable, _, _ = select.select([self.sock], [], [], 0)
+        try:
+            return bool(readable) and self.sock.recv(1, socket.MSG_PEEK) == b''
+        except OSError:
+            return True
+
+    def drop(self):
+        if not self.dropped:
+            self.dropped = True
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)  # wakes a blocked write
+            except OSError:
+                pass
+
+
+class WebServer:
+    """
+    Threaded HTTP server on host:port (local-only by default) serving the
+    API above. Every stream batch is encoded once and the same bytes are
+    queued to each interested client; `client_queue` bounds how many
+    events a client may fall behind before it is disconnected.
+    """
+    def __init__(self, backend: SensorBackend, host: str = '127.0.0.1', port: int = 8080,
+                 client_queue: int = 256):
+        self.backend = backend
+        self.host = host
+        self.port = port
+        self.client_queue = client_queue
+        self.dropped_clients = 0
+        self._clients = set()
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+        self.backend.add_consumer(self._broadcast, maxsize=256)
+
+    # ——— lifecycle ———
+
+    def start(self):
+        """Bind and serve on a background thread."""
+        self._httpd = ThreadingHTTPServer((self.host, self.port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def serve_forever(self):
+        self.start()
+        self._thread.join()
+
+    def close(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            client.drop()
+        self._thread = None
+
+    # ——— requests ———
+
+    def route(self, path: str, params: dict):
+        """JSON body for a GET on `path`; raises KeyError for unknown paths."""
+        parts = [p for p in path.split('/') if p]
+        if parts == ['api', 'discovery']:
+            discovery = self.backend.discover(refresh=False)
+            return {str(board): sensors for board, sensors in discovery.items()}
+        if len(parts) == 4 and parts[:2] == ['api', 'config']:
+            board, addr = int(parts[2], 0), int(parts[3], 0)
+            for s in self.backend.discover(refresh=False).get(board, []):
+                if s['addr'] == addr:
+                    return s['config']
+            raise KeyError(f"No sensor at board {board} addr 0x{addr:02X}")
+        if len(parts) == 4 and parts[:2] == ['api', 'latest']:
+            board, addr = int(parts[2], 0), int(parts[3], 0)
+            n = int(params.get('n', ['1'])[0])
+            return self.backend.latest_samples(board, addr, n)
+        raise KeyError(f"Unknown path {path}")
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass  # keep the console for the CLI
+
+            def _reply(self, code: int, body: bytes):
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                params = parse_qs(url.query)
+                if url.path.rstrip('/') == '/api/stream':
+                    try:
+                        only = _parse_only(params.get('only', []))
+                    except ValueError as e:
+                        return self._reply(400, _json({'error': str(e)}))
+                    return server._stream(self, only)
+                try:
+                    body = _json(server.route(url.path, params))
+                except KeyError as e:
+                    return self._reply(404, _json({'error': e.args[0]}))
+                except (ValueError, RuntimeError, IOError) as e:
+                    return self._reply(400 if isinstance(e, ValueError) else 502,
+                                       _json({'error': str(e)}))
+                self._reply(200, body)
+
+        return Handler
+
+    # ——— streaming ———
+
+    def _stream(self, handler, only: set):
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/event-stream')
+        handler.send_header('Cache-Control', 'no-cache')
+        handler.end_headers()
+        handler.close_connection = True
+        client = _EventClient(handler.connection, only, self.client_queue)
+        try:
+            with self._lock:
+                self._clients.add(client)
+            # the first client starts the bus stream from cached discovery
+            self.backend.start_stream(None, rescan=False)
+            handler.wfile.write(b': connected\n\n')
+            handler.wfile.flush()
+            idle_since = time.monotonic()
+            while not client.dropped:
+                try:
+                    data = client.queue.get(timeout=POLL_S)
+                except queue.Empty:
+                    if client.gone():
+                        break
+                    if time.monotonic() - idle_since < KEEPALIVE_S:
+                        continue
+                    data = b': keepalive\n\n'
+                if client.dropped:
+                    break
+                idle_since = time.monotonic()
+                handler.wfile.write(data)
+                handler.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._clients.discard(client)
+                if client.dropped and self._httpd is not None:
+                    self.dropped_clients += 1
+                streaming = bool(self._clients)
+            if not streaming and self._httpd is not None:
+                self.backend.stop_stream()
+
+    def _broadcast(self, board, addr, name, records):
+        data = None
+        with self._lock:
+            clients = [c for c in self._clients if c.wants(board, addr)]
+        for client in clients:
+            if data is None:
+                data = encode_event(board, addr, name, records)
+            client.offer(data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'clients': len(self._clients), 'dropped_clients': self.dropped_clients}
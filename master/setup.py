@@ -18,7 +18,13 @@ setup(
             "pytest>=8.0",
             "pytest-cov>=6.0",
             "jsonschema>=4.0.0",
-        ]
+        ],
+        "arrow": [
+            "pyarrow>=14.0",
+        ],
+        "numpy": [
+            "numpy>=1.24",
+        ],
     },
     entry_points={
         "console_scripts": [
@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+from sensor_master.archive import SampleArchive, record_struct, INDEX_ENTRY
+from sensor_master.sensors import registry
+
+
+def batch(ticks):
+    return [{'tick': t, 'bus_voltage_mV': 5000 + t % 100, 'shunt_voltage_uV': -(t % 50)}
+            for t in ticks]
+
+
+def test_append_and_range_read(tmp_path):
+    arch = SampleArchive(str(tmp_path), index_every=4)
+    for start in range(0, 1000, 100):
+        arch.append(1, 0x40, 'ina219', batch(range(start, start + 100, 10)))
+
+    views = arch.read(1, 0x40, 205, 260)
+    assert len(views) == 1
+    assert isinstance(views[0].buffer, memoryview)
+    assert [r['tick'] for r in views[0].records()] == [210, 220, 230, 240, 250]
+    assert views[0].records()[0] == batch([210])[0]
+
+    assert arch.records(1, 0x40, 0, 30) == batch([0, 10, 20])
+    assert len(arch.records(1, 0x40, 0, 10_000)) == 100
+    assert arch.records(1, 0x40, 5000, 6000) == []
+    assert arch.records(2, 0x40, 0, 10_000) == []
+    arch.close()
+
+
+def test_segments_roll_and_index_is_sparse(tmp_path):
+    arch = SampleArchive(str(tmp_path), segment_records=8, index_every=4)
+    arch.append(1, 0x40, 'ina219', batch(range(0, 200, 10)))  # 20 records
+
+    (sensor, mask, directory), = arch.layouts(1, 0x40)
+    assert sensor == 'ina219' and mask == 0b11
+    segs = sorted(f for f in os.listdir(directory) if f.endswith('.seg'))
+    assert segs == [f"{t:020d}.seg" for t in (0, 80, 160)]
+
+    fields = registry.payload_layout('ina219', mask)
+    assert os.path.getsize(os.path.join(directory, segs[0])) == 8 * record_struct(fields).size
+    idx = os.path.getsize(os.path.join(directory, segs[0][:-4] + '.idx'))
+    assert idx == 2 * INDEX_ENTRY.size
+
+    # a range spanning segment boundaries returns one view per segment
+    views = arch.read(1, 0x40, 50, 175)
+    assert [len(v) for v in views] == [3, 8, 2]
+    assert [r['tick'] for v in views for r in v.records()][0] == 50
+
+
+def test_tick_reset_and_layout_change_start_new_files(tmp_path):
+    arch = SampleArchive(str(tmp_path))
+    arch.append(1, 0x40, 'ina219', batch([100, 200]))
+    arch.append(1, 0x40, 'ina219', batch([50]))  # board reset: ticks went back
+    arch.append(1, 0x40, 'ina219', [{'tick': 300, 'power_mW': 12}])
+
+    assert [m for _, m, _ in arch.layouts(1, 0x40)] == [0b11, 0b1000]
+    assert arch.records(1, 0x40, 0, 1000) == batch([50, 100, 200]) + [{'tick': 300, 'power_mW': 12}]
+
+
+def test_closed_segments_are_compressed(tmp_path):
+    arch = SampleArchive(str(tmp_path), segment_records=100, index_every=16, compress=True)
+    samples = [{'tick': t, 'bus_voltage_mV': 5000 + (t // 70) % 3, 'shunt_voltage_uV': -4}
+               for t in range(0, 2500, 10)]
+    arch.append(1, 0x40, 'ina219', samples)
+
+    (_, _, directory), = arch.layouts(1, 0x40)
+    files = sorted(os.listdir(directory))
+    # two closed segments packed, the open one still fixed-width
+    assert [f[-4:] for f in files] == ['.gix', '.gor', '.gix', '.gor', '.idx', '.seg']
+    packed = os.path.getsize(os.path.join(directory, files[1]))
+    assert packed * 5 < 100 * 12
+
+    assert arch.records(1, 0x40, 0, 10_000) == samples
+    assert arch.records(1, 0x40, 155, 1205) == samples[16:121]
+    assert arch.records(1, 0x40, 995, 1000) == []
+
+    arch.close()
+    assert not any(f.endswith('.seg') for f in os.listdir(directory))
+    assert arch.records(1, 0x40, 0, 10_000) == samples
+
+
+def test_close_unmaps_released_views(tmp_path):
+    arch = SampleArchive(str(tmp_path), segment_records=8)
+    arch.append(1, 0x40, 'ina219', batch(range(0, 160, 10)))
+    arch.close()  # closes the open segment too
+
+    kept, released = arch.read(1, 0x40, 0, 1000)
+    maps = list(arch._maps)
+    assert len(maps) == 2
+    released.release()
+    arch.close()
+    assert sum(mm.closed for mm in maps) == 1 and not arch._maps
+    assert len(kept.records()) == 8  # still mapped while the caller holds it
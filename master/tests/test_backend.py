@@ -20,6 +20,9 @@ class DummyBound:
         # Simulate config lookup
         return self._configs.get((addr, name), {})
 
+    def get_payload_mask(self, addr):
+        return 0x03
+
 
 class DummyStreamScheduler:
     def __init__(self, bm, timeout):
@@ -28,6 +31,11 @@ class DummyStreamScheduler:
         self.subscriptions = []
         self.started = False
         self.stopped = False
+        self.consumers = []
+        self.policies = []
+        self.derivers = {}
+        self.clocks = {}
+        self.sample_periods = {}
 
     def start(self, callback):
         self.started = True
@@ -39,6 +47,36 @@ class DummyStreamScheduler:
     def clear_subscriptions(self):
         self.subscriptions.clear()
 
+    def add_consumer(self, callback, maxsize=64, policy='drop-oldest', batched=False):
+        self.consumers.append(callback)
+        self.policies.append(policy)
+        return callback
+
+    def remove_consumer(self, consumer):
+        self.consumers.remove(consumer)
+
+    def qos_snapshot(self):
+        return {(5, 0x10): {'polls': 3}}
+
+    published_qos = {(5, 0x10): {'polls': 2}}
+
+    def consumer_stats(self):
+        return []
+
+    def subscribe(self, board, addr, sensor, interval):
+        self.subscriptions.append((board, addr, sensor, interval))
+
+    def unsubscribe(self, board, addr):
+        before = len(self.subscriptions)
+        self.subscriptions[:] = [s for s in self.subscriptions if s[:2] != (board, addr)]
+        return len(self.subscriptions) != before
+
+    def retune(self, board, addr, interval):
+        self.subscriptions[:] = [
+            (b, a, n, interval) if (b, a) == (board, addr) else (b, a, n, i)
+            for b, a, n, i in self.subscriptions
+        ]
+
 
 @pytest.fixture(autouse=True)
 def patch_dependencies(monkeypatch):
@@ -197,6 +235,8 @@ def test_start_and_stop_stream(monkeypatch):
     assert (5, 0x10, 's1', 3 * 0.1) in subs
     assert (5, 0x20, 's2', 7 * 0.1) in subs
     assert sb.stream_scheduler.started
+    # gaps are judged against each sensor's sample period, in ms
+    assert sb.stream_scheduler.sample_periods == {(5, 0x10): 300, (5, 0x20): 700}
 
     # Calling start_stream again (already STREAM) should do nothing
     sb.stream_scheduler.started = False
@@ -265,3 +305,295 @@ def test_facade_methods(monkeypatch):
     # payload-mask façades
     assert sb.set_payload_mask(9, 0x10, 0xAA) == 'mask_set'
     assert sb.get_payload_mask(9, 0x10) == 0xFF
+
+
+def test_get_stream_stats_delegates_to_scheduler():
+    sb = SensorBackend()
+    assert sb.get_stream_stats() == {(5, 0x10): {'polls': 3}}
+
+
+def test_start_stream_filters_sensors(monkeypatch):
+    sb = SensorBackend()
+    discovery_map = {
+        5: [{'name': 's1', 'addr': 0x10, 'config': {'period': 3}},
+            {'name': 's2', 'addr': 0x20, 'config': {'period': 7}}],
+        6: [{'name': 's3', 'addr': 0x10, 'config': {'period': 5}}],
+    }
+    monkeypatch.setattr(sb, "_do_discovery", lambda: discovery_map)
+
+    sb.start_stream(callback=lambda *args: None, only=[(5, 0x20), (6, None)])
+    assert sorted(sb.stream_scheduler.subscriptions) == [
+        (5, 0x20, 's2', 7 * 0.1), (6, 0x10, 's3', 5 * 0.1)
+    ]
+    sb.stop_stream()
+
+    with pytest.raises(ValueError):
+        sb.start_stream(callback=lambda *args: None, only=[(9, None)])
+    assert sb.mode == Mode.IDLE
+
+
+def test_live_subscription_facades():
+    sb = SensorBackend()
+    sb.subscribe(5, 0x10, 's1', 0.5)
+    sb.retune(5, 0x10, 0.2)
+    assert sb.stream_scheduler.subscriptions == [(5, 0x10, 's1', 0.2)]
+    assert sb.unsubscribe(5, 0x10)
+    assert sb.stream_scheduler.subscriptions == []
+
+
+def test_stream_history_is_stored_and_queryable():
+    sb = SensorBackend()
+    # the store is attached as a stream consumer at construction
+    assert sb.store.append in sb.stream_scheduler.consumers
+
+    sb.store.append(5, 0x40, 'ina219', [
+        {'tick': t, 'bus_voltage_mV': 5000 + t} for t in (100, 200, 300)
+    ])
+    assert list(sb.latest_samples(5, 0x40)['tick']) == [300]
+    assert list(sb.samples_since(5, 0x40, 100)['bus_voltage_mV']) == [5200, 5300]
+    assert list(sb.samples_window(5, 0x40, 100, 300)['tick']) == [100, 200]
+
+
+def test_archive_is_opt_in(tmp_path):
+    sb = SensorBackend()
+    with pytest.raises(RuntimeError):
+        sb.read_archive(5, 0x40, 0, 1000)
+
+    arch = sb.enable_archive(str(tmp_path))
+    assert sb.enable_archive(str(tmp_path)) is arch
+    assert arch.append in sb.stream_scheduler.consumers
+
+    arch.append(5, 0x40, 'ina219', [{'tick': 10, 'bus_voltage_mV': 5000}])
+    assert sb.read_archive(5, 0x40, 0, 1000) == [{'tick': 10, 'bus_voltage_mV': 5000}]
+
+
+def test_sinks_attach_and_detach():
+    closed = []
+
+    class Sink:
+        def __call__(self, board, addr, name, records):
+            pass
+
+        def close(self):
+            closed.append(self)
+
+    sb = SensorBackend()
+    removed = []
+    sb.stream_scheduler.remove_consumer = removed.append
+    sink = sb.add_sink(Sink())
+    assert sink in sb.stream_scheduler.consumers
+    sb.remove_sink(sink)
+    assert removed == [sink] and closed == [sink]
+    assert sb.sinks == {}
+
+
+def test_rollups_are_maintained_from_the_stream():
+    sb = SensorBackend()
+    assert sb.rollups.append in sb.stream_scheduler.consumers
+    sb.rollups.append(5, 0x40, 'ina219', [{'tick': t, 'current_uA': t} for t in (0, 500, 1000)])
+    s = sb.rollup_series(5, 0x40)
+    assert s['start'] == [0] and s['current_uA_max'] == [500]
+
+
+def test_energy_integration_is_opt_in():
+    sb = SensorBackend()
+    assert sb.get_energy() == {}
+    energy = sb.enable_energy()
+    assert energy.append in sb.stream_scheduler.consumers
+    sb.config_cache[(5, 0x40, 'ina219')] = {'current_lsb_uA': 1000}  # power counts are mW
+    energy.append(5, 0x40, 'ina219', [{'tick': 0, 'power_mW': 3600}, {'tick': 1000, 'power_mW': 3600}])
+    assert sb.get_energy()[(5, 0x40)]['energy_Wh'] == pytest.approx(0.001)
+
+
+def test_published_metrics_read_published_snapshots():
+    sb = SensorBackend()
+    sb.board_mgr.metrics = None
+    assert sb.get_published_metrics() == {
+        'transport': {}, 'streams': {(5, 0x10): {'polls': 2}}, 'consumers': []}
+
+    class Metrics:
+        published = {'busy_s': 1.0}
+    sb.board_mgr.metrics = Metrics()
+    assert sb.get_published_metrics()['transport'] == {'busy_s': 1.0}
+
+
+def test_shared_rings_are_opt_in():
+    sb = SensorBackend()
+    assert sb.rings is None
+    rings = sb.enable_shared_rings(prefix='tb', capacity=16)
+    assert rings.append in sb.stream_scheduler.consumers
+    assert sb.enable_shared_rings() is rings
+
+
+def test_close_tears_down_what_the_backend_opened(tmp_path):
+    import os
+    from sensor_master.archive import SampleArchive
+    from sensor_master.shmring import RingReader
+
+    closed = []
+
+    class Sink:
+        def __call__(self, board, addr, name, records):
+            pass
+
+        def close(self):
+            closed.append(self)
+
+    sb = SensorBackend()
+    sb.mode = Mode.STREAM
+    sink = sb.add_sink(Sink())
+    archive = sb.enable_archive(str(tmp_path / 'arch'))
+    energy = sb.enable_energy(str(tmp_path / 'energy.json'), checkpoint_every=1000)
+    rings = sb.enable_shared_rings(prefix=f"tc{os.getpid()}", capacity=16)
+    recs = [{'tick': 0, 'bus_voltage_mV': 5000, 'power_mW': 10},
+            {'tick': 100, 'bus_voltage_mV': 5001, 'power_mW': 10}]
+    for part in (archive, energy, rings):
+        part.append(5, 0x40, 'ina219', recs)
+    (name,) = rings.names()
+
+    sb.close()
+    assert sb.stream_scheduler.stopped and sb.mode == Mode.IDLE
+    assert closed == [sink] and sb.stream_scheduler.consumers == [sb.store.append, sb.rollups.append]
+    assert sb.archive is sb.energy is sb.rings is None
+    assert (tmp_path / 'energy.json').exists()  # checkpoint written on close
+    assert SampleArchive(str(tmp_path / 'arch')).records(5, 0x40, 0, 1000) == [
+        {'tick': 0, 'bus_voltage_mV': 5000, 'power_mW': 10},
+        {'tick': 100, 'bus_voltage_mV': 5001, 'power_mW': 10}]
+    with pytest.raises(FileNotFoundError):
+        RingReader(name)
+    sb.close()  # idempotent
+
+
+class MaskBound(DummyBound):
+    def __init__(self, log):
+        super().__init__()
+        self.log = log
+
+    def set_payload_mask(self, addr, mask):
+        self.log.append((addr, mask))
+        return 0
+
+
+def ina219_backend(log):
+    sb = SensorBackend()
+    sb.board_mgr.select = lambda board: MaskBound(log)
+    sb.discovery_cache = {1: [{'name': 'ina219', 'addr': 0x40, 'config': {}},
+                              {'name': 'ina219', 'addr': 0x41, 'config': {}}]}
+    sb.payload_mask_cache.update({(1, 0x40): 0x03, (1, 0x41): 0x03})
+    return sb
+
+
+def test_declared_fields_drive_the_payload_masks():
+    log = []
+    sb = ina219_backend(log)
+    assert sb.stream_scheduler.masks is sb.payload_mask_cache
+
+    volts = sb.add_consumer(print, fields=['bus_voltage_mV'])
+    assert sorted(log) == [(0x40, 0x01), (0x41, 0x01)]
+    amps = sb.add_consumer(print, fields={(1, 0x41): ['current_uA']})
+    assert log[-1] == (0x41, 0x05)
+    assert sb.payload_mask_cache == {(1, 0x40): 0x01, (1, 0x41): 0x05}
+
+    sb.remove_consumer(volts)
+    assert log[-2:] == [(0x40, 0x03), (0x41, 0x04)]  # 0x40 back to its default
+    sb.remove_consumer(amps)
+    assert sb.payload_mask_cache == {(1, 0x40): 0x03, (1, 0x41): 0x03}
+
+
+def test_mask_changes_while_streaming_go_through_the_scheduler():
+    log = []
+    sb = ina219_backend(log)
+    requested = []
+    sb.stream_scheduler.request_mask = lambda b, a, m: requested.append((b, a, m))
+    sb.mode = Mode.STREAM
+    sb.add_consumer(print, fields={'ina219': ['shunt_voltage_uV']})
+    assert log == [] and sorted(requested) == [(1, 0x40, 0x02), (1, 0x41, 0x02)]
+
+
+def test_declared_consumers_see_only_their_fields():
+    from sensor_master.backend import _field_spec, _projecting
+
+    got = []
+    deliver = _projecting(lambda *item: got.append(item), _field_spec(['current_uA']), False)
+    records = [{'tick': 1, 'bus_voltage_mV': 5000, 'current_uA': -3}]
+    deliver(1, 0x40, 'ina219', records)
+    assert got == [(1, 0x40, 'ina219', [{'tick': 1, 'current_uA': -3}])]
+    assert records[0]['bus_voltage_mV'] == 5000  # other consumers' records untouched
+
+    batches = []
+    deliver = _projecting(batches.append, _field_spec({(2, 0x41): ['bus_voltage_mV']}), True)
+    deliver([(1, 0x40, 'ina219', records), (2, 0x41, 'ina219', records)])
+    assert batches == [[(1, 0x40, 'ina219', [{'tick': 1}]),
+                        (2, 0x41, 'ina219', [{'tick': 1, 'bus_voltage_mV': 5000}])]]
+
+
+def test_derived_fields_are_computed_on_the_host():
+    log = []
+    sb = ina219_backend(log)
+    sb.config_cache[(1, 0x40, 'ina219')] = {'shunt_milliohm': 100, 'current_lsb_uA': 100}
+
+    sb.add_consumer(print, fields=['power_mW'])
+    # 0x40's calibration follows from its cached config, so only the primaries are
+    # sent; 0x41 must send power_mW
+    assert sb.payload_mask_cache == {(1, 0x40): 0x03, (1, 0x41): 0x08}
+    records = [{'tick': 1, 'bus_voltage_mV': 5000, 'shunt_voltage_uV': 2500}]
+    sb.stream_scheduler.derivers[(1, 0x40)](records)
+    # the firmware's encoding: power register (62) × 20
+    assert records[0]['power_mW'] == 62 * 20
+
+
+def test_computed_config_fields_are_evaluated_on_the_host():
+    sb = SensorBackend()
+    sent = []
+
+    class Bound:
+        def get_config_field(self, addr, sensor, field):
+            sent.append(field)
+            return {'shunt_milliohm': 100, 'current_lsb_uA': 100}[field]
+
+        def set_config_field(self, addr, sensor, field, value):
+            return 0
+
+    sb.board_mgr.select = lambda board: Bound()
+    assert sb.get_config_field(1, 0x40, 'ina219', 'calibration') == 4096
+    assert sorted(sent) == ['current_lsb_uA', 'shunt_milliohm']  # no CMD_GET_CAL
+
+    sb.set_config(1, 0x40, 'ina219', 'shunt_milliohm', 50)
+    assert 'calibration' not in sb.config_cache[(1, 0x40, 'ina219')]
+    assert sb.get_config_field(1, 0x40, 'ina219', 'calibration') == 8192
+    assert len(sent) == 2
+
+    sb.set_config(1, 0x40, 'ina219', 'period', 5)
+    assert sb.stream_scheduler.sample_periods[(1, 0x40)] == 500
+
+
+def test_built_in_consumers_never_block_the_bus_thread(tmp_path):
+    sb = SensorBackend()
+    sb.enable_archive(str(tmp_path / 'archive'))
+    sb.enable_shared_rings()
+    sb.enable_energy()
+    sb.merged_stream()
+    sb.add_sink(print)
+    assert len(sb.stream_scheduler.policies) == 7  # with the store and rollups
+    assert 'block' not in sb.stream_scheduler.policies
+
+
+def test_an_empty_scan_is_cached(monkeypatch):
+    sb = SensorBackend()
+    scans = []
+    monkeypatch.setattr(sb.board_mgr, "scan", lambda: scans.append(1) or [])
+    assert sb.discovery_cache is None
+    assert sb.discover(refresh=False) == {}
+    assert sb.discover(refresh=False) == {}
+    assert len(scans) == 1
+
+
+def test_energy_uses_the_cached_current_lsb():
+    sb = SensorBackend()
+    energy = sb.enable_energy()
+    sb.config_cache[(1, 0x40, 'ina219')] = {'current_lsb_uA': 50}
+    energy(1, 0x40, 'ina219', [{'tick': 0, 'current_uA': 72}, {'tick': 3_600_000, 'current_uA': 72}])
+    energy(1, 0x41, 'ina219', [{'tick': 0, 'current_uA': 72}, {'tick': 3_600_000, 'current_uA': 72}])
+    assert sb.get_energy()[(1, 0x40)]['charge_mAh'] == pytest.approx(3.6)
+    # not cached yet: the metadata default (100 µA)
+    assert sb.get_energy()[(1, 0x41)]['charge_mAh'] == pytest.approx(7.2)
@@ -54,7 +54,7 @@ class FakeSM:
     def add_sensor(self, board_id, addr, sensor_name):
         return self._execute(board_id, addr, protocol.commands['CMD_ADD_SENSOR'], 0)
 
-    def read_samples(self, board_id, addr, sensor_name):
+    def read_samples(self, board_id, addr, sensor_name, mask_val=None):
         return self._execute(board_id, addr, protocol.commands['CMD_READ_SAMPLES'], 0)
 
     def remove_sensor(self, board_id, addr):
@@ -262,3 +262,19 @@ def test_boundmaster_config_field_accessors():
     # Test getting all configs
     all_cfgs = bm.get_all_config_fields(0x10, 'dummy_sensor')
     assert 'period' in all_cfgs and 'gain' in all_cfgs
+
+
+def test_get_all_config_fields_evaluates_computed_fields(monkeypatch):
+    md = registry.metadata('dummy_sensor')
+    md['config_fields'].append({
+        'name': 'calibration', 'getter_cmd': 'CMD_GET_CAL', 'size': 2, 'endian': 'big',
+        'computed': True, 'depends_on': ['period', 'gain'],
+        'formula': '((uint16_t)(c->period + c->gain * 2 + 7.6f))',
+    })
+    monkeypatch.setattr(registry, 'metadata', lambda name: md)
+    mgr = BoardManager(port="X", baud=1, timeout=1)
+    fake = mgr._sm
+
+    cfg = mgr.select(6).get_all_config_fields(0x10, 'dummy_sensor')
+    assert cfg == {'period': 0, 'gain': 0, 'calibration': 7}
+    assert protocol.commands['CMD_GET_CAL'] not in [c[2] for c in fake.calls]
@@ -0,0 +1,110 @@
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from sensor_master.bulk import decode_samples, find_frames, load_rx, to_records
+from sensor_master.capture import MAGIC, RECORD, RX, TX
+from sensor_master.protocol import protocol
+from sensor_master.sensors import registry
+
+SOF = protocol.constants['SOF_MARKER']
+READ = protocol.commands['CMD_READ_SAMPLES']
+PING = protocol.commands['CMD_PING']
+OK = protocol.status_codes['STATUS_OK']
+HEADER = 6
+
+
+def make_packet(board, addr, cmd, status, payload=b''):
+    hdr = bytes([board, addr, cmd, status, len(payload)])
+    chk = 0
+    for b in hdr + payload:
+        chk ^= b
+    return bytes([SOF]) + hdr + payload + bytes([chk])
+
+
+def ina_payload(samples):
+    return b''.join(t.to_bytes(4, 'big') + v.to_bytes(2, 'big') + s.to_bytes(2, 'big', signed=True)
+                    for t, v, s in samples)
+
+
+def parse(payload):
+    return [registry.parse_payload('ina219', payload[i:i + 8], 0b11)
+            for i in range(0, len(payload), 8)]
+
+
+def test_decodes_mixed_traffic_like_the_frame_parser():
+    rng = random.Random(7)
+    stream = bytearray()
+    expected = {(1, 0x40): [], (2, 0x41): []}
+    tick = 0
+    for i in range(200):
+        board, addr = rng.choice(list(expected))
+        samples = []
+        for _ in range(rng.randint(1, 10)):
+            tick += 10
+            samples.append((tick, rng.randrange(0x10000), rng.randrange(-32768, 32768)))
+        # force an SOF byte into some payloads
+        if i % 7 == 0:
+            t, v, s = samples[0]
+            samples[0] = (t, (SOF << 8) | (v & 0xFF), s)
+        payload = ina_payload(samples)
+        expected[(board, addr)].extend(parse(payload))
+        stream += make_packet(board, addr, READ, OK, payload)
+        if i % 13 == 0:
+            stream += bytes([0x00, SOF, 0x01])                      # line noise
+        if i % 17 == 0:
+            stream += make_packet(board, 0, PING, OK)               # not a sample frame
+        if i % 19 == 0:
+            bad = bytearray(make_packet(board, addr, READ, OK, ina_payload([(1, 2, 3)])))
+            bad[-1] ^= 0xFF                                         # checksum error
+            stream += bad
+
+    frames = find_frames(bytes(stream))
+    assert (frames['cmd'] == READ).sum() == 200
+
+    decoded = decode_samples(bytes(stream), {(1, 0x40): 'ina219', (2, 0x41): ('ina219', 0b11)})
+    for key, records in expected.items():
+        arr = decoded[key]
+        assert arr.dtype.names == ('tick', 'bus_voltage_mV', 'shunt_voltage_uV')
+        assert arr.dtype['tick'].isnative
+        assert to_records(arr) == records
+
+
+def test_ignores_truncated_and_misaligned_frames():
+    good = make_packet(1, 0x40, READ, OK, ina_payload([(5, 6, -7)]))
+    odd = make_packet(1, 0x40, READ, OK, b'\x00\x01\x02')      # not a whole record
+    buf = odd + good + good[:-3]                                # trailing partial frame
+    decoded = decode_samples(buf, {(1, 0x40): 'ina219'})
+    assert to_records(decoded[(1, 0x40)]) == [
+        {'tick': 5, 'bus_voltage_mV': 6, 'shunt_voltage_uV': -7}]
+    assert len(find_frames(b'')) == 0
+
+
+def test_load_rx_skips_transmitted_bytes(tmp_path):
+    pkt = make_packet(1, 0x40, READ, OK, ina_payload([(1, 2, 3)]))
+    path = tmp_path / 'bus.cap'
+    path.write_bytes(MAGIC + RECORD.pack(0, TX, 6) + bytes(6)
+                     + RECORD.pack(1, RX, 1) + pkt[:1] + RECORD.pack(2, RX, len(pkt) - 1) + pkt[1:])
+    assert load_rx(str(path)) == pkt
+
+
+def test_rejected_candidates_do_not_hide_later_frames():
+    # frame A's payload holds an SOF whose made-up header claims a length
+    # reaching into frame B, and B's payload makes that checksum match
+    a = make_packet(1, 0x40, READ, OK, bytes([SOF, 0, 0, 0, 0, 10, 0, 0]))
+    b_payload = bytearray(ina_payload([(1, 2, 3)]))
+    c = make_packet(1, 0x40, READ, OK, ina_payload([(4, 5, 6)]))
+    stray_ck = 6 + HEADER + 10
+    buf = a + make_packet(1, 0x40, READ, OK, bytes(b_payload)) + c
+    chk = 0
+    for byte in buf[7:stray_ck]:
+        chk ^= byte
+    b_payload[stray_ck - len(a) - HEADER] = chk
+    buf = a + make_packet(1, 0x40, READ, OK, bytes(b_payload)) + c
+    assert buf[stray_ck] == chk  # the stray candidate at offset 6 is checksum-valid
+
+    assert find_frames(buf)['offset'].tolist() == [0, len(a), 2 * len(a)]
+    assert [r['tick'] for r in to_records(decode_samples(buf, {(1, 0x40): 'ina219'})[(1, 0x40)])] \
+        == [SOF << 24, 1, 4]
@@ -0,0 +1,126 @@
+import time
+
+import pytest
+
+import sensor_master.core as core_mod
+from sensor_master.capture import (MAGIC, RECORD, RX, TX, ReplayError, ReplaySerial,
+                                   read_capture)
+from sensor_master.protocol import protocol
+
+SOF = protocol.constants['SOF_MARKER']
+PING = protocol.commands['CMD_PING']
+READ = protocol.commands['CMD_READ_SAMPLES']
+OK = protocol.status_codes['STATUS_OK']
+
+
+class ScriptedSerial:
+    """Answers each write with the next scripted response (b'' = silence)."""
+    responses = []
+
+    def __init__(self, port, baud, timeout):
+        self.timeout = timeout
+        self.baudrate = baud
+        self._rx = bytearray()
+
+    def write(self, data):
+        self._rx += ScriptedSerial.responses.pop(0)
+
+    def read(self, n):
+        data, self._rx = bytes(self._rx[:n]), self._rx[n:]
+        return data
+
+    def reset_input_buffer(self):
+        self._rx.clear()
+
+
+@pytest.fixture(autouse=True)
+def patch_serial(monkeypatch):
+    import serial
+    monkeypatch.setattr(serial, "Serial", ScriptedSerial)
+
+
+def make_packet(board, addr, cmd, status, payload=b''):
+    hdr = bytes([board, addr, cmd, status, len(payload)])
+    chk = 0
+    for b in hdr + payload:
+        chk ^= b
+    return bytes([SOF]) + hdr + payload + bytes([chk])
+
+
+def record_session(path):
+    payload = (1000).to_bytes(4, 'big') + (5000).to_bytes(2, 'big') + (250).to_bytes(2, 'big', signed=True)
+    ScriptedSerial.responses = [
+        b'\x00\x13' + make_packet(1, 0, PING, OK),  # noise before SOF
+        b'',                                        # board 2 never answers
+        make_packet(1, 0x40, READ, OK, payload),
+    ]
+    sm = core_mod.SensorMaster('COM1', 115200, 0.01)
+    writer = sm.start_capture(path)
+    results = [sm.ping(1)]
+    with pytest.raises(IOError):
+        sm.ping(2)
+    results.append(sm.read_samples(1, 0x40, 'ina219', 0b11))
+    sm.stop_capture()
+    assert isinstance(sm.ser, ScriptedSerial)
+    assert writer.chunks == 12  # 3 writes + 9 non-empty reads (noise byte by byte)
+    return results
+
+
+def test_capture_logs_every_chunk(tmp_path):
+    path = str(tmp_path / 'bus.cap')
+    record_session(path)
+    chunks = list(read_capture(path))
+    assert [d for _, d, _ in chunks].count(TX) == 3
+    assert b''.join(data for _, d, data in chunks if d == RX)[:2] == b'\x00\x13'
+    ts = [t for t, _, _ in chunks]
+    assert ts == sorted(ts)
+
+
+def test_replay_reproduces_the_session(tmp_path):
+    path = str(tmp_path / 'bus.cap')
+    recorded = record_session(path)
+
+    sm = core_mod.SensorMaster('replay://' + path, 115200, 0.01)
+    assert isinstance(sm.ser, ReplaySerial)
+    assert sm.ping(1) == recorded[0]
+    with pytest.raises(IOError):
+        sm.ping(2)
+    assert sm.read_samples(1, 0x40, 'ina219', 0b11) == recorded[1]
+    assert sm.ser.remaining == 0
+    with pytest.raises(ReplayError, match="exhausted"):
+        sm.ping(1)
+
+
+def test_replay_detects_divergence(tmp_path):
+    path = str(tmp_path / 'bus.cap')
+    record_session(path)
+    sm = core_mod.SensorMaster('replay://' + path, 115200, 0.01)
+    with pytest.raises(ReplayError, match="diverged"):
+        sm.ping(3)
+
+
+def test_realtime_replay_keeps_recorded_timing(tmp_path):
+    path = tmp_path / 'timed.cap'
+    path.write_bytes(MAGIC
+                     + RECORD.pack(0, TX, 2) + b'hi'
+                     + RECORD.pack(50_000_000, RX, 3) + b'abc')
+
+    fast = ReplaySerial(str(path))
+    fast.write(b'hi')
+    t0 = time.monotonic()
+    assert fast.read(3) == b'abc'
+    assert time.monotonic() - t0 < 0.04
+
+    slow = ReplaySerial(str(path), realtime=True, timeout=0.01)
+    slow.write(b'hi')
+    t0 = time.monotonic()
+    assert slow.read(3) == b'abc'
+    assert time.monotonic() - t0 >= 0.045
+    assert slow.read(1) == b''
+
+
+def test_rejects_non_capture_files(tmp_path):
+    path = tmp_path / 'junk.bin'
+    path.write_bytes(b'not a capture')
+    with pytest.raises(ValueError):
+        ReplaySerial(str(path))
@@ -45,3 +45,56 @@ def test_cli_ping():
     result = runner.invoke(cli, ["ping", "--board", "3"])
     assert result.exit_code == 0
     assert "PING → STATUS_NOT_FOUND" in result.output
+
+
+def test_cli_stats(monkeypatch):
+    snapshot = {
+        'elapsed_s': 2.0, 'busy_s': 0.5, 'idle_s': 1.5, 'utilization': 0.25,
+        'commands': [{
+            'board': 1, 'cmd': 0, 'name': 'CMD_READ_SAMPLES', 'count': 4,
+            'tx_bytes': 24, 'rx_bytes': 80, 'timeouts': 1, 'checksum_errors': 0,
+            'busy_s': 0.5,
+            'latency_ms': {'p50': 2.0, 'p95': 5.0, 'max': 4.2, 'mean': 3.0},
+            'lock_wait_ms': {'mean': 0.1},
+        }],
+    }
+    calls = []
+    monkeypatch.setattr('sensor_master.backend.SensorBackend.start_stream',
+                        lambda self, cb: calls.append('start'))
+    monkeypatch.setattr('sensor_master.backend.SensorBackend.stop_stream',
+                        lambda self: calls.append('stop'))
+    monkeypatch.setattr('sensor_master.backend.SensorBackend.get_stats',
+                        lambda self: snapshot)
+
+    result = CliRunner().invoke(cli, ["stats", "--seconds", "0"])
+    assert result.exit_code == 0
+    assert calls == ['start', 'stop', 'stop']  # the last one is close() on exit
+    assert "utilization 25.0%" in result.output
+    assert "CMD_READ_SAMPLES" in result.output
+
+
+def test_cli_closes_the_backend_on_exit(monkeypatch):
+    closed = []
+    monkeypatch.setattr('sensor_master.backend.SensorBackend.close',
+                        lambda self: closed.append(self))
+    result = CliRunner().invoke(cli, ["ping", "--board", "3"])
+    assert result.exit_code == 0 and len(closed) == 1
+
+    # leaving the shell closes it too, before the CLI context does
+    closed.clear()
+    result = CliRunner().invoke(cli, ["session"], input="quit\n")
+    assert result.exit_code == 0 and len(closed) == 2
+
+
+def test_cli_talks_to_a_hub(tmp_path):
+    from sensor_master.backend import SensorBackend
+    from sensor_master.hub import HubServer
+
+    server = HubServer(SensorBackend(), str(tmp_path / 'hub.sock'))
+    server.start(discover=False)
+    try:
+        result = CliRunner().invoke(cli, ["--hub", server.path, "ping", "--board", "3"])
+    finally:
+        server.close()
+    assert result.exit_code == 0
+    assert "PING → STATUS_NOT_FOUND" in result.output
@@ -0,0 +1,33 @@
+import random
+
+from sensor_master.codec import BlockEncoder, decode_block, encode_block, unzigzag, zigzag
+
+
+def test_zigzag_round_trip():
+    for v in (0, 1, -1, 63, -64, 2**40, -2**40):
+        assert unzigzag(zigzag(v)) == v
+    assert [zigzag(v) for v in (0, -1, 1, -2)] == [0, 1, 2, 3]
+
+
+def test_block_round_trip_including_extremes():
+    rng = random.Random(3)
+    rows, t, v = [], 1 << 33, 5000
+    for _ in range(2000):
+        t += 10 if rng.random() < 0.98 else rng.randint(-50, 5000)
+        v += rng.randint(-3, 3)
+        rows.append((t, v, rng.randint(-32768, 32767)))
+    rows.append((0, -(1 << 63), (1 << 63) - 1))
+    assert list(decode_block(encode_block(rows, 2), 2)) == rows
+    assert list(decode_block(encode_block([], 2), 2)) == []
+
+
+def test_regular_stream_compresses_well():
+    enc = BlockEncoder(2)
+    for i in range(1000):
+        enc.append(1000 + 10 * i, (5000 + (i // 100), -12))
+        if i == 499:
+            # a block can be read back while it is still being written
+            assert len(list(decode_block(enc.getvalue(), 2))) == 500
+    # ~3 bits per row against 8 bytes of tick + two 16-bit fields
+    assert enc.nbytes * 10 < 1000 * 8
+    assert enc.first_tick == 1000 and enc.last_tick == 10990
@@ -0,0 +1,65 @@
+from sensor_master.continuity import TickTracker, TICK_MODULO
+
+
+def recs(*ticks):
+    return [{'tick': t, 'v': i} for i, t in enumerate(ticks)]
+
+
+def test_duplicates_are_dropped_across_batches():
+    tr = TickTracker(period_ms=100)
+    first = tr.process(recs(100, 200, 300))
+    # a retried read returns part of the previous batch again
+    second = tr.process(recs(200, 300, 400))
+
+    assert [r['tick'] for r in first] == [100, 200, 300]
+    assert [r['tick'] for r in second] == [400]
+    assert tr.duplicates == 2
+    assert tr.samples == 4
+    assert tr.gaps == 0 and tr.lost == 0
+
+
+def test_gaps_count_lost_samples_against_period():
+    tr = TickTracker(period_ms=100)
+    tr.process(recs(100, 200, 600, 700))
+    assert tr.gaps == 1
+    assert tr.lost == 3
+
+    # no period configured → gaps are not judged
+    tr = TickTracker()
+    tr.process(recs(100, 5000))
+    assert tr.gaps == 0
+
+
+def test_tick_wraparound_is_unwrapped():
+    tr = TickTracker(period_ms=100)
+    out = tr.process(recs(TICK_MODULO - 150, TICK_MODULO - 50, 50, 150))
+    assert [r['tick'] for r in out] == [
+        TICK_MODULO - 150, TICK_MODULO - 50, TICK_MODULO + 50, TICK_MODULO + 150
+    ]
+    assert tr.wraps == 1
+    assert tr.lost == 0
+
+    # a stale pre-wrap sample arriving late is a duplicate, not a new epoch
+    assert tr.process(recs(TICK_MODULO - 50)) == []
+    assert tr.duplicates == 1
+    assert tr.last_tick == TICK_MODULO + 150
+
+
+def test_records_without_tick_pass_through():
+    tr = TickTracker(period_ms=100)
+    assert tr.process([{'value': 1}]) == [{'value': 1}]
+    assert tr.samples == 0
+
+
+def test_board_reset_starts_a_new_epoch():
+    tr = TickTracker(period_ms=100)
+    tr.process(recs(9_999_800, 9_999_900, 10_000_000))
+
+    out = tr.process(recs(100, 200, 300))
+    # the new epoch continues one period after the last tick
+    assert [r['tick'] for r in out] == [10_000_100, 10_000_200, 10_000_300]
+    assert tr.resets == 1 and tr.duplicates == 0 and tr.offset == 10_000_000
+    assert tr.gaps == 0 and tr.samples == 6
+    # retries replaying the new epoch are still duplicates
+    assert [r['tick'] for r in tr.process(recs(200, 300, 400))] == [10_000_400]
+    assert tr.duplicates == 2 and tr.resets == 1
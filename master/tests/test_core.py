@@ -1,4 +1,5 @@
 import struct
+import threading
 import pytest
 import sensor_master.core as core_mod
 from sensor_master.protocol import protocol
@@ -26,6 +27,9 @@ class DummySerial:
     def inject(self, data: bytes):
         self._read_buffer += data
 
+    def reset_input_buffer(self):
+        pass
+
 @pytest.fixture(autouse=True)
 def patch_serial(monkeypatch):
     import serial
@@ -208,3 +212,104 @@ def test_list_sensors(monkeypatch):
     ]
 
     assert result == expected
+
+
+def test_execute_records_metrics_when_enabled():
+    m = core_mod.SensorMaster(port="P5", baud=9600, timeout=0.1)
+    ping = protocol.commands['CMD_PING']
+
+    # disabled by default: nothing is recorded
+    m.ser.inject(make_packet(3, 0, ping, protocol.status_codes['STATUS_OK'], b''))
+    m._execute(3, 0x00, ping)
+    assert m.metrics is None
+
+    m.enable_metrics()
+    m.ser.inject(make_packet(3, 0, ping, protocol.status_codes['STATUS_OK'], b'\x01\x02'))
+    m._execute(3, 0x00, ping)
+    # no response → timeout
+    with pytest.raises(IOError):
+        m._execute(3, 0x00, ping)
+
+    (stats,) = m.metrics.snapshot()['commands']
+    assert stats['board'] == 3 and stats['name'] == 'CMD_PING'
+    assert stats['count'] == 2
+    assert stats['tx_bytes'] == 12
+    assert stats['rx_bytes'] == 9
+    assert stats['timeouts'] == 1
+
+    m.enable_metrics(False)
+    assert m.metrics is None
+    assert m.metrics_snapshot() == {}
+
+
+def test_metrics_snapshot_waits_for_the_bus():
+    m = core_mod.SensorMaster(port="P9", baud=9600, timeout=0.1)
+    m.enable_metrics()
+    got = []
+    with m._lock:  # a transaction in flight
+        reader = threading.Thread(target=lambda: got.append(m.metrics_snapshot()))
+        reader.start()
+        reader.join(0.05)
+        assert reader.is_alive() and not got
+    reader.join(1.0)
+    assert got and got[0]['commands'] == []
+
+
+@pytest.mark.parametrize('cut', [3, 7, 8])  # inside the header, the payload, before the checksum
+def test_truncated_frame_counts_as_timeout(cut):
+    m = core_mod.SensorMaster(port="P8", baud=9600, timeout=0.1)
+    ping = protocol.commands['CMD_PING']
+    m.enable_metrics()
+    m.ser.inject(make_packet(3, 0, ping, protocol.status_codes['STATUS_OK'], b'\x01\x02')[:cut])
+    with pytest.raises(IOError, match='Timeout reading frame'):
+        m._execute(3, 0x00, ping)
+
+    (stats,) = m.metrics.snapshot()['commands']
+    assert stats['timeouts'] == 1 and stats['rx_bytes'] == cut
+
+    m.enable_metrics(False)
+    assert m.metrics is None
+
+
+def test_transport_hooks_fire_with_timestamps():
+    m = core_mod.SensorMaster(port="P6", baud=9600, timeout=0.1)
+    events = []
+    for ev in core_mod.HOOK_EVENTS:
+        m.add_hook(ev, lambda ts, *args, ev=ev: events.append((ev, ts, args)))
+
+    ok = make_packet(1, 2, 3, protocol.status_codes['STATUS_OK'], b"\x05")
+    bad = bytearray(ok)
+    bad[-1] ^= 0xFF
+
+    m._send(1, 2, 3, 0)
+    # two garbage bytes before the SOF trigger a resync
+    m.ser.inject(b"\x00\x11" + ok)
+    m._recv()
+    m.ser.inject(bytes(bad))
+    with pytest.raises(ValueError):
+        m._recv()
+    with pytest.raises(IOError):
+        m._recv()
+
+    names = [e[0] for e in events]
+    assert names == ['on_tx', 'on_resync', 'on_rx', 'on_checksum_error', 'on_timeout']
+    assert events[0][2] == (bytes(m.ser._write_buffer),)
+    assert events[1][2] == (b"\x00\x11",)
+    assert events[2][2] == (ok,)
+    assert events[3][2][0] == bytes(bad)
+    ts = [e[1] for e in events]
+    assert ts == sorted(ts)
+
+
+def test_remove_hook_and_unknown_event():
+    m = core_mod.SensorMaster(port="P7", baud=9600, timeout=0.1)
+    seen = []
+    hook = lambda ts, frame: seen.append(frame)
+    m.add_hook('on_tx', hook)
+    m._send(1, 0, 3, 0)
+    m.remove_hook('on_tx', hook)
+    m._send(1, 0, 3, 0)
+    assert len(seen) == 1
+
+    with pytest.raises(ValueError):
+        m.add_hook('on_nothing', hook)
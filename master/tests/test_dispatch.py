@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from sensor_master.dispatch import (
+    Consumer, Dispatcher, BLOCK, DROP_NEWEST, DROP_OLDEST,
+)
+
+
+def test_drop_oldest_and_drop_newest_policies():
+    # workers not started: items stay queued so the policy decides
+    oldest = Consumer(lambda *a: None, maxsize=2, policy=DROP_OLDEST)
+    newest = Consumer(lambda *a: None, maxsize=2, policy=DROP_NEWEST)
+    for i in range(4):
+        oldest.offer(i)
+        newest.offer(i)
+
+    assert list(oldest._queue) == [2, 3] and oldest.dropped == 2
+    assert list(newest._queue) == [0, 1] and newest.dropped == 2
+
+
+def test_block_policy_waits_for_room():
+    release = threading.Event()
+    got = []
+
+    def slow(board, addr, name, recs):
+        release.wait()
+        got.append(recs)
+
+    c = Consumer(slow, maxsize=1, policy=BLOCK)
+    c.start()
+    c.offer((1, 2, 'x', [0]))
+    time.sleep(0.02)           # worker is now stuck in slow()
+    c.offer((1, 2, 'x', [1]))  # fills the queue
+
+    t = threading.Thread(target=c.offer, args=((1, 2, 'x', [2]),))
+    t.start()
+    time.sleep(0.02)
+    assert t.is_alive()        # blocked on the full queue
+    release.set()
+    t.join(1)
+    c.close()
+    assert got == [[0], [1], [2]]
+    assert c.dropped == 0
+
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError):
+        Consumer(lambda *a: None, policy='spill')
+
+
+def test_dispatcher_fans_out_and_batches_per_tick():
+    plain, ticks, observed = [], [], []
+    d = Dispatcher()
+    d.add_consumer(lambda *item: plain.append(item),
+                   observer=lambda item, dt: observed.append(item[:2]))
+    d.add_consumer(ticks.append, batched=True)
+    d.start()
+
+    d.publish(1, 0x40, 'ina219', [{'tick': 1}])
+    d.publish(2, 0x41, 'ina219', [{'tick': 2}])
+    d.end_tick()
+    d.publish(1, 0x40, 'ina219', [{'tick': 3}])
+    d.stop()  # flushes the open tick and drains queues
+
+    assert [p[:2] for p in plain] == [(1, 0x40), (2, 0x41), (1, 0x40)]
+    assert observed == [(1, 0x40), (2, 0x41), (1, 0x40)]
+    assert [[b[:2] for b in tick] for tick in ticks] == [
+        [(1, 0x40), (2, 0x41)], [(1, 0x40)]
+    ]
+
+
+def test_consumer_errors_are_counted_not_fatal(capsys):
+    calls = []
+
+    def flaky(board, addr, name, recs):
+        calls.append(recs)
+        if recs == 'bad':
+            raise RuntimeError('boom')
+
+    d = Dispatcher()
+    c = d.add_consumer(flaky)
+    d.start()
+    d.publish(1, 2, 'x', 'bad')
+    d.publish(1, 2, 'x', 'good')
+    d.stop()
+
+    assert calls == ['bad', 'good']
+    stats = d.stats()[0]
+    assert stats['errors'] == 1 and stats['delivered'] == 1
+    assert "[Consumer error]" in capsys.readouterr().out
+
+    d.remove_consumer(c)
+    assert d.consumers == ()
@@ -0,0 +1,85 @@
+import pytest
+
+from sensor_master.energy import EnergyIntegrator
+
+
+def samples(ticks, current_uA=None, power_mW=None):
+    out = []
+    for i, t in enumerate(ticks):
+        rec = {'tick': t}
+        if current_uA is not None:
+            rec['current_uA'] = current_uA(i)
+        if power_mW is not None:
+            rec['power_mW'] = power_mW(i)
+        out.append(rec)
+    return out
+
+
+def test_trapezoid_is_exact_across_batches():
+    whole, split = EnergyIntegrator(), EnergyIntegrator()
+    recs = samples(range(0, 3_600_001, 100), current_uA=lambda i: 1000, power_mW=lambda i: i % 7)
+    whole(1, 0x40, 'ina219', recs)
+    for i in range(0, len(recs), 333):
+        split(1, 0x40, 'ina219', recs[i:i + 333])
+
+    t = whole.totals(1, 0x40)
+    assert t['charge_mAh'] == pytest.approx(1.0)    # 1 mA for one hour
+    assert t['duration_s'] == 3600.0
+    assert split.totals(1, 0x40) == t
+
+
+def test_linear_ramp_uses_trapezoids():
+    e = EnergyIntegrator()
+    # power ramps 0 → 3600 mW over one hour: 1800 mW average = 1.8 Wh
+    e(1, 0x40, 'ina219', samples(range(0, 3_600_001, 60_000), power_mW=lambda i: i * 60))
+    assert e.totals(1, 0x40)['energy_Wh'] == pytest.approx(1.8)
+    assert e.totals(1, 0x40)['charge_mAh'] == 0
+
+
+def test_gaps_and_resets_are_not_bridged():
+    e = EnergyIntegrator(gap_factor=4.0)
+    e(1, 0x40, 'ina219', samples([0, 100, 200, 300], current_uA=lambda i: 3600))
+    e(1, 0x40, 'ina219', samples([5000, 5100], current_uA=lambda i: 3600))  # lost samples
+    e(1, 0x40, 'ina219', samples([50, 150], current_uA=lambda i: 3600))     # board reset
+    t = e.totals(1, 0x40)
+    assert t['gaps'] == 2
+    assert t['duration_s'] == pytest.approx(0.5)
+    assert t['charge_mAh'] == pytest.approx(3.6 * 500 / 3_600_000)
+
+    fixed = EnergyIntegrator(max_gap_ms=10_000)
+    fixed(1, 0x40, 'ina219', samples([0, 100, 5000], current_uA=lambda i: 1))
+    assert fixed.totals(1, 0x40)['gaps'] == 0
+
+
+def test_checkpoints_survive_a_restart(tmp_path):
+    path = str(tmp_path / 'energy.json')
+    e = EnergyIntegrator(path, checkpoint_every=0)
+    e(1, 0x40, 'ina219', samples([0, 1000], current_uA=lambda i: 3600, power_mW=lambda i: 10))
+    assert (tmp_path / 'energy.json').exists()
+
+    again = EnergyIntegrator(path)
+    assert again.totals(1, 0x40) == e.totals(1, 0x40)
+    # the trapezoid continues from the checkpointed sample
+    again(1, 0x40, 'ina219', samples([2000], current_uA=lambda i: 3600, power_mW=lambda i: 10))
+    assert again.totals(1, 0x40)['charge_mAh'] == pytest.approx(2 * 3.6 / 3600)
+    again.close()
+    assert EnergyIntegrator(path).totals(1, 0x40)['samples'] == 3
+
+
+def test_batches_without_integrated_fields_are_ignored():
+    e = EnergyIntegrator()
+    e(1, 0x40, 'ina219', [{'tick': 0, 'bus_voltage_mV': 5000}])
+    assert e.snapshot() == {}
+
+
+def test_raw_counts_are_scaled_by_the_current_lsb():
+    lsbs = {0x40: 50, 0x41: 1000}
+    e = EnergyIntegrator(current_lsb=lambda board, addr, name: lsbs[addr])
+    # 72 counts × 50 µA = 3.6 mA and 100 × 50 µW = 5 mW, for one hour
+    e(1, 0x40, 'ina219', samples([0, 3_600_000], current_uA=lambda i: 72, power_mW=lambda i: 100))
+    t = e.totals(1, 0x40)
+    assert t['charge_mAh'] == pytest.approx(3.6)
+    assert t['energy_Wh'] == pytest.approx(0.005)
+    # with a 1 mA LSB the power field reads in mW
+    e(1, 0x41, 'ina219', samples([0, 3_600_000], power_mW=lambda i: 100))
+    assert e.totals(1, 0x41)['energy_Wh'] == pytest.approx(0.1)
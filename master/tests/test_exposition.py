@@ -0,0 +1,86 @@
+import http.client
+
+from sensor_master.continuity import TickTracker
+from sensor_master.exposition import MetricsServer, render
+from sensor_master.metrics import StreamQoS, TransportMetrics
+from sensor_master.protocol import protocol
+from sensor_master.scheduler import StreamScheduler
+
+
+def sample_snapshot():
+    m = TransportMetrics()
+    read = protocol.commands['CMD_READ_SAMPLES']
+    m.record(1, read, 0.0, 0.004, 6, 30)
+    m.record(1, read, 0.0, 0.030, 6, 0, TransportMetrics.TIMEOUT)
+    m.record(1, protocol.commands['CMD_PING'], 0.0, 0.001, 6, 7)
+
+    qos = StreamQoS(10.0)
+    tracker = TickTracker(10.0)
+    qos.record_poll(0.0, 0.003, tracker.process([{'tick': 0}, {'tick': 10}, {'tick': 50}]))
+    stream = qos.snapshot()
+    stream['continuity'] = tracker.snapshot()
+    stream['samples_per_s'] = 30.0
+
+    consumers = [{'name': 'Sink "a"', 'policy': 'drop-oldest', 'maxsize': 4, 'batched': False,
+                  'queued': 2, 'delivered': 10, 'dropped': 3, 'errors': 0}]
+    return {'transport': m.snapshot(), 'streams': {(1, 0x40): stream}, 'consumers': consumers}
+
+
+def test_render_text_exposition():
+    text = render(sample_snapshot())
+    lines = text.splitlines()
+    assert '# TYPE sensor_bus_transactions_total counter' in lines
+    assert 'sensor_bus_transactions_total{board="1",command="CMD_READ_SAMPLES"} 2' in lines
+    assert 'sensor_bus_timeouts_total{board="1",command="CMD_READ_SAMPLES"} 1' in lines
+    # one RTT histogram per board, merged over commands, with cumulative buckets
+    assert 'sensor_bus_rtt_ms_bucket{board="1",le="1.0"} 1' in lines
+    assert 'sensor_bus_rtt_ms_bucket{board="1",le="5.0"} 2' in lines
+    assert 'sensor_bus_rtt_ms_bucket{board="1",le="+Inf"} 3' in lines
+    assert 'sensor_bus_rtt_ms_count{board="1"} 3' in lines
+
+    assert 'sensor_stream_samples_total{board="1",addr="0x40"} 3' in lines
+    assert 'sensor_stream_samples_per_second{board="1",addr="0x40"} 30.0' in lines
+    assert 'sensor_stream_gaps_total{board="1",addr="0x40"} 1' in lines
+    assert 'sensor_stream_lost_samples_total{board="1",addr="0x40"} 3' in lines
+    assert 'sensor_consumer_dropped_total{consumer="Sink \\"a\\"",policy="drop-oldest"} 3' in lines
+    assert text.count('# TYPE sensor_bus_rtt_ms histogram') == 1
+
+    assert render({'transport': {}, 'streams': {}, 'consumers': []}) == ''
+
+
+def test_scheduler_publishes_qos_with_sample_rate():
+    sched = StreamScheduler(bm=object())
+    sched.qos[(1, 0x40)] = StreamQoS(10.0)
+    sched.continuity[(1, 0x40)] = tracker = TickTracker(10.0)
+    sched.publish_qos()
+    first = sched.published_qos
+    assert first[(1, 0x40)]['samples_per_s'] == 0.0
+
+    tracker.process([{'tick': t} for t in range(0, 100, 10)])
+    assert sched.published_qos is first  # readers see nothing until the next publish
+    sched._published_at -= 1.0
+    sched.publish_qos()
+    assert 9.0 < sched.published_qos[(1, 0x40)]['samples_per_s'] <= 10.0
+
+
+class FakeBackend:
+    def get_published_metrics(self):
+        return sample_snapshot()
+
+
+def test_metrics_endpoint_serves_text_format():
+    server = MetricsServer(FakeBackend(), port=0)
+    server.start()
+    try:
+        conn = http.client.HTTPConnection('127.0.0.1', server.port, timeout=2)
+        conn.request('GET', '/metrics')
+        resp = conn.getresponse()
+        body = resp.read().decode()
+        assert resp.status == 200
+        assert resp.getheader('Content-Type').startswith('text/plain; version=0.0.4')
+        assert 'sensor_bus_utilization' in body
+        conn.request('GET', '/nope')
+        assert conn.getresponse().status == 404
+        conn.close()
+    finally:
+        server.close()
@@ -0,0 +1,35 @@
+import pytest
+
+from sensor_master.formula import Formula, FormulaError
+
+
+def test_formula_reads_its_names():
+    f = Formula('round(a * 1000 / b) + max(a, 0)')
+    assert f.names == {'a', 'b'}
+    assert f({'a': 3, 'b': 7, 'unused': 1}) == 432
+    with pytest.raises(KeyError):
+        f({'a': 3})
+
+
+@pytest.mark.parametrize('text', [
+    "__import__('os')", 'a.__class__', 'a[0]', "'x' * 3", 'open(a)', 'lambda: 1', 'a if b else c',
+])
+def test_formula_rejects_anything_outside_arithmetic(text):
+    with pytest.raises(FormulaError):
+        Formula(text)
+
+
+def test_c_formulas_follow_c_semantics():
+    cal = Formula.from_c('((uint16_t)(0.04096f / (((float)c->current_lsb_uA / 1e6f)'
+                         ' * ((float)c->shunt_milliohm / 1000.0f)) + 0.5f))')
+    assert cal.names == {'current_lsb_uA', 'shunt_milliohm'}
+    assert cal({'current_lsb_uA': 100, 'shunt_milliohm': 100}) == 4096
+    assert cal({'current_lsb_uA': 50, 'shunt_milliohm': 10}) == 81920 & 0xFFFF  # out of range: wraps like the firmware's cast
+    # integer division truncates toward zero, integer casts wrap
+    assert Formula.from_c('-7 / 2 + (int8_t)300 + 0x10u % 3')({}) == -3 + 44 + 1
+
+
+@pytest.mark.parametrize('text', ['c->x.y', 'sizeof(int)', '(float)', 'a ? b : c', 'f(x)', 'c_div'])
+def test_c_formulas_reject_other_syntax(text):
+    with pytest.raises(FormulaError):
+        Formula.from_c(text)
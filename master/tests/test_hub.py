@@ -0,0 +1,161 @@
+import threading
+import time
+
+import pytest
+
+from sensor_master.backend import Mode
+from sensor_master.client import HubClient, HubError
+from sensor_master.hub import HubServer
+from sensor_master.ipc import decode_batch, decode_value, encode_batch, encode_value
+
+
+class FakeBackend:
+    def __init__(self):
+        self.consumers = []
+        self.scans = 0
+        self.streaming = False
+        self.stream_calls = []
+
+    def add_consumer(self, callback, maxsize=64, policy='drop-oldest', batched=False):
+        self.consumers.append(callback)
+
+    def discover(self, refresh=True):
+        if refresh or not self.scans:
+            self.scans += 1
+        return {1: [{'name': 'ina219', 'addr': 0x40, 'config': {'period': 10}}]}
+
+    def start_stream(self, callback, only=None, rescan=True):
+        self.stream_calls.append(rescan)
+        self.streaming = True
+
+    def stop_stream(self):
+        self.streaming = False
+
+    def ping(self, board):
+        if board == 9:
+            raise IOError("Timeout waiting for SOF")
+        return 0
+
+    def list_sensors(self, board):
+        return [('ina219', '0x40')]
+
+    def get_stream_stats(self):
+        return {(1, 0x40): {'polls': 3, 'jitter_ms': 0.5}}
+
+    def get_payload_mask(self, board, addr):
+        raise ZeroDivisionError("odd")
+
+    def publish(self, *batch):
+        for consumer in self.consumers:
+            consumer(*batch)
+
+
+@pytest.fixture
+def hub(tmp_path):
+    backend = FakeBackend()
+    server = HubServer(backend, str(tmp_path / 'hub.sock'))
+    server.start()
+    yield server
+    server.close()
+
+
+def wait_for(cond, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not cond() and time.monotonic() < end:
+        time.sleep(0.005)
+    assert cond()
+
+
+def test_value_and_batch_encoding_round_trip():
+    value = {'a': [1, -2, 2**70, 1.5, None, True, False], (1, 0x40): ('x', b'\x00\xff'), 3: {}}
+    assert decode_value(encode_value(value)) == value
+
+    records = [{'tick': 2**40 + i, 'bus_voltage_mV': 5000 + i, 'current_uA': -i} for i in range(3)]
+    data = encode_batch(2, 0x41, 'ina219', records)
+    assert len(data) == 8 + 3 * (8 + 2 + 2)
+    assert decode_batch(data) == (2, 0x41, 'ina219', records)
+
+
+def test_client_mirrors_backend_calls(hub):
+    with HubClient(hub.path) as client:
+        assert client.ping(1) == 0
+        assert client.list_sensors(1) == [('ina219', '0x40')]
+        assert client.get_stream_stats() == {(1, 0x40): {'polls': 3, 'jitter_ms': 0.5}}
+
+        # discovery ran once at hub start and is served from cache
+        assert client.set_mode(Mode.DISCOVERY)[1][0]['addr'] == 0x40
+        assert client.discover()[1][0]['name'] == 'ina219'
+        assert hub.backend.scans == 2  # start + the explicit DISCOVERY rescan
+
+        with pytest.raises(IOError, match="Timeout"):
+            client.ping(9)
+        with pytest.raises(HubError, match="ZeroDivisionError: odd"):
+            client.get_payload_mask(1, 0x40)
+        with pytest.raises(ValueError, match="Unknown hub method"):
+            client.call('set_mode', 1)
+        with pytest.raises(AttributeError):
+            client.no_such_method
+
+
+def test_stream_batches_fan_out_to_subscribed_clients(hub):
+    got_all, got_one = [], []
+    a, b = HubClient(hub.path), HubClient(hub.path)
+    a.start_stream(lambda *batch: got_all.append(batch))
+    b.start_stream(lambda *batch: got_one.append(batch), only=[(2, 0x41)])
+    assert a.mode == Mode.STREAM
+    assert hub.backend.streaming and hub.backend.stream_calls == [False, False]
+
+    recs = [{'tick': 1, 'bus_voltage_mV': 5000}]
+    hub.backend.publish(1, 0x40, 'ina219', recs)
+    hub.backend.publish(2, 0x41, 'ina219', recs)
+    wait_for(lambda: len(got_all) == 2 and len(got_one) == 1)
+    assert got_one == [(2, 0x41, 'ina219', recs)]
+
+    # the bus keeps streaming until the last subscriber leaves
+    a.stop_stream()
+    assert hub.backend.streaming
+    b.close()
+    wait_for(lambda: not hub.backend.streaming)
+    a.close()
+
+
+def test_concurrent_calls_from_many_threads(hub):
+    with HubClient(hub.path) as client:
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(client.ping(1)))
+                   for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results == [0] * 20
+
+
+def test_callbacks_may_call_back_into_the_hub(hub):
+    replies = []
+    with HubClient(hub.path, timeout=2.0) as client:
+        client.start_stream(lambda *batch: replies.append(client.ping(1)))
+        hub.backend.publish(1, 0x40, 'ina219', [{'tick': 1, 'bus_voltage_mV': 5000}])
+        wait_for(lambda: replies == [0])
+
+
+def test_second_hub_does_not_take_over_a_live_socket(hub, tmp_path):
+    with pytest.raises(FileExistsError):
+        HubServer(FakeBackend(), hub.path).start()
+    with HubClient(hub.path) as client:
+        assert client.ping(1) == 0  # the first hub still serves the path
+
+
+def test_stale_socket_is_replaced(tmp_path):
+    import socket
+
+    path = str(tmp_path / 'stale.sock')
+    dead = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    dead.bind(path)
+    dead.close()  # leaves the file behind, as a crashed hub would
+    server = HubServer(FakeBackend(), path)
+    server.start()
+    with HubClient(path) as client:
+        assert client.ping(1) == 0
+    server.close()
+    assert not (tmp_path / 'stale.sock').exists()
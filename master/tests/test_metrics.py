@@ -0,0 +1,93 @@
+import pytest
+
+from sensor_master.metrics import Histogram, TransportMetrics
+from sensor_master.protocol import protocol
+
+
+def test_histogram_buckets_and_quantiles():
+    h = Histogram(bounds=(1, 10, 100))
+    for v in (0.5, 0.7, 5, 50, 500):
+        h.observe(v)
+
+    assert h.counts == [2, 1, 1, 1]
+    assert h.count == 5
+    assert h.max == 500
+    assert h.quantile(0.4) == 1.0
+    assert h.quantile(0.6) == 10.0
+    # quantile falling in the +Inf bucket reports the observed max
+    assert h.quantile(1.0) == 500
+
+    snap = h.snapshot()
+    assert snap['buckets'][-1] == (float('inf'), 1)
+    assert snap['mean'] == pytest.approx(556.2 / 5)
+
+
+def test_transport_metrics_record_and_snapshot():
+    m = TransportMetrics()
+    ping = protocol.commands['CMD_PING']
+    read = protocol.commands['CMD_READ_SAMPLES']
+
+    m.record(1, ping, 0.0, 0.002, 6, 7)
+    m.record(1, ping, 0.001, 0.050, 6, 0, TransportMetrics.TIMEOUT)
+    m.record(2, read, 0.0, 0.004, 6, 19, TransportMetrics.CHECKSUM)
+
+    snap = m.snapshot()
+    assert snap['busy_s'] == pytest.approx(0.056)
+    assert snap['idle_s'] >= 0.0
+    assert [(c['board'], c['name']) for c in snap['commands']] == [
+        (1, 'CMD_PING'), (2, 'CMD_READ_SAMPLES')
+    ]
+
+    ping_stats = snap['commands'][0]
+    assert ping_stats['count'] == 2
+    assert ping_stats['tx_bytes'] == 12
+    assert ping_stats['rx_bytes'] == 7
+    assert ping_stats['timeouts'] == 1
+    assert ping_stats['checksum_errors'] == 0
+    assert ping_stats['latency_ms']['max'] == pytest.approx(50.0)
+    assert snap['commands'][1]['checksum_errors'] == 1
+
+    m.reset()
+    assert m.snapshot()['commands'] == []
+
+
+def test_stream_qos_lateness_records_and_gaps():
+    from sensor_master.metrics import StreamQoS
+
+    q = StreamQoS(period_ms=100)
+    q.record_poll(10.0, 10.005, [{'tick': 1000}, {'tick': 1100}])
+    # 10-deep poll with one 400ms hole (three samples lost)
+    recs = [{'tick': 1200 + 100 * i} for i in range(StreamQoS.QUEUE_DEPTH)]
+    recs[5:] = [{'tick': r['tick'] + 300} for r in recs[5:]]
+    q.record_poll(10.2, 10.3, recs)
+    q.record_callback(0.002)
+    q.record_error()
+
+    snap = q.snapshot()
+    assert snap['polls'] == 3
+    assert snap['errors'] == 1
+    assert snap['records'] == 12
+    assert snap['full_polls'] == 1
+    assert snap['gap_overruns'] == 1
+    assert snap['last_tick'] == recs[-1]['tick']
+    assert snap['tick_gap_ms']['max'] == 400
+    assert snap['lateness_ms']['max'] == pytest.approx(100.0)
+    assert snap['jitter_ms'] == pytest.approx(95.0 / 16.0)
+    assert snap['callback_ms']['count'] == 1
+
+
+def test_transport_metrics_publish_whole_snapshots():
+    m = TransportMetrics(publish_interval=3600)
+    ping = protocol.commands['CMD_PING']
+    assert m.published == {}
+
+    m.record(1, ping, 0.0, 0.002, 6, 7)
+    first = m.published
+    assert first['commands'][0]['count'] == 1
+    # within the interval readers keep seeing the same, untouched snapshot
+    m.record(1, ping, 0.0, 0.002, 6, 7)
+    assert m.published is first and first['commands'][0]['count'] == 1
+
+    m.publish_interval = 0
+    m.record(1, ping, 0.0, 0.002, 6, 7)
+    assert m.published is not first and m.published['commands'][0]['count'] == 3
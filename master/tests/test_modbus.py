@@ -0,0 +1,103 @@
+import os
+import socket
+import struct
+
+import pytest
+
+from sensor_master.modbus import (FIELDS_REG, REGS_PER_SENSOR, ModbusGateway, crc16,
+                                  register_map)
+from sensor_master.store import SampleStore
+
+
+class CacheOnlyBackend:
+    """Backend caches only: any bus access would raise."""
+    def __init__(self):
+        self.store = SampleStore(16)
+        self.discovery_cache = {1: [{'name': 'ina219', 'addr': 0x40, 'config': {}}]}
+        self.config_cache = {(1, 0x40, 'ina219'): {'period': 10, 'gain': 3, 'shunt_milliohm': 100,
+                                                   'calibration': 4096}}
+
+    def __getattr__(self, name):
+        raise AssertionError(f"gateway touched backend.{name}")
+
+
+@pytest.fixture
+def gateway():
+    backend = CacheOnlyBackend()
+    backend.store.append(1, 0x40, 'ina219', [
+        {'tick': 100, 'bus_voltage_mV': 5000, 'shunt_voltage_uV': -250},
+        {'tick': (1 << 33) + 7, 'bus_voltage_mV': 5004, 'shunt_voltage_uV': -251},
+    ])
+    gw = ModbusGateway(backend, port=0)
+    yield gw
+    gw.close()
+
+
+def test_register_map_follows_metadata():
+    m = register_map('ina219')
+    assert [n for n, *_ in m['input']] == ['tick', 'valid_mask', 'bus_voltage_mV',
+                                            'shunt_voltage_uV', 'current_uA', 'power_mW']
+    assert m['input'][2][1] == FIELDS_REG
+    assert 'all' not in [n for n, *_ in m['holding']]
+    assert m['holding'][-1] == ('calibration', 5, 1, 'uint16')
+
+
+def test_input_and_holding_registers_come_from_caches(gateway):
+    base = 0x40 * REGS_PER_SENSOR
+    regs = gateway.read_registers(1, 0x04, base, 9)
+    assert regs[:4] == [0, 2, 0, 7]                  # tick as uint64 words
+    assert regs[4] == 0b11                           # bus + shunt present
+    assert regs[5] == 5004 and regs[6] == 0x10000 - 251
+    assert regs[7:9] == [0, 0]                       # fields not streamed
+
+    assert gateway.read_registers(1, 0x03, base, 5) == [10, 3, 0, 100, 0]
+    assert gateway.read_registers(1, 0x03, base + 5, 1) == [4096]
+
+
+def test_invalid_requests_get_modbus_exceptions(gateway):
+    base = 0x40 * REGS_PER_SENSOR
+    assert gateway.handle_pdu(1, struct.pack('>BHH', 0x06, base, 1)) == b'\x86\x01'
+    assert gateway.handle_pdu(1, struct.pack('>BHH', 0x04, 0, 1)) == b'\x84\x02'
+    assert gateway.handle_pdu(1, struct.pack('>BHH', 0x04, base, 126)) == b'\x84\x03'
+    assert gateway.handle_pdu(9, struct.pack('>BHH', 0x04, base, 1)) == b'\x84\x0b'
+    assert gateway.exceptions == 4
+
+
+def test_modbus_tcp_round_trip(gateway):
+    gateway.start()
+    with socket.create_connection(('127.0.0.1', gateway.port), timeout=2) as s:
+        base = 0x40 * REGS_PER_SENSOR
+        s.sendall(struct.pack('>HHHBBHH', 7, 0, 6, 1, 0x04, base + 5, 2))
+        reply = s.recv(64)
+    tid, proto, length, unit, fc, nbytes = struct.unpack('>HHHBBB', reply[:9])
+    assert (tid, proto, unit, fc, nbytes) == (7, 0, 1, 0x04, 4)
+    assert struct.unpack('>Hh', reply[9:]) == (5004, -251)
+
+
+def test_modbus_rtu_over_pty(gateway):
+    import termios
+    import tty
+
+    path = gateway.start_rtu_pty()
+    fd = os.open(path, os.O_RDWR | os.O_NOCTTY)
+    try:
+        tty.setraw(fd)
+        broadcast = struct.pack('>BBHH', 0, 0x03, 0x40 * REGS_PER_SENSOR, 2)
+        req = struct.pack('>BBHH', 1, 0x03, 0x40 * REGS_PER_SENSOR, 2)
+        os.write(fd, broadcast + crc16(broadcast).to_bytes(2, 'little'))  # never answered
+        os.write(fd, req + crc16(req).to_bytes(2, 'little'))
+        reply = b''
+        while len(reply) < 9:
+            reply += os.read(fd, 64)
+        assert reply[:3] == b'\x01\x03\x04'
+        assert struct.unpack('>HH', reply[3:7]) == (10, 3)
+        assert crc16(reply[:7]) == int.from_bytes(reply[7:9], 'little')
+        assert gateway.requests == 1
+    finally:
+        os.close(fd)
+
+    fds = gateway._pty
+    gateway.close()
+    for pty_fd in fds:
+        with pytest.raises(OSError):
+            os.fstat(pty_fd)
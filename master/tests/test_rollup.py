@@ -0,0 +1,67 @@
+import pytest
+
+from sensor_master.rollup import Rollup, RollupStore
+
+
+def test_tumbling_windows_on_board_ticks():
+    r = Rollup(('v',), window_ms=1000)
+    for tick, v in [(100, 5), (900, 1), (999, 9), (1000, 4), (2500, 7), (2600, 3)]:
+        r.add({'tick': tick, 'v': v})
+
+    s = r.series()
+    assert s['start'] == [0, 1000]
+    assert s['count'] == [3, 1]
+    assert s['v_min'] == [1, 4] and s['v_max'] == [9, 4]
+    assert s['v_sum'] == [15, 4] and s['v_mean'] == [5.0, 4.0]
+
+    # the open window only shows up on request
+    assert r.series(partial=True)['v_sum'] == [15, 4, 10]
+    assert r.series(start=1000, partial=True)['start'] == [1000, 2000]
+    assert r.series(start=0, end=1000)['start'] == [0]
+
+    r.add({'tick': 1500, 'v': 0})  # before the open window
+    assert r.late == 1
+
+
+def test_retention_bounds_the_series():
+    r = Rollup(('v',), window_ms=10, retention=3)
+    for t in range(0, 100, 5):
+        r.add({'tick': t, 'v': t})
+    assert r.series()['start'] == [60, 70, 80]
+
+
+def test_store_keeps_rollups_per_sensor_and_window():
+    store = RollupStore(windows_ms=(1000, 60_000))
+    store(1, 0x40, 'ina219', [{'tick': t, 'bus_voltage_mV': 5000 + t // 1000}
+                              for t in range(0, 5000, 100)])
+    store(1, 0x40, 'ina219', [{'tick': 5000, 'bus_voltage_mV': 1}])
+
+    sec = store.series(1, 0x40, 1000)
+    assert sec['start'] == [0, 1000, 2000, 3000, 4000]
+    assert sec['count'] == [10] * 5
+    assert sec['bus_voltage_mV_mean'] == [5000.0, 5001.0, 5002.0, 5003.0, 5004.0]
+    assert store.series(1, 0x40, 60_000, partial=True)['count'] == [51]
+
+    assert store.series(2, 0x40, 1000) == {}
+    with pytest.raises(KeyError):
+        store.series(1, 0x40, 5000)
+
+    # a new payload layout starts over
+    store(1, 0x40, 'ina219', [{'tick': 7000, 'power_mW': 3}])
+    assert store.series(1, 0x40, 1000, partial=True)['power_mW_max'] == [3]
+
+
+def test_board_reset_starts_a_new_epoch():
+    r = Rollup(('v',), window_ms=1000)
+    for t in range(4_998_000, 5_000_001, 100):
+        r.add({'tick': t, 'v': 1})
+    for t in range(100, 5000, 100):  # the board restarted
+        r.add({'tick': t, 'v': 2})
+
+    assert r.late == 0 and r.epoch == 1
+    s = r.series(partial=True)
+    assert s['epoch'] == [0, 0, 0, 1, 1, 1, 1, 1]
+    assert s['start'] == [4_998_000, 4_999_000, 5_000_000, 0, 1000, 2000, 3000, 4000]
+    assert sum(s['count']) == 21 + 49
+    # tick ranges refer to the current epoch
+    assert r.series(start=1000, end=3000)['start'] == [1000, 2000]
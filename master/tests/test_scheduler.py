@@ -1,5 +1,6 @@
 import threading
 import pytest
+import sched
 import time
 
 import sensor_master.scheduler as scheduler_mod
@@ -8,6 +9,9 @@ from sensor_master.boards import BoardManager
 from sensor_master.sensors import registry as sensor_registry
 
 
+REAL_SCHEDULER = sched.scheduler
+
+
 class DummyBound:
     def __init__(self, sensors=None, samples=None):
         """
@@ -172,3 +176,189 @@ def test_start_raises_if_already_running():
     ss._running = True
     with pytest.raises(RuntimeError):
         ss.start(lambda *args: None)
+
+
+def test_start_tracks_qos_per_subscription():
+    samples = {(0x30, "temp"): [{"tick": 100}, {"tick": 110}, {"tick": 200}]}
+    dummy_bm = DummyBM(boards=[7], bound_map={7: DummyBound(samples=samples)})
+
+    ss = StreamScheduler(bm=dummy_bm, timeout=0.05)
+    ss.subscriptions = [(7, 0x30, "temp", 0.01)]
+    ss.start(lambda *args: None)
+    time.sleep(0.01)
+    ss.stop()
+
+    snap = ss.qos_snapshot()
+    assert set(snap) == {(7, 0x30)}
+    qos = snap[(7, 0x30)]
+    assert qos['period_ms'] == pytest.approx(10.0)
+    assert qos['polls'] >= 1 and qos['errors'] == 0
+    assert qos['records'] == 3 * qos['polls']
+    # the 90ms gap exceeds 1.5× the 10ms period
+    assert qos['gap_overruns'] >= 1
+    assert qos['callback_ms']['count'] == qos['polls']
+
+
+def test_gaps_are_judged_against_the_sensor_period():
+    # a 500 ms sensor polled every 10 ms: its queue overflowed once
+    samples = {(0x30, "temp"): [{"tick": 0}, {"tick": 500}, {"tick": 1000}, {"tick": 3000}]}
+    dummy_bm = DummyBM(boards=[7], bound_map={7: DummyBound(samples=samples)})
+
+    ss = StreamScheduler(bm=dummy_bm, timeout=0.05)
+    ss.subscriptions = [(7, 0x30, "temp", 0.01)]
+    ss.sample_periods[(7, 0x30)] = 500
+    ss.start(lambda *args: None)
+    time.sleep(0.01)
+    ss.stop()
+
+    qos = ss.qos_snapshot()[(7, 0x30)]
+    assert qos['period_ms'] == 500 and qos['gap_overruns'] == 1
+    assert qos['continuity']['gaps'] == 1 and qos['continuity']['lost'] == 3
+
+
+def test_stream_drops_duplicate_ticks_between_polls():
+    # every poll returns the same batch; only the first delivery is new
+    samples = {(0x30, "temp"): [{"tick": 100}, {"tick": 200}]}
+    dummy_bm = DummyBM(boards=[7], bound_map={7: DummyBound(samples=samples)})
+
+    ss = StreamScheduler(bm=dummy_bm, timeout=0.05)
+    ss.subscriptions = [(7, 0x30, "temp", 0.1)]
+    batches = []
+    ss.start(lambda b, a, name, recs: batches.append([r['tick'] for r in recs]))
+    time.sleep(0.01)
+    ss.stop()
+
+    assert batches[0] == [100, 200]
+    assert all(batch == [] for batch in batches[1:])
+    cont = ss.qos_snapshot()[(7, 0x30)]['continuity']
+    assert cont['samples'] == 2
+    assert cont['duplicates'] == 2 * (len(batches) - 1)
+    # the board's clock was aligned from the response that carried new samples
+    assert ss.clocks[7].snapshot()['observations'] == 1
+    assert abs(ss.clocks[7].to_host(200) - time.time()) < 1.0
+
+
+def test_subscription_set_is_list_compatible():
+    from sensor_master.scheduler import SubscriptionSet
+
+    subs = SubscriptionSet([(1, 0x40, "ina219", 0.5)])
+    subs.append((2, 0x41, "ina219", 1.0))
+    assert len(subs) == 2
+    assert (1, 0x40, "ina219", 0.5) in subs
+    assert (1, 0x40) in subs
+    assert (1, 0x40, "ina219", 9.9) not in subs
+
+    subs.retune(1, 0x40, 0.2)
+    assert sorted(subs) == [(1, 0x40, "ina219", 0.2), (2, 0x41, "ina219", 1.0)]
+    with pytest.raises(KeyError):
+        subs.retune(9, 0x10, 1.0)
+
+    assert subs.unsubscribe(2, 0x41)
+    assert not subs.unsubscribe(2, 0x41)
+    subs.clear()
+    assert len(subs) == 0
+
+
+def test_live_subscribe_unsubscribe_and_retune(monkeypatch):
+    monkeypatch.setattr(scheduler_mod.sched, "scheduler", REAL_SCHEDULER)
+    samples = {(0x30, "temp"): [{"value": 1}], (0x31, "hum"): [{"value": 2}]}
+    dummy_bm = DummyBM(boards=[7], bound_map={7: DummyBound(samples=samples)})
+    ss = StreamScheduler(bm=dummy_bm, timeout=0.05)
+    ss.subscriptions = [(7, 0x30, "temp", 0.01)]
+
+    seen = []
+    ss.start(lambda b, a, name, recs: seen.append(name))
+    time.sleep(0.05)
+    ss.subscribe(7, 0x31, "hum", 0.01)
+    time.sleep(0.05)
+    assert "hum" in seen
+
+    ss.unsubscribe(7, 0x30)
+    ss.retune(7, 0x31, 0.05)
+    time.sleep(0.05)
+    seen.clear()
+    time.sleep(0.12)
+    ss.stop()
+
+    assert seen and set(seen) == {"hum"}
+    assert list(ss.subscriptions) == [(7, 0x31, "hum", 0.05)]
+    assert ss.qos_snapshot()[(7, 0x31)]['period_ms'] == pytest.approx(50.0)
+
+
+def test_real_scheduler_wakes_for_new_subscription_and_stops_promptly(monkeypatch):
+    monkeypatch.setattr(scheduler_mod.sched, "scheduler", REAL_SCHEDULER)
+    samples = {(0x30, "temp"): [{"value": 1}], (0x31, "hum"): [{"value": 2}]}
+    dummy_bm = DummyBM(boards=[7], bound_map={7: DummyBound(samples=samples)})
+    ss = StreamScheduler(bm=dummy_bm, timeout=0.05)
+    ss.subscriptions = [(7, 0x30, "temp", 30.0)]
+
+    seen = []
+    ss.start(lambda b, a, name, recs: seen.append(name))
+    time.sleep(0.05)
+    ss.subscribe(7, 0x31, "hum", 30.0)
+    time.sleep(0.05)
+
+    t0 = time.monotonic()
+    ss.stop()
+    assert time.monotonic() - t0 < 1.0
+    assert seen == ["temp", "hum"]
+
+
+def test_slow_consumer_does_not_delay_polling(monkeypatch):
+    monkeypatch.setattr(scheduler_mod.sched, "scheduler", REAL_SCHEDULER)
+    samples = {(0x30, "temp"): [{"value": 1}], (0x31, "hum"): [{"value": 2}]}
+    dummy_bm = DummyBM(boards=[7], bound_map={7: DummyBound(samples=samples)})
+    ss = StreamScheduler(bm=dummy_bm, timeout=0.05)
+    ss.subscriptions = [(7, 0x30, "temp", 0.01), (7, 0x31, "hum", 0.01)]
+
+    ticks = []
+    ss.add_consumer(ticks.append, batched=True)
+    slow = ss.add_consumer(lambda *args: time.sleep(0.05), maxsize=2,
+                           policy='drop-newest')
+    ss.start(None)
+    time.sleep(0.1)
+    ss.stop()
+
+    # polling kept its 10ms pace while the slow consumer shed load
+    assert ss.qos_snapshot()[(7, 0x30)]['polls'] >= 5
+    assert slow.dropped > 0
+    # both sensors are due together, so each tick carries both batches
+    assert {tuple(sorted(item[2] for item in tick)) for tick in ticks} == {("hum", "temp")}
+    assert len(ss.consumer_stats()) == 2
+
+
+def test_stream_reads_with_cached_mask_and_applies_requests_between_reads():
+    calls = []
+
+    class MaskBound(DummyBound):
+        def read_samples(self, addr, name, mask_val=None):
+            calls.append(('read', mask_val))
+            if len(calls) > 1:
+                raise RuntimeError('READ failed: 1')  # how the board reports an empty queue
+            return [{"tick": 100 * len(calls)}]
+
+        def set_payload_mask(self, addr, mask):
+            calls.append(('set', mask))
+            return 0
+
+    ss = StreamScheduler(bm=DummyBM(boards=[7], bound_map={7: MaskBound()}), timeout=0.05)
+    ss.masks[(7, 0x30)] = 0x03
+    ss.subscriptions = [(7, 0x30, "temp", 0.1)]
+    ss.request_mask(7, 0x30, 0x01)
+    ss.start(None)
+    ss.stop()
+
+    # queued samples are read with the old mask before the switch; whatever
+    # the board queued across it is discarded before decoding with the new one
+    assert calls == [('read', 0x03), ('set', 0x01), ('read', 0x03)]
+    assert ss.masks[(7, 0x30)] == 0x01 and not ss.pending_masks
+    assert ss.qos[(7, 0x30)].errors == 0
+
+
+def test_stop_drops_mask_requests_not_applied_yet():
+    ss = StreamScheduler(bm=DummyBM(boards=[7], bound_map={7: DummyBound()}), timeout=0.05)
+    ss.subscriptions = [(7, 0x30, "temp", 0.1)]
+    ss.start(None)
+    ss.request_mask(7, 0x30, 0x01)  # the sensor is not polled again before stop()
+    ss.stop()
+    assert ss.pending_masks == {} and (7, 0x30) not in ss.masks
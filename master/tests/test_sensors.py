@@ -50,3 +50,64 @@ def test_payload_size_unknown_raises():
 def test_metadata_unknown_raises():
     with pytest.raises(KeyError):
         registry.metadata('nonexistent_sensor')
+
+
+def test_payload_layout_follows_mask_bits():
+    md = registry.metadata('ina219')
+    names = [f['name'] for f in md['payload_fields']]
+
+    assert [f['name'] for f in registry.payload_layout('ina219', 0b1010)] == [names[1], names[3]]
+    default = [names[b] for b in md['default_payload_bits']]
+    assert [f['name'] for f in registry.payload_layout('ina219')] == default
+
+
+def _ina219_wire(shunt_reg, bus_reg, calibration):
+    """What the firmware sends for these register contents (drivers/ina219.c)."""
+    current = int(shunt_reg * calibration / 4096)  # the chip's current register
+    power = abs(current) * bus_reg // 5000         # and its power register
+
+    def i16(v):
+        v &= 0xFFFF
+        return v - 0x10000 if v & 0x8000 else v
+
+    return {'bus_voltage_mV': bus_reg * 4, 'shunt_voltage_uV': i16(shunt_reg * 10),
+            'current_uA': i16(current), 'power_mW': (power * 20) & 0xFFFF}
+
+
+def test_derived_fields_come_from_primaries_and_config():
+    config = {'shunt_milliohm': 100, 'current_lsb_uA': 100}  # calibration 4096
+    assert set(registry.derived_fields('ina219')) == {'current_uA', 'power_mW'}
+    assert registry.wire_fields('ina219', ['power_mW', 'current_uA'], config) == \
+        {'bus_voltage_mV', 'shunt_voltage_uV'}
+    # without the config they depend on, they have to come over the wire
+    assert registry.wire_fields('ina219', ['power_mW'], {}) == {'power_mW'}
+
+    sent = [{'tick': 3, 'bus_voltage_mV': 5000, 'current_uA': 7}]
+    registry.derive('ina219', sent, ['current_uA', 'power_mW'], config)
+    assert sent == [{'tick': 3, 'bus_voltage_mV': 5000, 'current_uA': 7}]  # wire value kept
+
+
+@pytest.mark.parametrize('shunt_milliohm, shunt_reg, bus_reg', [
+    (100, 1000, 1250),   # 100 mA at 5 V
+    (100, 3000, 3000),   # 300 mA at 12 V
+    (100, -450, 1250),   # -45 mA
+    (100, 7, 1250),
+    (20, 200, 825),      # 100 mA through a 20 mΩ shunt (calibration 20480)
+])
+def test_derived_fields_match_what_the_wire_carries(shunt_milliohm, shunt_reg, bus_reg):
+    config = {'shunt_milliohm': shunt_milliohm, 'current_lsb_uA': 100}
+    calibration = registry.compute_config('ina219', 'calibration', config)
+    wire = _ina219_wire(shunt_reg, bus_reg, calibration)
+
+    records = [{'tick': 1, 'bus_voltage_mV': wire['bus_voltage_mV'],
+                'shunt_voltage_uV': wire['shunt_voltage_uV']}]
+    registry.derive('ina219', records, ['current_uA', 'power_mW'], config)
+    assert records[0] == {'tick': 1, **wire}
+
+
+def test_derived_current_does_not_saturate_above_32_mA():
+    config = {'shunt_milliohm': 100, 'current_lsb_uA': 100}
+    records = [{'tick': 1, 'bus_voltage_mV': 5000, 'shunt_voltage_uV': 10000}]  # 100 mA
+    registry.derive('ina219', records, ['current_uA', 'power_mW'], config)
+    # register counts: 1000 × 100 µA LSB = 100 mA; power register 250 × 2 mW = 500 mW
+    assert records[0]['current_uA'] == 1000 and records[0]['power_mW'] == 250 * 20
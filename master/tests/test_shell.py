@@ -95,3 +95,26 @@ def test_ping_command(shell, capsys):
     assert out == "PING → STATUS_OK"
     calls = shell.backend.board_mgr.calls
     assert ('ping', 4) in calls
+
+
+def test_stream_command_passes_filter(shell, monkeypatch, capsys):
+    calls = []
+    monkeypatch.setattr(shell.backend, "start_stream",
+                        lambda cb, only=None: calls.append(only))
+    shell.onecmd('stream 0 1:0x40 2')
+    assert calls == [[(1, 0x40), (2, None)]]
+    assert "selected sensors" in capsys.readouterr().out
+
+
+def test_history_command_prints_stored_samples(shell, capsys):
+    shell.current_board = 1
+    shell.current_sensor = 'ina219'
+    shell.current_addr = 0x40
+    shell.backend.store.append(1, 0x40, 'ina219', [
+        {'tick': 10, 'bus_voltage_mV': 5000}, {'tick': 20, 'bus_voltage_mV': 5004},
+    ])
+
+    shell.onecmd('history 1')
+    lines = capsys.readouterr().out.strip().splitlines()
+    assert len(lines) == 2
+    assert lines[1].split() == ['20', '5004']
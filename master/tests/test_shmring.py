@@ -0,0 +1,124 @@
+import multiprocessing
+import os
+
+import pytest
+
+from sensor_master.shmring import HEADER, RingPublisher, RingReader, RingWriter, ring_name
+
+
+@pytest.fixture
+def prefix():
+    return f"t{os.getpid()}"
+
+
+def recs(start, n):
+    return [{'tick': 2**40 + t, 'bus_voltage_mV': t % 65536, 'shunt_voltage_uV': -t % 100}
+            for t in range(start, start + n)]
+
+
+def test_reader_follows_writer_zero_copy(prefix):
+    name = ring_name(prefix, 1, 0x40, 'ina219', 0b11)
+    writer = RingWriter(name, 1, 0x40, 'ina219', 0b11, capacity=8)
+    try:
+        writer.write(recs(0, 3))
+        reader = RingReader(name)
+        assert (reader.board, reader.addr, reader.sensor, reader.mask) == (1, 0x40, 'ina219', 3)
+        views = reader.read()
+        assert len(views) == 1 and isinstance(views[0].buffer, memoryview)
+        assert views[0].records() == recs(0, 3)
+        assert reader.confirm() == 0
+        del views
+
+        writer.write(recs(3, 7))  # wraps: slots 3..7 then 0..1
+        views = reader.read()
+        assert [len(v) for v in views] == [5, 2]
+        assert [r for v in views for r in v.records()] == recs(3, 7)
+        del views
+        assert reader.read() == []
+        reader.close()
+    finally:
+        writer.close()
+
+
+def test_lapped_reader_counts_lost_records(prefix):
+    name = ring_name(prefix, 1, 0x41, 'ina219', 0b11)
+    writer = RingWriter(name, 1, 0x41, 'ina219', 0b11, capacity=4)
+    try:
+        reader = RingReader(name, from_start=False)
+        writer.write(recs(0, 10))
+        assert reader.records() == recs(6, 4)
+        assert reader.lost == 6
+
+        writer.write(recs(10, 2))
+        views = reader.read()
+        writer.write(recs(12, 3))  # overwrites one slot the reader still holds
+        assert reader.confirm() == 1 and reader.lost == 7
+        del views
+        reader.close()
+    finally:
+        writer.close()
+
+
+def _child_read(name, queue):
+    reader = RingReader(name)
+    queue.put(reader.records())
+    reader.close()
+
+
+def test_reader_in_another_process(prefix):
+    publisher = RingPublisher(prefix, capacity=64)
+    try:
+        publisher(2, 0x40, 'ina219', recs(0, 5))
+        name, = publisher.names()
+        assert name == ring_name(prefix, 2, 0x40, 'ina219', 0b11)
+
+        ctx = multiprocessing.get_context('spawn')
+        queue = ctx.Queue()
+        child = ctx.Process(target=_child_read, args=(name, queue))
+        child.start()
+        assert queue.get(timeout=30) == recs(0, 5)
+        child.join(30)
+        assert child.exitcode == 0
+        # the reader exiting must not have removed the writer's block
+        publisher(2, 0x40, 'ina219', recs(5, 1))
+        reader = RingReader(name)
+        assert reader.sequence() == 6
+        reader.close()
+    finally:
+        publisher.close()
+
+
+def test_live_ring_is_not_taken_over(prefix):
+    name = ring_name(prefix, 3, 0x40, 'ina219', 0b11)
+    writer = RingWriter(name, 3, 0x40, 'ina219', 0b11, capacity=8)
+    try:
+        writer.write(recs(0, 2))
+        with pytest.raises(FileExistsError, match=str(os.getpid())):
+            RingWriter(name, 3, 0x40, 'ina219', 0b11, capacity=8)
+        reader = RingReader(name)
+        assert reader.writer_pid == os.getpid()
+        assert reader.records() == recs(0, 2)
+        reader.close()
+    finally:
+        writer.close()
+
+
+def test_ring_of_an_exited_writer_is_replaced(prefix):
+    ctx = multiprocessing.get_context('spawn')
+    child = ctx.Process(target=os.getpid)
+    child.start()
+    child.join(30)
+
+    name = ring_name(prefix, 3, 0x41, 'ina219', 0b11)
+    stale = RingWriter(name, 3, 0x41, 'ina219', 0b11, capacity=8)
+    stale.write(recs(0, 2))
+    stale.buf[HEADER.size - 4:HEADER.size] = child.pid.to_bytes(4, 'little')
+    stale.close(unlink=False)  # as if the child had crashed holding it
+
+    writer = RingWriter(name, 3, 0x41, 'ina219', 0b11, capacity=16)
+    try:
+        reader = RingReader(name)
+        assert reader.capacity == 16 and reader.sequence() == 0
+        reader.close()
+    finally:
+        writer.close()
@@ -0,0 +1,163 @@
+import time
+
+import pytest
+
+from sensor_master.sinks import BatchingSink, ColumnarSink, SQLiteSink
+
+
+class ListSink(BatchingSink):
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self.buffer = []
+        self.written = []
+        self.closed = False
+
+    def _add(self, board, addr, name, records):
+        self.buffer.extend(records)
+
+    def _flush(self):
+        self.written.append(self.buffer)
+        self.buffer = []
+
+    def _close(self):
+        self.closed = True
+
+
+def recs(*ticks):
+    return [{'tick': t, 'bus_voltage_mV': 5000 + t, 'current_uA': -t} for t in ticks]
+
+
+def test_flushes_on_row_threshold_and_on_close():
+    sink = ListSink(flush_rows=3, flush_interval=60)
+    sink(1, 0x40, 'ina219', recs(1, 2))
+    sink(1, 0x40, 'ina219', [])
+    sink(1, 0x40, 'ina219', recs(3))
+    assert sink.flushes == 1
+    assert [r['tick'] for r in sink.written[0]] == [1, 2, 3]
+
+    sink(1, 0x40, 'ina219', recs(4))
+    sink.close()
+    assert [r['tick'] for r in sink.written[1]] == [4]
+    assert sink.closed
+    assert sink.stats()['rows_written'] == 4
+
+
+def test_flushes_on_time_threshold():
+    sink = ListSink(flush_rows=1000, flush_interval=0.02)
+    sink(1, 0x40, 'ina219', recs(1))
+    assert sink.flushes == 0
+    time.sleep(0.03)
+    sink(1, 0x40, 'ina219', recs(2))
+    assert sink.flushes == 1 and [r['tick'] for r in sink.written[0]] == [1, 2]
+    sink.close()
+
+
+def test_runs_on_the_dispatcher_worker():
+    from sensor_master.dispatch import DROP_NEWEST, Dispatcher
+
+    sink = ListSink(flush_rows=2, flush_interval=60)
+    d = Dispatcher()
+    consumer = d.add_consumer(sink, maxsize=8, policy=DROP_NEWEST)
+    d.start()
+    for t in range(5):
+        d.publish(1, 0x40, 'ina219', recs(t))
+    d.remove_consumer(consumer)
+    sink.close()
+    assert consumer.delivered == 5 and sink.flushes == 3
+    assert [r['tick'] for batch in sink.written for r in batch] == [0, 1, 2, 3, 4]
+
+
+def test_flush_errors_do_not_stop_the_writer(capsys):
+    class Broken(ListSink):
+        def _flush(self):
+            if not self.errors:
+                raise OSError("disk full")
+            super()._flush()
+
+    sink = Broken(flush_rows=1, flush_interval=60)
+    sink(1, 0x40, 'ina219', recs(1))
+    assert sink.errors == 1
+    sink(1, 0x40, 'ina219', recs(2))
+    sink.close()
+    assert sink.flushes == 1
+    assert "[Sink error] Broken: disk full" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('fmt', ColumnarSink.FORMATS)
+def test_columnar_sink_writes_one_file_per_layout(tmp_path, fmt):
+    pa = pytest.importorskip('pyarrow')
+    sink = ColumnarSink(str(tmp_path), format=fmt, flush_rows=4, flush_interval=60)
+    sink(1, 0x40, 'ina219', recs(1, 2, 3))
+    sink(2, 0x41, 'ina219', recs(4, 5))          # crosses flush_rows
+    sink(1, 0x40, 'ina219', [{'tick': 6, 'power_mW': 9}])
+    sink.close()
+
+    tables = {}
+    for path in sink.paths():
+        if fmt == 'parquet':
+            import pyarrow.parquet as pq
+            tables[path.rsplit('/', 1)[1].split('_')[1]] = pq.read_table(path)
+        else:
+            with pa.ipc.open_file(path) as reader:
+                tables[path.rsplit('/', 1)[1].split('_')[1]] = reader.read_all()
+
+    assert sorted(tables) == ['m05', 'm08']
+    t = tables['m05']
+    assert t.schema.names == ['board', 'addr', 'tick', 'bus_voltage_mV', 'current_uA']
+    assert t.schema.field('bus_voltage_mV').type == pa.uint16()
+    assert t.schema.field('current_uA').type == pa.int16()
+    assert t.column('board').to_pylist() == [1, 1, 1, 2, 2]
+    assert t.column('tick').to_pylist() == [1, 2, 3, 4, 5]
+    assert t.column('current_uA').to_pylist() == [-1, -2, -3, -4, -5]
+    assert tables['m08'].column('power_mW').to_pylist() == [9]
+
+
+def test_unknown_columnar_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ColumnarSink(str(tmp_path), format='csv')
+
+
+def test_sqlite_sink_batches_rows_into_per_sensor_tables(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / 'samples.db')
+    sink = SQLiteSink(path, flush_rows=3, flush_interval=60)
+    sink(1, 0x40, 'ina219', recs(1, 2))
+    sink(2, 0x41, 'ina219', recs(3))               # crosses flush_rows: one commit
+    assert sink.flushes == 1
+    sink(1, 0x40, 'ina219', [{'tick': 4, 'power_mW': 7}])
+    sink.close()
+
+    db = sqlite3.connect(path)
+    assert db.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    rows = db.execute('SELECT board, addr, tick, bus_voltage_mV, current_uA, power_mW '
+                      'FROM ina219 ORDER BY tick').fetchall()
+    assert rows == [(1, 0x40, 1, 5001, -1, None), (1, 0x40, 2, 5002, -2, None),
+                    (2, 0x41, 3, 5003, -3, None), (1, 0x40, 4, None, None, 7)]
+    assert sink.stats()['flushes'] == 2
+
+
+def test_sqlite_sink_survives_a_stream_restart(tmp_path):
+    import sqlite3
+    import threading
+
+    from sensor_master.dispatch import DROP_NEWEST, Dispatcher
+
+    path = str(tmp_path / 'samples.db')
+    sink = SQLiteSink(path, flush_rows=2, flush_interval=60)
+    d = Dispatcher()
+    d.add_consumer(sink, maxsize=8, policy=DROP_NEWEST)
+    d.start()
+    d.publish(1, 0x40, 'ina219', recs(1, 2))        # flushed on the first worker
+    d.stop()
+    d.start()                                        # a new worker thread
+    d.publish(1, 0x40, 'ina219', recs(3, 4))
+    d.publish(1, 0x40, 'ina219', recs(5))
+    d.stop()
+
+    closer = threading.Thread(target=sink.close)
+    closer.start()
+    closer.join()
+    assert sink.stats()['errors'] == 0 and sink.rows_written == 5
+    db = sqlite3.connect(path)
+    assert [t for t, in db.execute('SELECT tick FROM ina219 ORDER BY tick')] == [1, 2, 3, 4, 5]
@@ -0,0 +1,105 @@
+import pytest
+
+from sensor_master.store import CompressedRing, RingBuffer, SampleStore, to_records
+
+FIELDS = [
+    {'name': 'bus_voltage_mV', 'type': 'uint16', 'size': 2},
+    {'name': 'shunt_voltage_uV', 'type': 'int16', 'size': 2},
+]
+
+
+def rec(tick):
+    return {'tick': tick, 'bus_voltage_mV': tick % 65536, 'shunt_voltage_uV': -tick % 1000}
+
+
+def test_ring_append_wraps_and_keeps_newest():
+    ring = RingBuffer(FIELDS, capacity=4)
+    ring.extend(rec(t) for t in range(10, 70, 10))
+
+    assert len(ring) == 4
+    assert ring.appended == 6
+    assert list(ring.latest(10)['tick']) == [30, 40, 50, 60]
+    assert list(ring.latest(2)['tick']) == [50, 60]
+    assert list(ring.latest(0)['tick']) == []
+    assert list(ring.latest(1)['shunt_voltage_uV']) == [-60 % 1000]
+
+
+def test_ring_since_and_window_across_wrap():
+    ring = RingBuffer(FIELDS, capacity=5)
+    ring.extend(rec(t) for t in range(100, 900, 100))  # keeps 400..800
+
+    assert list(ring.since(500)['tick']) == [600, 700, 800]
+    assert list(ring.since(0)['tick']) == [400, 500, 600, 700, 800]
+    assert list(ring.since(800)['tick']) == []
+    assert list(ring.window(450, 700)['tick']) == [500, 600]
+    assert list(ring.window(700, 701)['tick']) == [700]
+    assert list(ring.window(900, 1000)['tick']) == []
+
+
+def test_ring_memory_is_preallocated():
+    ring = RingBuffer(FIELDS, capacity=1000)
+    before = ring.nbytes
+    ring.extend(rec(t) for t in range(5000))
+    assert ring.nbytes == before == 1000 * (8 + 2 + 2)
+
+    with pytest.raises(ValueError):
+        RingBuffer(FIELDS, capacity=0)
+
+
+def test_sample_store_per_sensor_and_layout_change():
+    store = SampleStore(capacity=3)
+    store.append(1, 0x40, 'ina219', [rec(1), rec(2)])
+    store.append(2, 0x41, 'ina219', [rec(5)])
+    store.append(1, 0x40, 'ina219', [])
+
+    assert sorted(store.keys()) == [(1, 0x40), (2, 0x41)]
+    assert to_records(store.latest(1, 0x40, 5)) == [rec(1), rec(2)]
+    assert store.sensor(2, 0x41) == 'ina219'
+
+    # a new payload mask changes the columns → fresh ring for that sensor
+    store.append(1, 0x40, 'ina219', [{'tick': 3, 'power_mW': 7}])
+    assert to_records(store.latest(1, 0x40, 5)) == [{'tick': 3, 'power_mW': 7}]
+
+    assert store.latest(9, 0x10) == {}
+    assert list(store.since(2, 0x41, 0)['tick']) == [5]
+    assert list(store.window(2, 0x41, 0, 5)['tick']) == []
+
+
+def test_compressed_ring_matches_ring_buffer():
+    plain = RingBuffer(FIELDS, capacity=100)
+    packed = CompressedRing(FIELDS, capacity=100, block=16)
+    for t in range(0, 3000, 10):
+        rec = {'tick': t, 'bus_voltage_mV': 5000 + (t // 50) % 4, 'shunt_voltage_uV': -t % 7}
+        plain.append(rec)
+        packed.append(rec)
+
+    # whole blocks are evicted, so at least `capacity` samples remain
+    assert 100 <= len(packed) < 100 + 2 * 16
+    assert packed.nbytes / len(packed) * 3 < plain.nbytes / len(plain)
+    for query in (('latest', 1), ('latest', 37), ('since', 2500), ('window', 2200, 2950)):
+        want = getattr(plain, query[0])(*query[1:])
+        got = getattr(packed, query[0])(*query[1:])
+        assert {k: list(v) for k, v in got.items()} == {k: list(v) for k, v in want.items()}
+    assert list(packed.latest(1000)['tick'])[0] == 3000 - 10 * len(packed)
+
+
+def test_store_can_compress_history():
+    store = SampleStore(capacity=64, compress_block=8)
+    store.append(1, 0x40, 'ina219', [{'tick': t, 'bus_voltage_mV': t} for t in range(100)])
+    assert type(store.ring(1, 0x40)).__name__ == 'CompressedRing'
+    assert list(store.window(1, 0x40, 10, 13)['bus_voltage_mV']) == []  # evicted
+    assert list(store.since(1, 0x40, 97)['tick']) == [98, 99]
+
+
+def test_store_stays_ordered_across_a_board_reset():
+    from sensor_master.continuity import TickTracker
+
+    tracker = TickTracker(period_ms=100)
+    store = SampleStore(capacity=16)
+    store.append(1, 0x40, 'ina219', tracker.process([rec(t) for t in range(19_999_800, 20_000_001, 100)]))
+    store.append(1, 0x40, 'ina219', tracker.process([rec(t) for t in range(100, 501, 100)]))  # reset
+
+    ticks = list(store.since(1, 0x40, 0)['tick'])
+    assert ticks == sorted(ticks) and len(ticks) == 8
+    assert list(store.window(1, 0x40, 20_000_000, 20_000_300)['tick']) == [20_000_000, 20_000_100, 20_000_200]
+    assert tracker.resets == 1
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+
+from sensor_master.supervisor import BusSupervisor
+
+
+class FakeBackend:
+    """Streams a few batches per port; the 'crash' port's first worker dies."""
+    def __init__(self, port, baud, timeout):
+        self.port = port
+        self.consumers = []
+
+    def add_consumer(self, callback, maxsize=64, policy='drop-oldest'):
+        self.consumers.append(callback)
+
+    def start_stream(self, callback, only=None):
+        marker = f"/tmp/supervisor-test-{os.getppid()}-{self.port}"
+        board = 1 if self.port == 'A' else 2
+        records = [{'tick': t, 'bus_voltage_mV': 5000 + t} for t in range(3)]
+        if self.port == 'crash' and not os.path.exists(marker):
+            open(marker, 'w').close()
+            os._exit(3)
+        if os.path.exists(marker):
+            os.unlink(marker)
+        for consumer in self.consumers:
+            consumer(board, 0x40, 'ina219', records)
+            if only:
+                consumer(board, 0x41, 'ina219', records[:1])
+
+    def stop_stream(self):
+        pass
+
+
+def wait_for(cond, timeout=20.0):
+    end = time.monotonic() + timeout
+    while not cond() and time.monotonic() < end:
+        time.sleep(0.01)
+    assert cond()
+
+
+def test_workers_per_port_feed_one_merged_stream():
+    got = []
+    lock = threading.Lock()
+
+    def collect(port, board, addr, name, records):
+        with lock:
+            got.append((port, board, addr, len(records)))
+
+    sup = BusSupervisor(['A', 'B'], factory=FakeBackend)
+    sup.start(collect, only={'B': [(2, 0x41)]})
+    try:
+        wait_for(lambda: len(got) == 3)
+        stats = sup.stats()
+        assert stats['A']['alive'] and stats['B']['alive']
+        assert stats['A']['pid'] != stats['B']['pid'] != os.getpid()
+    finally:
+        sup.stop()
+    assert sorted(got) == [('A', 1, 0x40, 3), ('B', 2, 0x40, 3), ('B', 2, 0x41, 1)]
+    assert not sup.stats()['A']['alive']
+
+
+def test_crashed_worker_is_restarted():
+    got = []
+    sup = BusSupervisor(['crash'], factory=FakeBackend, restart_delay=0.05)
+    sup.start(lambda *item: got.append(item))
+    try:
+        wait_for(lambda: got)
+        assert sup.stats()['crash']['restarts'] == 1
+    finally:
+        sup.stop()
+    assert got[0][0] == 'crash'
+
+
+def test_lost_worker_is_not_waited_for(capsys):
+    class Lingering:
+        exitcode = None
+
+        def join(self, timeout=None):
+            raise AssertionError("the monitor thread must not wait for a worker")
+
+    sup = BusSupervisor(['A'], factory=FakeBackend, restart_delay=0.05)
+    worker = sup._workers['A']
+    worker.conn, other = sup._ctx.Pipe()
+    worker.process = Lingering()
+    sup._running = True
+    sup._lost(worker)
+    other.close()
+    assert worker.conn is None and worker.restart_at is not None
+    assert "exited (still exiting)" in capsys.readouterr().out
@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+from sensor_master.timealign import TickClock, TimeMerger
+
+
+def test_clock_tracks_offset_and_drift_from_lower_envelope():
+    clock = TickClock(window=40)
+    # board starts at host t=100 s and runs 100 ppm fast; responses land 1-20 ms late
+    for i in range(40):
+        tick = i * 250
+        host_ms = 100_000 + tick / 1.0001 + (1 + (i * 7) % 20)
+        clock.observe(tick, host_ms / 1000.0)
+    snap = clock.snapshot()
+    assert snap['drift_ppm'] == pytest.approx(-100, abs=30)
+    assert clock.to_host(10_000) == pytest.approx(100.0 + 10_000 / 1.0001 / 1000, abs=0.003)
+
+    clock.observe(5, 200.0)  # board reset
+    assert clock.snapshot()['observations'] == 1
+    assert clock.to_host(5) == pytest.approx(200.0)
+
+
+class Now:
+    def __init__(self, t):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+def make_merger(window_s=1.0, now=30.0, **kw):
+    clocks = {}
+    for board, offset_s in ((1, 10.0), (2, 20.0)):
+        clocks[board] = TickClock()
+        clocks[board].observe(0, offset_s)  # tick 0 is host time offset_s
+    now = Now(now)
+    return TimeMerger(clocks, window_s, clock=now, **kw), now
+
+
+def test_merge_orders_across_boards_incrementally():
+    merger, now = make_merger(window_s=5.0, now=22.0)
+    # board 2's tick 0 is board 1's tick 10000
+    merger(1, 0x40, 'ina219', [{'tick': t} for t in (9_000, 10_500, 12_000)])
+    merger(2, 0x40, 'ina219', [{'tick': t} for t in (0, 1_000)])
+    # each stream has reached 22 s / 21 s: everything up to 21 s can go now
+    out = merger.drain()
+    assert [(round(t, 3), b) for t, b, *_ in out] == [(19.0, 1), (20.0, 2), (20.5, 1), (21.0, 2)]
+    assert merger.pending() == 1
+
+    merger(2, 0x40, 'ina219', [{'tick': 2_500}])
+    assert [(t, b) for t, b, *_ in merger.drain()] == [(22.0, 1)]
+    merger(1, 0x40, 'ina219', [{'tick': 11_000}])  # 21 s: already behind the feed
+    assert merger.late == 1
+    assert [(t, b) for t, b, *_ in merger.flush()] == [(22.5, 2)]
+
+
+def test_silent_stream_only_holds_records_for_the_window():
+    merger, now = make_merger(window_s=1.0, now=25.0)
+    merger(2, 0x41, 'ina219', [{'tick': 4_000}])                     # 24 s
+    merger(1, 0x40, 'ina219', [{'tick': 15_000}, {'tick': 15_500}])  # 25 s, 25.5 s
+    assert [t for t, *_ in merger.drain()] == [24.0]
+    assert merger.pending() == 2  # board 2 may still send samples before 25 s
+    now.t = 26.5  # board 2 silent for longer than the window
+    assert [t for t, *_ in merger.drain()] == [25.0, 25.5]
+
+
+def test_pending_bound_forces_release():
+    merger, _ = make_merger(window_s=5.0, now=12.0, max_pending=2)
+    merger(1, 0x40, 'ina219', [{'tick': 0}])
+    merger(2, 0x41, 'ina219', [{'tick': t} for t in (0, 1, 2, 3)])
+    out = merger.drain()
+    assert len(out) == 3 and merger.forced == 2 and merger.pending() == 2
+
+
+def test_iteration_blocks_until_records_are_ready():
+    merger, now = make_merger()
+    got = []
+    reader = threading.Thread(target=lambda: got.extend(merger))
+    reader.start()
+    merger(1, 0x40, 'ina219', [{'tick': 0}])
+    merger.close()
+    reader.join(5)
+    assert [(t, b) for t, b, *_ in got] == [(10.0, 1)]
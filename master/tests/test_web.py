@@ -0,0 +1,151 @@
+import http.client
+import json
+import socket
+import time
+
+import pytest
+
+from sensor_master.web import WebServer, _EventClient, encode_event
+
+
+class FakeBackend:
+    def __init__(self):
+        self.consumers = []
+        self.streaming = False
+        self.config = {'period': 10, 'gain': 3}
+
+    def add_consumer(self, callback, maxsize=64, policy='drop-oldest', batched=False):
+        self.consumers.append(callback)
+
+    def discover(self, refresh=True):
+        assert not refresh, "web API must not rescan the bus"
+        return {1: [{'name': 'ina219', 'addr': 0x40, 'config': self.config}]}
+
+    def latest_samples(self, board, addr, n=1):
+        return {'tick': [100, 110][-n:], 'bus_voltage_mV': [5000, 5001][-n:]}
+
+    def start_stream(self, callback, only=None, rescan=True):
+        self.streaming = True
+
+    def stop_stream(self):
+        self.streaming = False
+
+    def publish(self, *batch):
+        for consumer in self.consumers:
+            consumer(*batch)
+
+
+@pytest.fixture
+def web():
+    server = WebServer(FakeBackend(), port=0, client_queue=4)
+    server.start()
+    yield server
+    server.close()
+
+
+def wait_for(cond, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not cond() and time.monotonic() < end:
+        time.sleep(0.005)
+    assert cond()
+
+
+def get(web, path):
+    conn = http.client.HTTPConnection('127.0.0.1', web.port, timeout=2)
+    conn.request('GET', path)
+    resp = conn.getresponse()
+    body = json.loads(resp.read())
+    conn.close()
+    return resp.status, body
+
+
+def test_json_endpoints_serve_cached_state(web):
+    assert get(web, '/api/discovery') == (200, {'1': [{'name': 'ina219', 'addr': 64,
+                                                       'config': {'period': 10, 'gain': 3}}]})
+    assert get(web, '/api/config/1/0x40') == (200, {'period': 10, 'gain': 3})
+    assert get(web, '/api/latest/1/0x40?n=2') == (200, {'tick': [100, 110],
+                                                        'bus_voltage_mV': [5000, 5001]})
+    assert get(web, '/api/config/1/0x41')[0] == 404
+    assert get(web, '/api/nope')[0] == 404
+    assert get(web, '/api/latest/x/1')[0] == 400
+
+
+def read_event(resp):
+    lines = []
+    while True:
+        line = resp.fp.readline().decode().rstrip('\n')
+        if line == '':
+            if lines and not lines[0].startswith(':'):
+                return lines
+            lines = []
+        else:
+            lines.append(line)
+
+
+def test_stream_fans_out_to_filtered_clients(web):
+    conns = [http.client.HTTPConnection('127.0.0.1', web.port, timeout=2) for _ in range(2)]
+    conns[0].request('GET', '/api/stream')
+    conns[1].request('GET', '/api/stream?only=2')
+    resps = [c.getresponse() for c in conns]
+    assert resps[0].getheader('Content-Type') == 'text/event-stream'
+    wait_for(lambda: web.stats()['clients'] == 2)
+    assert web.backend.streaming
+
+    web.backend.publish(1, 0x40, 'ina219', [{'tick': 5, 'bus_voltage_mV': 5000}])
+    web.backend.publish(2, 0x41, 'ina219', [{'tick': 6, 'current_uA': -3}])
+    first = read_event(resps[0])
+    assert first[0] == 'event: batch'
+    assert json.loads(first[1][len('data: '):]) == {
+        'board': 1, 'addr': 0x40, 'sensor': 'ina219', 'records': [{'tick': 5, 'bus_voltage_mV': 5000}]}
+    assert json.loads(read_event(resps[0])[1][6:])['board'] == 2
+    assert json.loads(read_event(resps[1])[1][6:])['board'] == 2
+
+    for c, r in zip(conns, resps):
+        r.close()
+        c.close()
+    wait_for(lambda: web.stats()['clients'] == 0)
+    assert not web.backend.streaming
+
+
+def test_failed_stream_start_does_not_leak_the_client(web):
+    attempts = []
+
+    def start_stream(callback, only=None, rescan=True):
+        attempts.append(rescan)
+        raise RuntimeError("bus busy")
+
+    web.backend.start_stream = start_stream
+    conn = http.client.HTTPConnection('127.0.0.1', web.port, timeout=2)
+    conn.request('GET', '/api/stream')
+    conn.getresponse().close()
+    conn.close()
+    wait_for(lambda: attempts == [False])
+    wait_for(lambda: web.stats()['clients'] == 0)
+
+
+def test_slow_client_is_dropped_not_waited_for(web):
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.connect(('127.0.0.1', web.port))
+    sock.sendall(b'GET /api/stream HTTP/1.1\r\nHost: x\r\n\r\n')
+    wait_for(lambda: web.stats()['clients'] == 1)
+
+    records = [{'tick': i, 'bus_voltage_mV': 5000} for i in range(500)]
+    start = time.monotonic()
+    for _ in range(200):  # never read: the client's queue must overflow
+        web.backend.publish(1, 0x40, 'ina219', records)
+    assert time.monotonic() - start < 1.0
+    wait_for(lambda: web.stats() == {'clients': 0, 'dropped_clients': 1})
+    sock.close()
+
+
+def test_event_client_drops_itself_when_full():
+    a, b = socket.socketpair()
+    client = _EventClient(a, set(), maxsize=2)
+    data = encode_event(1, 2, 'ina219', [])
+    for _ in range(3):
+        client.offer(data)
+    assert client.dropped and client.queue.qsize() == 2
+    assert b.recv(10) == b''  # peer sees the connection shut down
+    a.close()
+    b.close()